@@ -4,11 +4,14 @@ import os
 from flask import Flask, send_from_directory
 from flask_cors import CORS
 
+from app.controllers.daily_score import backfill_daily_scores
+from app.controllers.daily_task import backfill_task_days
+from app.controllers.task import backfill_final_scores
 from app.models import dev_init
+from app.modules.index_advisor import index_advisor_command
+from app.modules.notification_retention import notification_partition_command
 from app.modules.jwt import jwt
 from app.modules.logger import console_handler, file_handler
-from app.modules.sched.daily_task_sched import PeriodTaskScheduler
-from app.modules.sched.period_task_sched import DailyTaskScheduler
 from app.modules.scheduler import init_scheduler
 from app.modules.sql import db, migrate
 from app.views import register_blueprints
@@ -16,8 +19,13 @@ from config import Config
 from app.modules.sched import init_schedulers
 
 
-def create_app() -> Flask:
-    """创建app必要的操作"""
+def create_app(init_db: bool = True, schedulers: bool = True) -> Flask:
+    """创建app必要的操作
+    Args:
+        init_db (bool, optional): 是否执行数据库初始化（迁移、初始数据与回填），只应由主应用进程执行
+        schedulers (bool, optional): 是否启动定时任务运行时并参与leader选举
+    异步聊天网关等辅助进程只需配置、数据库与jwt，应以create_app(init_db=False, schedulers=False)创建。
+    """
     app = Flask(__name__, static_folder=None)
     app.config.from_object(Config)
 
@@ -34,6 +42,8 @@ def create_app() -> Flask:
 
     db.init_app(app)
     migrate.init_app(app, db)
+    app.cli.add_command(index_advisor_command)
+    app.cli.add_command(notification_partition_command)
     
     # 注册所有蓝图
     register_blueprints(app)
@@ -61,16 +71,8 @@ def create_app() -> Flask:
     #         period_task_scheduler.stop_scheduler()
     #         logging.info("周期任务计分调度器已关闭")
 
-    # 在应用上下文中初始化和启动定时任务调度器
-    global daily_task_scheduler
-    with app.app_context():
-        daily_task_scheduler = DailyTaskScheduler(app)
-        daily_task_scheduler.start_scheduler()
-        logging.info("每日任务创建调度器已启动并完成初始化")
-
-        # !! 数据库初始化操作，仅开发使用
-        dev_init(app)
-        # !! 数据库初始化操作，仅开发使用
+    if init_db:
+        _init_db(app)
 
     # # 注册关闭回调
     # @app.teardown_appcontext
@@ -80,15 +82,41 @@ def create_app() -> Flask:
     #         daily_task_scheduler.stop_scheduler()
     #         logging.info("每日任务创建调度器已关闭")
 
-    # 初始化任务计划程序
-    init_scheduler(app)
+    if schedulers:
+        # 初始化统一的定时任务运行时，所有调度器的任务都注册在其中
+        init_scheduler(app)
 
-    # 初始化所有定时任务调度器
-    schedulers = init_schedulers(app)
-    app.schedulers = schedulers  # 可选：将调度器保存在app对象中，以便后续访问
+        # 初始化所有定时任务调度器
+        app.schedulers = init_schedulers(app)  # 可选：将调度器保存在app对象中，以便后续访问
 
     app.logger.setLevel(logging.INFO)
     app.logger.addHandler(file_handler)
     app.logger.addHandler(console_handler)
 
     return app
+
+
+def _init_db(app: Flask) -> None:
+    """初始化数据库结构与初始数据，并回填汇总数据"""
+    with app.app_context():
+        # !! 数据库初始化操作，仅开发使用
+        dev_init(app)
+        # !! 数据库初始化操作，仅开发使用
+
+        # 每日评分汇总表为空时从已有日报回填
+        try:
+            backfill_daily_scores()
+        except Exception as e:
+            logging.error(f"回填每日评分汇总失败: {str(e)}")
+
+        # 周期任务的数值得分列为空时从文本得分回填
+        try:
+            backfill_final_scores()
+        except Exception as e:
+            logging.error(f"回填周期任务得分失败: {str(e)}")
+
+        # 每日任务的日期列为空时从任务时间回填
+        try:
+            backfill_task_days()
+        except Exception as e:
+            logging.error(f"回填每日任务日期失败: {str(e)}")
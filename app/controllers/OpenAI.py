@@ -9,6 +9,7 @@ from dotenv import load_dotenv
 import logging
 from app.modules.sql import db
 from app.models.gpt import Gpt
+from app.modules.llm_transport import transport
 import json
 import threading
 
@@ -105,7 +106,7 @@ def query_openai(messages):
     for url in api_urls:
         try:
             logging.info(f"尝试请求 OpenAI API 地址: {url}")
-            response = requests.post(url, json=openai_data, headers=headers)
+            response = transport.post(url, json=openai_data, headers=headers)
             response.raise_for_status()
             return response.json(), model
         except requests.exceptions.HTTPError as http_err:
@@ -229,7 +230,7 @@ def stream_openai_response(messages):
     for url in api_urls:
         try:
             logging.info(f"尝试请求 OpenAI API 地址: {url}")
-            with requests.post(url, json=openai_data, headers=headers, stream=True) as response:
+            with transport.post(url, json=openai_data, headers=headers, stream=True) as response:
                 response.raise_for_status()
                 for line in response.iter_lines():
                     if line:
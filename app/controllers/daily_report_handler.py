@@ -1,4 +1,3 @@
-import base64
 import os
 import uuid
 from datetime import datetime, timedelta
@@ -9,6 +8,7 @@ from werkzeug.datastructures import FileStorage
 from app.models.daily_task import DailyTask
 from app.models.daily_report import DailyReport
 from app.models.period_task import PeriodTask
+from app.modules.image_payload import encode_image, iter_base64
 from app.modules.llm import create_completion
 from app.utils.constant import LLMPrompt as LLM
 from app.utils.constant import LLMStructure as LLMS
@@ -18,6 +18,7 @@ from app.utils.database import CRUD
 from app.utils.logger import Log
 from app.utils.response import Response
 from app.modules.sql import db
+from app.controllers.daily_score import refresh_daily_score
 from app.controllers.task_progress import update_task_progress
 
 class DailyReportHandler:
@@ -62,12 +63,11 @@ class DailyReportHandler:
         Args:
             image_path: 图片路径
         Returns:
-            str: base64编码的图片数据
+            str: 缩放编码后图片的base64数据
         """
         try:
-            with open(image_path, 'rb') as img_file:
-                img_data = img_file.read()
-                return base64.b64encode(img_data).decode('utf-8')
+            cache_path, _ = encode_image(image_path)
+            return "".join(iter_base64(cache_path))
         except Exception as e:
             Log.error(f"Error processing image {image_path}: {str(e)}")
             return None
@@ -104,13 +104,6 @@ class DailyReportHandler:
 
     def generate_report_review(self, report_text: str, tasks_info: List[Dict], picture_paths: List[str]) -> Dict:
         """生成日报评价"""
-        # 处理图片数据
-        image_data = []
-        for path in picture_paths:
-            base64_data = self.process_image(path)
-            if base64_data:
-                image_data.append(base64_data)
-        
         # 整合任务信息
         all_requirements = []
         all_completed = []
@@ -136,7 +129,7 @@ class DailyReportHandler:
                 review_prompt,
                 self.user_id,
                 "report",
-                image_data if image_data else None,
+                picture_paths or None,  # 图片在发送时才缩放编码并以流的方式写入请求体
                 dictionary_like=True,
                 response_format=LLMS.DailyReport,
                 model_type="deepseek"
@@ -223,6 +216,7 @@ class DailyReportHandler:
                 # 保存所有更改
                 db.session.add(report)
                 db.session.commit()
+                refresh_daily_score(report.report_id)
                 
                 return Response(Response.r.OK, data={
                     "report_id": report.report_id,
@@ -0,0 +1,110 @@
+# 每日评分汇总的控制器
+from datetime import date
+from typing import Dict, List, Tuple
+
+from sqlalchemy import func, or_, select
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+
+from app.models.daily_report import DailyReport
+from app.models.daily_score_rollup import DailyScoreRollup
+from app.modules.sql import db
+from app.utils.logger import Log
+
+SCORE_COLUMNS = ("basic_score", "excess_score", "extra_score", "efficiency", "innovation")
+
+
+def refresh_daily_score(report_id: str) -> bool:
+    """在日报评价完成后，将其评分写入每日评分汇总
+    Args:
+        report_id (str): 日报ID
+    Returns:
+        bool: 是否写入成功，评价尚未生成的日报不会写入
+    """
+    try:
+        report = db.session.get(DailyReport, report_id)
+        if not report or report.generating or report.basic_score is None:
+            return False
+
+        values = {column: getattr(report, column) for column in SCORE_COLUMNS}
+        stmt = mysql_insert(DailyScoreRollup).values(
+            user_id=report.user_id,
+            score_date=report.created_at.date(),
+            report_id=report.report_id,
+            report_created_at=report.created_at,
+            **values,
+        )
+        # 与回填一致，只在该日报不早于已汇总的日报时覆盖，较早的日报晚于较新的日报完成评价时不会覆盖
+        # MySQL按顺序执行赋值，判断所依赖的report_created_at必须最后更新
+        is_newer = or_(
+            DailyScoreRollup.report_created_at.is_(None),
+            DailyScoreRollup.report_created_at <= stmt.inserted.report_created_at,
+        )
+        new_values = {column: stmt.inserted[column] for column in ("report_id", *SCORE_COLUMNS)}
+        new_values["updated_at"] = func.now()
+        new_values["report_created_at"] = stmt.inserted.report_created_at
+        db.session.execute(
+            stmt.on_duplicate_key_update(
+                [
+                    (column, func.if_(is_newer, value, DailyScoreRollup.__table__.c[column]))
+                    for column, value in new_values.items()
+                ]
+            )
+        )
+        db.session.commit()
+        return True
+    except Exception as e:
+        db.session.rollback()
+        Log.error(f"更新日报 {report_id} 的每日评分汇总失败: {e}")
+        return False
+
+
+def get_daily_scores(
+    user_ids: List[str], start: date, end: date
+) -> Dict[Tuple[str, date], DailyScoreRollup]:
+    """以一次范围查询读取成员在[start, end]内的每日评分
+    Returns:
+        Dict[Tuple[str, date], DailyScoreRollup]: 以(成员ID, 日期)为键的评分
+    """
+    if not user_ids:
+        return {}
+    rows = DailyScoreRollup.query.filter(
+        DailyScoreRollup.user_id.in_(user_ids),
+        DailyScoreRollup.score_date >= start,
+        DailyScoreRollup.score_date <= end,
+    ).all()
+    return {(row.user_id, row.score_date): row for row in rows}
+
+
+def backfill_daily_scores() -> int:
+    """汇总表为空时，以一条 INSERT ... SELECT 从已有的日报中回填
+    Returns:
+        int: 回填的行数
+    """
+    if db.session.query(DailyScoreRollup.user_id).first() is not None:
+        return 0
+
+    # 同一成员同一天有多份日报时取最新的一份
+    ranked = select(
+        DailyReport.user_id,
+        func.date(DailyReport.created_at).label("score_date"),
+        DailyReport.report_id,
+        DailyReport.created_at.label("report_created_at"),
+        *[getattr(DailyReport, column) for column in SCORE_COLUMNS],
+        func.row_number().over(
+            partition_by=(DailyReport.user_id, func.date(DailyReport.created_at)),
+            order_by=DailyReport.created_at.desc(),
+        ).label("rn"),
+    ).where(
+        DailyReport.user_id.isnot(None),
+        DailyReport.basic_score.isnot(None),
+        DailyReport.generating.isnot(True),
+    ).subquery()
+
+    columns = ("user_id", "score_date", "report_id", "report_created_at", *SCORE_COLUMNS)
+    stmt = mysql_insert(DailyScoreRollup).from_select(
+        columns,
+        select(*[ranked.c[column] for column in columns]).where(ranked.c.rn == 1),
+    ).prefix_with("IGNORE")
+    result = db.session.execute(stmt)
+    db.session.commit()
+    return result.rowcount
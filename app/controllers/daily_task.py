@@ -1,9 +1,15 @@
+import uuid
 from datetime import datetime, timedelta
 from typing import Optional, Dict, List, Union
+from sqlalchemy import and_, exists, func, or_, select, update
+from sqlalchemy.dialects.mysql import insert as mysql_insert
 from app.models.period_task import PeriodTask
 from app.models.daily_task import DailyTask
+from app.models.daily_task_checkpoint import DailyTaskCheckpoint
 from app.models.daily_report import DailyReport
+from app.modules.job_status import report_progress
 from app.modules.llm import create_completion
+from app.modules.llm_pool import map_concurrently
 from app.utils.constant import LLMPrompt as LLM
 from app.utils.database import CRUD
 from app.utils.logger import Log
@@ -56,6 +62,133 @@ def get_previous_task_status(assignee_id: str, period_task_id: str) -> Dict:
         "report_content": latest_report.report_text if latest_report else None
     }
 
+def build_daily_task_prompt(period_task: PeriodTask, previous_status: Dict) -> str:
+    """根据周期任务与最近一天的完成情况构建生成每日任务的提示词"""
+    return f"""
+分析周期任务信息并根据最近一天的完成情况生成今日任务计划：
+
+周期任务详细要求：
+{period_task.detail_task_requirements}
+
+最近一天任务完成情况：
+{"暂无历史任务记录" if not previous_status["has_task"] else f'''
+任务内容：{previous_status["task_content"]["detail"]}
+完成状态：{"已完成" if previous_status["completed"] else "未完成"}
+完成报告：{previous_status["report_content"] if previous_status["report_content"] else "无"}
+'''}
+
+请根据以上信息生成今日任务计划，要求：
+1. 任务内容要基于最近一天的学习进度和完成情况
+2. 确保任务连贯性，新任务应该是最近一天任务的自然延续
+3. 任务难度要循序渐进
+4. 任务内容要符合周期任务的整体目标
+
+请使用以下格式生成任务：
+1. 首先生成一个简短的"今日任务概要"（一句话总结，不要使用JSON格式）
+2. 然后空两行
+3. 接着提供详细的任务步骤和要求（包括具体的学习内容和预期完成标准）
+
+示例格式：
+今日任务概要：开始学习Python基础语法，掌握基本数据类型和变量声明
+
+
+详细任务内容：
+1. **Python环境设置**
+   - 下载并安装Python 3.10或更高版本
+   - 配置开发环境，推荐使用VS Code或PyCharm
+
+2. **基本语法学习**
+   - 学习变量声明和基本数据类型
+   - 掌握条件语句和循环结构
+   - 完成5个基础练习题
+
+请严格按照上述格式输出，不要添加额外的JSON格式或其他解释内容。
+"""
+
+
+def parse_daily_task_content(task_content) -> tuple[str, str]:
+    """解析LLM返回的每日任务内容
+    Returns:
+        tuple[str, str]: 任务概要与详细任务内容
+    """
+    try:
+        # 检查返回的内容是否是JSON格式
+        if isinstance(task_content, dict):
+            # 如果已经是字典，可能是LLM模块直接返回了JSON对象
+            Log.info("LLM返回了字典格式的数据")
+            if 'basic' in task_content and 'review' in task_content['basic']:
+                basic_task = task_content['basic']['review']
+                # 将字典转换为格式化的JSON字符串
+                import json
+                detail_task = json.dumps(task_content, ensure_ascii=False, indent=2)
+            else:
+                # 无法识别的字典格式
+                basic_task = "今日任务计划"
+                detail_task = str(task_content)
+        elif isinstance(task_content, str):
+            Log.info("LLM返回了字符串格式的数据")
+            if task_content.strip().startswith('{') or '```json' in task_content:
+                # 可能包含JSON
+                import json
+                import re
+
+                # 尝试提取JSON部分
+                json_match = re.search(r'```json\s*(.*?)\s*```|(\{.*\})', task_content, re.DOTALL)
+                if json_match:
+                    Log.info("从文本中提取到了JSON格式")
+                    json_str = json_match.group(1) if json_match.group(1) else json_match.group(2)
+                    try:
+                        json_data = json.loads(json_str)
+                        # 提取basic和review作为任务基本内容
+                        if 'basic' in json_data and 'review' in json_data['basic']:
+                            basic_task = json_data['basic']['review']
+                        else:
+                            basic_task = "今日任务计划"
+
+                        # 使用整个JSON作为详细任务
+                        detail_task = task_content
+                    except json.JSONDecodeError as e:
+                        Log.error(f"JSON解析失败: {str(e)}")
+                        # JSON解析失败，按普通文本处理
+                        parts = task_content.split('\n\n', 1)
+                        basic_task = parts[0].strip()
+                        detail_task = parts[1].strip() if len(parts) > 1 else task_content
+                else:
+                    # 没找到JSON，按普通文本处理
+                    Log.info("未找到JSON格式，按普通文本处理")
+                    parts = task_content.split('\n\n', 1)
+                    basic_task = parts[0].strip()
+                    detail_task = parts[1].strip() if len(parts) > 1 else task_content
+            else:
+                # 普通文本格式处理
+                Log.info("使用普通文本处理方式")
+                # 查找第一个空行分隔
+                empty_line_pos = task_content.find('\n\n')
+                if empty_line_pos != -1:
+                    basic_task = task_content[:empty_line_pos].strip()
+                    detail_task = task_content[empty_line_pos:].strip()
+                else:
+                    # 没有空行，尝试使用第一行作为概要
+                    lines = task_content.split('\n')
+                    basic_task = lines[0].strip()
+                    detail_task = task_content
+        else:
+            # 未知类型
+            Log.error(f"LLM返回了未知类型的数据: {type(task_content)}")
+            basic_task = "今日任务计划"
+            detail_task = str(task_content)
+
+        Log.info(f"解析后的任务概要: {basic_task[:100]}...")
+        Log.info(f"解析后的详细任务长度: {len(detail_task)} 字符")
+
+    except Exception as e:
+        Log.error(f"Error parsing GPT response: {str(e)}")
+        basic_task = "今日任务计划"
+        detail_task = str(task_content)
+
+    return basic_task, detail_task
+
+
 @Log.track_execution(when_error=Response(Response.r.ERR_INTERNAL))
 def generate_daily_task_from_period(period_task_id: str, assigner_id: str, return_object: bool = False) -> Union[Response, DailyTask]:
    """根据周期任务的详细要求生成每日任务
@@ -103,143 +236,43 @@ def generate_daily_task_from_period(period_task_id: str, assigner_id: str, retur
        else:
            # 如果最近一天任务已完成或没有最近一天任务，根据周期任务和最近一天的每日任务生成新任务
            # 构建GPT提示
-           prompt = f"""
-分析周期任务信息并根据最近一天的完成情况生成今日任务计划：
-
-周期任务详细要求：
-{period_task.detail_task_requirements}
-
-最近一天任务完成情况：
-{"暂无历史任务记录" if not previous_status["has_task"] else f'''
-任务内容：{previous_status["task_content"]["detail"]}
-完成状态：{"已完成" if previous_status["completed"] else "未完成"}
-完成报告：{previous_status["report_content"] if previous_status["report_content"] else "无"}
-'''}
-
-请根据以上信息生成今日任务计划，要求：
-1. 任务内容要基于最近一天的学习进度和完成情况
-2. 确保任务连贯性，新任务应该是最近一天任务的自然延续
-3. 任务难度要循序渐进
-4. 任务内容要符合周期任务的整体目标
-
-请使用以下格式生成任务：
-1. 首先生成一个简短的"今日任务概要"（一句话总结，不要使用JSON格式）
-2. 然后空两行
-3. 接着提供详细的任务步骤和要求（包括具体的学习内容和预期完成标准）
-
-示例格式：
-今日任务概要：开始学习Python基础语法，掌握基本数据类型和变量声明
-
-
-详细任务内容：
-1. **Python环境设置**
-   - 下载并安装Python 3.10或更高版本
-   - 配置开发环境，推荐使用VS Code或PyCharm
-
-2. **基本语法学习**
-   - 学习变量声明和基本数据类型
-   - 掌握条件语句和循环结构
-   - 完成5个基础练习题
-
-请严格按照上述格式输出，不要添加额外的JSON格式或其他解释内容。
-"""
+           prompt = build_daily_task_prompt(period_task, previous_status)
            # 使用GPT生成任务内容
-           task_content = create_completion(prompt, assigner_id, "task")
+           task_content = create_completion(prompt, assigner_id, "task", use_cache=False)
            
            # 记录原始返回内容
            Log.info(f"LLM任务生成原始返回内容: {task_content[:500]}...")
            
            # 解析GPT返回的内容
-           try:
-               # 检查返回的内容是否是JSON格式
-               if isinstance(task_content, dict):
-                   # 如果已经是字典，可能是LLM模块直接返回了JSON对象
-                   Log.info("LLM返回了字典格式的数据")
-                   if 'basic' in task_content and 'review' in task_content['basic']:
-                       basic_task = task_content['basic']['review']
-                       # 将字典转换为格式化的JSON字符串
-                       import json
-                       detail_task = json.dumps(task_content, ensure_ascii=False, indent=2)
-                   else:
-                       # 无法识别的字典格式
-                       basic_task = "今日任务计划"
-                       detail_task = str(task_content)
-               elif isinstance(task_content, str):
-                   Log.info("LLM返回了字符串格式的数据")
-                   if task_content.strip().startswith('{') or '```json' in task_content:
-                       # 可能包含JSON
-                       import json
-                       import re
-                       
-                       # 尝试提取JSON部分
-                       json_match = re.search(r'```json\s*(.*?)\s*```|(\{.*\})', task_content, re.DOTALL)
-                       if json_match:
-                           Log.info("从文本中提取到了JSON格式")
-                           json_str = json_match.group(1) if json_match.group(1) else json_match.group(2)
-                           try:
-                               json_data = json.loads(json_str)
-                               # 提取basic和review作为任务基本内容
-                               if 'basic' in json_data and 'review' in json_data['basic']:
-                                   basic_task = json_data['basic']['review']
-                               else:
-                                   basic_task = "今日任务计划"
-                               
-                               # 使用整个JSON作为详细任务
-                               detail_task = task_content
-                           except json.JSONDecodeError as e:
-                               Log.error(f"JSON解析失败: {str(e)}")
-                               # JSON解析失败，按普通文本处理
-                               parts = task_content.split('\n\n', 1)
-                               basic_task = parts[0].strip()
-                               detail_task = parts[1].strip() if len(parts) > 1 else task_content
-                       else:
-                           # 没找到JSON，按普通文本处理
-                           Log.info("未找到JSON格式，按普通文本处理")
-                           parts = task_content.split('\n\n', 1)
-                           basic_task = parts[0].strip()
-                           detail_task = parts[1].strip() if len(parts) > 1 else task_content
-                   else:
-                       # 普通文本格式处理
-                       Log.info("使用普通文本处理方式")
-                       # 查找第一个空行分隔
-                       empty_line_pos = task_content.find('\n\n')
-                       if empty_line_pos != -1:
-                           basic_task = task_content[:empty_line_pos].strip()
-                           detail_task = task_content[empty_line_pos:].strip()
-                       else:
-                           # 没有空行，尝试使用第一行作为概要
-                           lines = task_content.split('\n')
-                           basic_task = lines[0].strip()
-                           detail_task = task_content
-               else:
-                   # 未知类型
-                   Log.error(f"LLM返回了未知类型的数据: {type(task_content)}")
-                   basic_task = "今日任务计划"
-                   detail_task = str(task_content)
-                   
-               Log.info(f"解析后的任务概要: {basic_task[:100]}...")
-               Log.info(f"解析后的详细任务长度: {len(detail_task)} 字符")
-                   
-           except Exception as e:
-               Log.error(f"Error parsing GPT response: {str(e)}")
-               basic_task = "今日任务计划"
-               detail_task = str(task_content)
-               
+           basic_task, detail_task = parse_daily_task_content(task_content)
+           
            is_continued = False
            
-       # 创建每日任务记录
-       daily_task = DailyTask(
-           assigner_id=assigner_id,
-           assignee_id=period_task.assignee_id,
-           task_date=datetime.now(),
-           basic_task_requirements=basic_task,
-           detail_task_requirements=detail_task,
-           period_task_id=period_task_id
+       # 生成期间批量任务可能已插入今日任务，由(周期任务ID, 日期)的唯一键去重，已存在时忽略本次插入
+       now = datetime.now()
+       task_id = str(uuid.uuid4())
+       result = db.session.execute(
+           mysql_insert(DailyTask.__table__).prefix_with("IGNORE").values(
+               task_id=task_id,
+               assigner_id=assigner_id,
+               assignee_id=period_task.assignee_id,
+               task_date=now,
+               task_day=today.date(),
+               basic_task_requirements=basic_task,
+               detail_task_requirements=detail_task,
+               period_task_id=period_task_id,
+               created_at=now,
+               updated_at=now
+           )
        )
-       
-       db.session.add(daily_task)
        db.session.commit()
        
+       if result.rowcount == 0:
+           existing_task = DailyTask.query.filter_by(period_task_id=period_task_id, task_day=today.date()).first()
+           return existing_task if return_object else Response(Response.r.ERR_CONFLICTION, message="今日已生成该周期任务的每日任务")
+       
+       daily_task = db.session.get(DailyTask, task_id)
+       
        if return_object:
            return daily_task
        else:
@@ -253,6 +286,268 @@ def generate_daily_task_from_period(period_task_id: str, assigner_id: str, retur
        Log.error(f"Error in generate_daily_task_from_period: {str(e)}")
        return None if return_object else Response(Response.r.ERR_INTERNAL, message=str(e))
 
+def _previous_status(previous_task: Optional[DailyTask], previous_report: Optional[DailyReport]) -> Dict:
+    """将预取的最近一天任务与日报组装为与get_previous_task_status相同的结构"""
+    if not previous_task:
+        return {
+            "has_task": False,
+            "completed": False,
+            "task_content": None,
+            "report_content": None
+        }
+    return {
+        "has_task": True,
+        "completed": bool(previous_report),
+        "task_content": {
+            "basic": previous_task.basic_task_requirements,
+            "detail": previous_task.detail_task_requirements
+        },
+        "report_content": previous_report.report_text if previous_report else None
+    }
+
+
+def prefetch_daily_task_inputs(today: datetime) -> List[tuple]:
+    """批量生成的第一阶段：以三次查询取得今日待生成的每个周期任务及其最近一天的每日任务与该日的日报
+    Args:
+        today (datetime): 今日零点
+    Returns:
+        List[tuple]: [(周期任务, 最近一天的每日任务或None, 该日的日报或None)]
+    """
+    tomorrow = today + timedelta(days=1)
+
+    # 进行中且今日尚未生成每日任务的周期任务
+    generated_today = exists().where(
+        DailyTask.period_task_id == PeriodTask.task_id,
+        DailyTask.task_date >= today,
+        DailyTask.task_date < tomorrow
+    )
+    period_tasks = PeriodTask.query.filter(
+        PeriodTask.start_time <= today,
+        PeriodTask.end_time >= datetime.now(),
+        ~generated_today
+    ).all()
+    if not period_tasks:
+        return []
+
+    # 每个周期任务中由其负责人完成的最近一天的每日任务
+    ranked = (db.session.query(
+            DailyTask.task_id,
+            func.row_number().over(
+                partition_by=DailyTask.period_task_id,
+                order_by=DailyTask.task_date.desc()
+            ).label("row_number")
+        )
+        .join(PeriodTask, and_(
+            PeriodTask.task_id == DailyTask.period_task_id,
+            PeriodTask.assignee_id == DailyTask.assignee_id
+        ))
+        .filter(
+            DailyTask.period_task_id.in_([task.task_id for task in period_tasks]),
+            DailyTask.task_date < today
+        )
+        .subquery())
+    previous_tasks = {
+        task.period_task_id: task
+        for task in DailyTask.query.join(ranked, DailyTask.task_id == ranked.c.task_id)
+        .filter(ranked.c.row_number == 1)
+    }
+
+    # 最近一天的每日任务当天的日报，按(成员, 日期)取最早的一份
+    previous_reports = {}
+    if previous_tasks:
+        # 只读取每个(成员, 日期)当天的日报，最近一天的任务相隔很久时也不会读取中间的日报
+        pairs = {
+            (task.assignee_id, task.task_date.replace(hour=0, minute=0, second=0, microsecond=0))
+            for task in previous_tasks.values()
+        }
+        reports = (DailyReport.query
+            .filter(or_(*(
+                and_(
+                    DailyReport.user_id == user_id,
+                    DailyReport.created_at >= day,
+                    DailyReport.created_at < day + timedelta(days=1)
+                )
+                for user_id, day in pairs
+            )))
+            .order_by(DailyReport.created_at)
+            .all())
+        for report in reports:
+            previous_reports.setdefault((report.user_id, report.created_at.date()), report)
+
+    result = []
+    for period_task in period_tasks:
+        previous_task = previous_tasks.get(period_task.task_id)
+        previous_report = previous_reports.get(
+            (previous_task.assignee_id, previous_task.task_date.date())
+        ) if previous_task else None
+        result.append((period_task, previous_task, previous_report))
+    return result
+
+
+def _save_checkpoint(run_date, period_task: PeriodTask, **values) -> None:
+    """写入或更新一个周期任务的生成检查点并立即提交"""
+    values = {"assignee_id": period_task.assignee_id, **values}
+    db.session.execute(
+        mysql_insert(DailyTaskCheckpoint.__table__)
+        .values(run_date=run_date, period_task_id=period_task.task_id, **values)
+        .on_duplicate_key_update(**values)
+    )
+    db.session.commit()
+
+
+def generate_daily_tasks_batch() -> Dict:
+    """批量生成今日所有进行中周期任务的每日任务，可重复执行
+
+    第一阶段以三次查询预取所有输入；第二阶段在有并发上限的线程池中调用LLM，
+    每个结果立即写入检查点；第三阶段一次批量插入所有每日任务并标记检查点。
+    已生成每日任务的周期任务不会被再次处理，中断后重新执行时已有检查点的内容不再调用LLM。
+    Returns:
+        Dict: 各阶段的处理数量
+    """
+    now = datetime.now()
+    today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    run_date = today.date()
+
+    inputs = prefetch_daily_task_inputs(today)
+    report_progress(0, len(inputs), f"待生成 {len(inputs)} 个每日任务")
+    if not inputs:
+        return {"total": 0, "inserted": 0, "skipped": 0, "reused": 0, "continued": 0, "generated": 0, "failed": 0}
+
+    checkpoints = {
+        checkpoint.period_task_id: checkpoint
+        for checkpoint in DailyTaskCheckpoint.query.filter(
+            DailyTaskCheckpoint.run_date == run_date,
+            DailyTaskCheckpoint.status == "generated",
+            DailyTaskCheckpoint.period_task_id.in_([task.task_id for task, _, _ in inputs])
+        )
+    }
+
+    # 第二阶段：确定每个周期任务的每日任务内容，需要调用LLM的在线程池中并发执行
+    contents, pending = {}, []
+    counts = {"reused": 0, "continued": 0}
+    for period_task, previous_task, previous_report in inputs:
+        if checkpoint := checkpoints.get(period_task.task_id):
+            contents[period_task.task_id] = (
+                checkpoint.basic_task_requirements,
+                checkpoint.detail_task_requirements,
+            )
+            counts["reused"] += 1
+        elif previous_task and not previous_report:
+            # 最近一天任务未完成，直接沿用其内容
+            contents[period_task.task_id] = (
+                previous_task.basic_task_requirements,
+                previous_task.detail_task_requirements,
+            )
+            counts["continued"] += 1
+        else:
+            pending.append((period_task, _previous_status(previous_task, previous_report)))
+
+    def generate(item: tuple) -> tuple[str, str]:
+        period_task, previous_status = item
+        prompt = build_daily_task_prompt(period_task, previous_status)
+        task_content = create_completion(prompt, period_task.assignee_id, "task", use_cache=False)
+        basic_task, detail_task = parse_daily_task_content(task_content)
+        _save_checkpoint(
+            run_date,
+            period_task,
+            basic_task_requirements=basic_task,
+            detail_task_requirements=detail_task,
+            status="generated",
+            error=None
+        )
+        return basic_task, detail_task
+
+    failed = 0
+    for (period_task, _), value in zip(pending, map_concurrently(generate, pending)):
+        if isinstance(value, Exception):
+            failed += 1
+            Log.error(f"生成周期任务 {period_task.task_id} 的每日任务失败: {str(value)}")
+            try:
+                _save_checkpoint(run_date, period_task, status="failed", error=str(value))
+            except Exception as e:
+                db.session.rollback()
+                Log.error(f"写入周期任务 {period_task.task_id} 的检查点失败: {str(e)}")
+            continue
+        contents[period_task.task_id] = value
+    report_progress(len(contents) + failed, len(inputs), f"已生成 {len(contents)} 个每日任务内容")
+
+    # 第三阶段：一次批量插入所有每日任务，并在同一事务中标记检查点；
+    # 第二阶段耗时较长，期间单个生成接口可能已为部分周期任务创建了今日任务，由(周期任务ID, 日期)的唯一键忽略这些行
+    rows = [
+        {
+            "task_id": str(uuid.uuid4()),
+            "period_task_id": period_task.task_id,
+            "assigner_id": period_task.assignee_id,
+            "assignee_id": period_task.assignee_id,
+            "task_date": now,
+            "task_day": run_date,
+            "basic_task_requirements": contents[period_task.task_id][0],
+            "detail_task_requirements": contents[period_task.task_id][1],
+            "created_at": now,
+            "updated_at": now,
+        }
+        for period_task, _, _ in inputs
+        if period_task.task_id in contents
+    ]
+    period_task_ids = [row["period_task_id"] for row in rows]
+    inserted = 0
+    if rows:
+        try:
+            inserted = db.session.execute(
+                mysql_insert(DailyTask.__table__).prefix_with("IGNORE").values(rows)
+            ).rowcount
+            db.session.execute(
+                update(DailyTaskCheckpoint)
+                .where(
+                    DailyTaskCheckpoint.run_date == run_date,
+                    DailyTaskCheckpoint.period_task_id.in_(period_task_ids)
+                )
+                .values(status="inserted")
+            )
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+    result = {
+        "total": len(inputs),
+        "inserted": inserted,
+        "skipped": len(rows) - inserted,
+        "reused": counts["reused"],
+        "continued": counts["continued"],
+        "generated": len(pending) - failed,
+        "failed": failed,
+    }
+    Log.info(f"每日任务批量生成完成: {result}")
+    return result
+
+
+def backfill_task_days() -> int:
+    """为task_day加入之前的每日任务回填日期，可重复执行
+    同一周期任务同一天有多个任务时只回填最早的一个，其余保持为空，以满足(周期任务ID, 日期)的唯一键
+    Returns:
+        int: 回填的行数
+    """
+    day = func.date(DailyTask.task_date)
+    ranked = select(
+        DailyTask.task_id,
+        func.row_number().over(
+            partition_by=(DailyTask.period_task_id, day),
+            order_by=(DailyTask.task_date, DailyTask.task_id)
+        ).label("row_number")
+    ).subquery()
+    result = db.session.execute(
+        update(DailyTask)
+        .where(
+            DailyTask.task_day.is_(None),
+            DailyTask.task_id.in_(select(ranked.c.task_id).where(ranked.c.row_number == 1))
+        )
+        .values(task_day=day)
+    )
+    db.session.commit()
+    return result.rowcount
+
+
 @Log.track_execution(when_error=Response(Response.r.ERR_INTERNAL))
 def get_daily_task(user_id: str, date_str: Optional[str] = None) -> Response:
     """获取指定日期的任务
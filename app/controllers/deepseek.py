@@ -8,6 +8,7 @@ from dotenv import load_dotenv
 import logging
 from app.modules.sql import db
 from app.models.gpt import Gpt
+from app.modules.llm_transport import transport
 import json
 
 # 加载环境变量
@@ -163,7 +164,7 @@ def query_ollama(messages):
     }
     
     try:
-        response = requests.post(url, json=ollama_data)
+        response = transport.post(url, json=ollama_data)
         response.raise_for_status()
         return response.json(), OLLAMA_MODEL
     except requests.exceptions.RequestException as err:
@@ -183,7 +184,7 @@ def stream_ollama_response(messages):
     full_response = ""
     
     try:
-        with requests.post(url, json=ollama_data, stream=True) as response:
+        with transport.post(url, json=ollama_data, stream=True) as response:
             response.raise_for_status()
             for line in response.iter_lines():
                 if line:
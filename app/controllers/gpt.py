@@ -9,6 +9,11 @@ from dotenv import load_dotenv
 import logging
 from app.modules.sql import db
 from app.models.gpt import Gpt
+from app.modules.llm_cache import llm_cache
+from app.modules.llm_transport import RETRY_STATUS_CODES, backoff_delay, transport
+from config import Config
+import asyncio
+import httpx
 import json
 import threading
 
@@ -80,8 +85,8 @@ def create_message(text_content, base64_image=None):
     # 返回系统提示词和用户消息
     return [system_message, user_message]
 
-def query_openai(messages):
-    """向 API 发起请求并返回响应"""
+def query_openai(messages, use_cache=True):
+    """向 API 发起请求并返回响应，相同内容的请求命中缓存时不再调用 API"""
     model = "deepseek-chat"
     deepseek_data = {
         "model": model,
@@ -89,6 +94,17 @@ def query_openai(messages):
         "max_tokens": 2000,  # 增加 token 限制以获取更详细的回答
         "temperature": 0.7   # 添加温度参数以保持创造性和一致性的平衡
     }
+
+    cache_key = None
+    if use_cache:
+        cache_key = llm_cache.make_key(
+            model=model,
+            messages=messages,
+            temperature=deepseek_data["temperature"],
+            max_tokens=deepseek_data["max_tokens"],
+        )
+        if (cached := llm_cache.get(cache_key)) is not None:
+            return cached, model
     
     headers = {
         "Authorization": f"Bearer {DEEPSEEK_API_KEY}",
@@ -102,9 +118,12 @@ def query_openai(messages):
     for url in api_urls:
         try:
             logging.info(f"尝试请求 DeepSeek API 地址: {url}")
-            response = requests.post(url, json=deepseek_data, headers=headers)
+            response = transport.post(url, json=deepseek_data, headers=headers)
             response.raise_for_status()
-            return response.json(), model
+            result = response.json()
+            if cache_key:
+                llm_cache.set(cache_key, model, result)
+            return result, model
         except requests.exceptions.HTTPError as http_err:
             logging.error(f"HTTPError for URL {url}: {http_err}")
         except requests.exceptions.RequestException as err:
@@ -201,11 +220,14 @@ def cleanup_old_messages(session_id: str, keep_last: int = 40) -> None:
         db.session.delete(message)
     db.session.commit()
 
-def stream_openai_response(messages):
-    """流式处理 API 响应"""
-    model = "deepseek-chat"
+# 流式响应中表示结束的标记
+STREAM_DONE = object()
+
+
+def _stream_request(messages):
+    """流式请求的地址列表、请求体与请求头"""
     deepseek_data = {
-        "model": model,
+        "model": "deepseek-chat",
         "messages": messages,
         "max_tokens": 1000,
         "stream": True
@@ -219,37 +241,48 @@ def stream_openai_response(messages):
     api_urls = [
         'https://api.deepseek.com/v1/chat/completions',
     ]
+    return api_urls, deepseek_data, headers
+
+def _stream_delta(line: str):
+    """解析流式响应的一行，返回新增内容、结束标记STREAM_DONE，或无内容时返回None"""
+    if not line.startswith('data: '):
+        return None
+    if line.strip() == 'data: [DONE]':
+        return STREAM_DONE
     
+    json_data = json.loads(line[6:])
+    if 'choices' in json_data and len(json_data['choices']) > 0:
+        return json_data['choices'][0].get('delta', {}).get('content')
+    return None
+
+def stream_openai_response(messages):
+    """流式处理 API 响应"""
+    api_urls, deepseek_data, headers = _stream_request(messages)
     full_response = ""
     
     for url in api_urls:
         try:
             logging.info(f"尝试请求 DeepSeek API 地址: {url}")
-            with requests.post(url, json=deepseek_data, headers=headers, stream=True) as response:
+            with transport.post(url, json=deepseek_data, headers=headers, stream=True) as response:
                 response.raise_for_status()
                 for line in response.iter_lines():
-                    if line:
-                        line = line.decode('utf-8')
-                        if line.startswith('data: '):
-                            if line.strip() == 'data: [DONE]':
-                                # 返回完整的响应和结束标记
-                                yield {
-                                    "type": "done",
-                                    "content": full_response
-                                }
-                                return
-                            
-                            json_data = json.loads(line[6:])
-                            if 'choices' in json_data and len(json_data['choices']) > 0:
-                                delta = json_data['choices'][0].get('delta', {})
-                                if 'content' in delta:
-                                    content = delta['content']
-                                    full_response += content
-                                    # 返回累加后的完整内容
-                                    yield {
-                                        "type": "chunk",
-                                        "content": full_response  # 这里改为返回完整的累加内容
-                                    }
+                    if not line:
+                        continue
+                    delta = _stream_delta(line.decode('utf-8'))
+                    if delta is STREAM_DONE:
+                        # 返回完整的响应和结束标记
+                        yield {
+                            "type": "done",
+                            "content": full_response
+                        }
+                        return
+                    if delta is not None:
+                        full_response += delta
+                        # 返回累加后的完整内容
+                        yield {
+                            "type": "chunk",
+                            "content": full_response
+                        }
             return
         except requests.exceptions.RequestException as err:
             logging.error(f"RequestException for URL {url}: {err}")
@@ -260,6 +293,58 @@ def stream_openai_response(messages):
         "content": "无法连接到 DeepSeek API"
     }
 
+async def astream_openai_response(client, messages):
+    """stream_openai_response的异步版本，使用httpx.AsyncClient在事件循环中读取流式响应
+    Args:
+        client: 共用的httpx.AsyncClient
+        messages: 对话消息
+    连接失败或遇到暂时性状态码时按LLMTransport相同的策略退避重试，已开始输出后不再重试
+    """
+    api_urls, deepseek_data, headers = _stream_request(messages)
+    full_response = ""
+    
+    for url in api_urls:
+        for attempt in range(Config.LLM_HTTP_MAX_RETRIES + 1):
+            try:
+                logging.info(f"尝试请求 DeepSeek API 地址: {url}")
+                async with client.stream("POST", url, json=deepseek_data, headers=headers) as response:
+                    if response.status_code in RETRY_STATUS_CODES and attempt < Config.LLM_HTTP_MAX_RETRIES:
+                        logging.warning(f"LLM请求 {url} 返回 {response.status_code}，第 {attempt + 1} 次重试")
+                        await asyncio.sleep(backoff_delay(attempt))
+                        continue
+                    response.raise_for_status()
+                    async for line in response.aiter_lines():
+                        if not line:
+                            continue
+                        delta = _stream_delta(line)
+                        if delta is STREAM_DONE:
+                            yield {
+                                "type": "done",
+                                "content": full_response
+                            }
+                            return
+                        if delta is not None:
+                            full_response += delta
+                            yield {
+                                "type": "chunk",
+                                "content": full_response
+                            }
+                return
+            except (httpx.ConnectError, httpx.ConnectTimeout) as err:
+                if attempt >= Config.LLM_HTTP_MAX_RETRIES:
+                    logging.error(f"RequestException for URL {url}: {err}")
+                    break
+                logging.warning(f"LLM请求 {url} 失败: {err}，第 {attempt + 1} 次重试")
+                await asyncio.sleep(backoff_delay(attempt))
+            except httpx.HTTPError as err:
+                logging.error(f"RequestException for URL {url}: {err}")
+                break
+    
+    yield {
+        "type": "error",
+        "content": "无法连接到 DeepSeek API"
+    }
+
 # 基于ChatGPT的能力评估控制器
 import os
 from datetime import datetime, timedelta
@@ -7,22 +7,40 @@ from typing import Optional
 from app.modules.notification_service import NotificationService
 from app.utils.logger import Log
 from app.utils.response import Response
+from config import Config
 
 @Log.track_execution(when_error=Response(Response.r.ERR_INTERNAL))
-def get_notifications(user_id: str, unread_only: Optional[bool] = False) -> Response:
+def get_notifications(
+    user_id: str,
+    unread_only: Optional[bool] = False,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = None,
+    since: Optional[str] = None
+) -> Response:
     """
     获取用户的通知列表
     
     Args:
         user_id: 用户ID
         unread_only: 是否只获取未读通知
+        cursor: 获取更早一页的游标，与limit、since均未提供时返回最新的通知列表
+        limit: 每页数量
+        since: 增量同步的游标，只获取此后新增的通知
         
     Returns:
-        Response: 带有通知列表的响应
+        Response: 带有通知列表的响应，分页时为通知列表与next_cursor、sync_cursor
     """
     try:
-        notifications = NotificationService.get_user_notifications(user_id, unread_only)
-        return Response(Response.r.OK, data=notifications)
+        if cursor is None and limit is None and since is None:
+            notifications = NotificationService.get_user_notifications(user_id, unread_only)
+            return Response(Response.r.OK, data=notifications)
+
+        page = NotificationService.get_user_notifications_page(
+            user_id, unread_only, cursor, limit or Config.NOTIFICATION_PAGE_SIZE, since
+        )
+        return Response(Response.r.OK, data=page)
+    except ValueError as e:
+        return Response(Response.r.ERR_INVALID_ARGUMENT, message=str(e))
     except Exception as e:
         Log.error(f"获取通知失败: {str(e)}")
         return Response(Response.r.ERR_INTERNAL, message=str(e))
@@ -6,6 +6,7 @@ from uuid import uuid4
 from PIL import Image
 from werkzeug.datastructures import FileStorage
 
+from app.controllers.daily_score import refresh_daily_score
 from app.models.daily_report import DailyReport
 from app.models.period_task import PeriodTask
 from app.modules.llm import create_completion
@@ -181,6 +182,9 @@ def create_report(
                 ):
                     return Response(Response.r.ERR_SQL)
 
+        # 评价已生成，更新每日评分汇总
+        refresh_daily_score(report_id)
+
         return Response(Response.r.OK, data=report_id)
 
     except Exception as e:
@@ -345,3 +349,5 @@ def generate_report_review(report_id: str, picture_path: list[str]) -> None:
             extra_score=review["extra"]["score"],
             generating=False,
         )
+
+    refresh_daily_score(report_id)
@@ -5,6 +5,7 @@ from datetime import datetime
 from app.controllers.report import generate_report_review
 from app.models.daily_report import DailyReport
 from app.models.period_task import PeriodTask
+from app.modules.job_status import report_progress
 from app.modules.llm import create_completion
 from app.modules.pool import submit_task
 from app.utils.constant import LLMPrompt as LLM
@@ -40,7 +41,8 @@ def check_daily_report() -> Response:
             Log.info("检查日报已中止，因为并未找到任何项")
             return Response(Response.r.OK)
         delay = 0
-        for rep in query.all():
+        reports = query.all()
+        for index, rep in enumerate(reports, 1):
             image_path = [
                 os.path.join(Local.REPORT_PICTURE, pic.split("/")[-1])
                 for pic in rep.report_picture
@@ -52,6 +54,7 @@ def check_daily_report() -> Response:
                 delay=Timer(minutes=delay),
             )
             delay += 1
+            report_progress(index, len(reports), f"已安排日报 {rep.report_id} 的评价")
 
     return Response(Response.r.OK)
 
@@ -66,7 +69,7 @@ def daily_generation() -> Response:
         task.need_update()
         tasks: list[PeriodTask] = query.all()
         # 对每个任务进行处理
-        for t in tasks:
+        for index, t in enumerate(tasks, 1):
             # 获取LLM需要使用的必要元数据
             basic = t.basic_task_requirements
             detail = t.detail_task_requirements
@@ -101,6 +104,7 @@ def daily_generation() -> Response:
                 "task",
                 dictionary_like=True,
                 response_format=LLMS.DailySummary,
+                use_cache=False,
             )
 
             completion = reply.get("completion_status")
@@ -113,4 +117,6 @@ def daily_generation() -> Response:
                     Log.error(r.error)
                     return Response(Response.r.ERR_SQL)
 
+            report_progress(index, len(tasks), f"已生成任务 {t.task_id} 的每日安排")
+
     return Response(Response.r.OK)
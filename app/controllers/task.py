@@ -3,7 +3,7 @@ import traceback
 from typing import List
 import uuid
 from datetime import datetime, timedelta
-from sqlalchemy import func
+from sqlalchemy import Numeric, cast, func, update
 from app.controllers.daily_task import generate_daily_task_from_period
 from app.models.daily_report import DailyReport
 from app.modules.sql import db
@@ -20,6 +20,9 @@ from app.utils.constant import DataStructure as D
 from app.models.department import Department
 import logging
 from app.models.task_progress import TaskProgress
+from app.controllers.task_progress import get_latest_progress_map
+from app.utils.department_tree import department_tree
+from config import Config
 
 @Log.track_execution(when_error=Response(Response.r.ERR_INTERNAL))
 def calculate_task_progress(period_task_id: str) -> Response:
@@ -159,7 +162,7 @@ def create_task(
 
     # 查找是否存在任务的结束时间大于现在任务开始时间的项，即是否存在未结束的任务
     with CRUD(PeriodTask, assignee_id=assignee_id) as q_period:
-        if q_period.query_key(q_period.model.end_time > start_date):
+        if q_period.exists(q_period.model.end_time > start_date):
             return Response(Response.r.ERR_CONFLICTION)
     
     task_id = str(uuid.uuid4())  # 生成任务ID
@@ -239,13 +242,13 @@ def generate_task(
 
     assignee: Member = q_assignee.first()
 
-    department = assignee.department.name
-    if parent_department := assignee.department.parent.name:
-        department = f"{parent_department}-{department}"
+    department = node.name if (node := department_tree.get(assignee.department_id)) else ""
+    if parent_department := department_tree.parent(assignee.department_id):
+        department = f"{parent_department.name}-{department}"
     days = (Timer.js_to_utc(start_time) - Timer.js_to_utc(end_time)).days
 
     task_prompt = LLM.TASK_GENERATION(department, basic_task, days)
-    received_task = create_completion(task_prompt, assigner_id, "task")
+    received_task = create_completion(task_prompt, assigner_id, "task", use_cache=False)
 
     return Response(Response.r.OK, data=received_task)
 
@@ -467,11 +470,34 @@ def get_period_tasks_list(user_id: str):
             "data": None
         }), 500
 
+def _paginate(query, page: int, page_size: int):
+    """对查询分页，返回当前页的结果与分页信息
+    page与page_size均未传入时返回全部结果，分页信息为None
+    """
+    if page is None and page_size is None:
+        return query.all(), None
+    page = max(page or 1, 1)
+    page_size = min(max(page_size or Config.TASK_PAGE_SIZE, 1), Config.TASK_PAGE_SIZE_MAX)
+    total = query.order_by(None).count()
+    items = query.limit(page_size).offset((page - 1) * page_size).all()
+    return items, {"page": page, "page_size": page_size, "total": total}
+
+
+def _with_pagination(body: dict, pagination: dict | None) -> dict:
+    """分页时在响应体中附加分页信息，未分页时保持原有的响应格式"""
+    if pagination is not None:
+        body["pagination"] = pagination
+    return body
+
+
 @Log.track_execution(when_error=Response(Response.r.ERR_INTERNAL))
-def get_period_tasks(member_id: str, task_id: str = None):
+def get_period_tasks(member_id: str, task_id: str = None, page: int = None, page_size: int = None):
     """获取成员的当前和未来周期任务列表
     Args:
         member_id (str): 成员ID（学号）
+        task_id (str, optional): 只获取指定的周期任务
+        page (int, optional): 页码，从1开始，与page_size均未传入时返回全部任务
+        page_size (int, optional): 每页数量，只传入page时默认为Config.TASK_PAGE_SIZE
     Returns:
         Response: 有效的周期任务列表，按开始时间排序
     """
@@ -479,28 +505,33 @@ def get_period_tasks(member_id: str, task_id: str = None):
         # 获取当前时间
         now = datetime.now()
         if task_id:
-            period_tasks = (PeriodTask.query
+            query = (PeriodTask.query
             .filter(
                 PeriodTask.assignee_id == member_id,
                 PeriodTask.task_id == task_id
-            )
-            .all())
+            ))
         else:
             # 查询未结束的周期任务（进行中或未开始）
-            period_tasks = (PeriodTask.query
+            query = (PeriodTask.query
                 .filter(
                     PeriodTask.assignee_id == member_id,
                     PeriodTask.end_time >= now  # 只获取未结束的任务
                 )
-                .order_by(PeriodTask.start_time.desc())
-                .all())
+                .order_by(PeriodTask.start_time.desc()))
+        period_tasks, pagination = _paginate(query, page, page_size)
 
         if not period_tasks:
-            return jsonify({
+            return jsonify(_with_pagination({
                 "status": "OK",
                 "msg": "no active tasks",
                 "data": []
-            })
+            }, pagination))
+
+        # 进行中任务的最新进度值一次查出
+        latest_progress = get_latest_progress_map([
+            task.task_id for task in period_tasks
+            if task.start_time <= now and task.end_time >= now
+        ], [member_id])
 
         tasks_list = []
         for task in period_tasks:
@@ -510,18 +541,9 @@ def get_period_tasks(member_id: str, task_id: str = None):
                 progress_data = 0
             elif task.start_time <= now and task.end_time >= now:
                 status = "进行中"  # 进行中
-                
-                # 获取最新的进度值
-                latest_progress = TaskProgress.query.filter(
-                    TaskProgress.task_id == task.task_id,
-                    TaskProgress.user_id == member_id
-                ).order_by(TaskProgress.progress_date.desc()).first()
-                
-                if latest_progress:
-                    progress_data = latest_progress.progress_value
-                else:
-                    # 如果没有进度记录，则返回0
-                    progress_data = 0
+                # 没有进度记录时返回0
+                latest = latest_progress.get((task.task_id, member_id))
+                progress_data = latest.progress_value if latest else 0
             else:
                 status = "已结束"  # 已结束
                 progress_data = 100
@@ -537,11 +559,11 @@ def get_period_tasks(member_id: str, task_id: str = None):
                 "progress": progress_data
             })
 
-        return jsonify({
+        return jsonify(_with_pagination({
             "status": "OK",
             "msg": "success",
             "data": tasks_list
-        })
+        }, pagination))
 
     except Exception as e:
         Log.error(f"Error in get_period_tasks_list: {str(e)}")
@@ -551,8 +573,10 @@ def get_period_tasks(member_id: str, task_id: str = None):
             "data": None
         }), 500
     
-def get_members_period_tasks(user_id: str):
-    """获取权限范围内所有成员的周期任务列表"""
+def get_members_period_tasks(user_id: str, page: int = None, page_size: int = None):
+    """获取权限范围内所有成员的周期任务列表
+    可见成员的未结束周期任务与成员信息一次联表查出，传入page或page_size时分页，各任务的最新进度一次窗口查询查出
+    """
     try:
         now = datetime.now()
         current_user = Member.query.get(user_id)
@@ -564,18 +588,18 @@ def get_members_period_tasks(user_id: str):
                 "data": None
             }), 404
 
-        # 获取可见成员列表
+        # 可见成员的未结束周期任务
+        query = (db.session.query(PeriodTask, Member.id, Member.name, Member.major)
+            .join(Member, PeriodTask.assignee_id == Member.id)
+            .filter(PeriodTask.end_time >= now))
+
+        # 按角色限定可见成员
         if current_user.role.value == "admin":
-            members = Member.query.all()
+            pass
         elif current_user.role.value == "leader":
-            dev_dept_ids = (Department.query
-                          .filter(Department.name.in_(["开发组-前端", "开发组-后端", "开发组-游戏开发", "开发组-OA开发"]))
-                          .with_entities(Department.id)
-                          .all())
-            dev_dept_id_list = [d[0] for d in dev_dept_ids]
-            members = Member.query.filter(Member.department_id.in_(dev_dept_id_list)).all()
+            query = query.filter(Member.department_id.in_(department_tree.dev_department_ids()))
         elif current_user.role.value == "subleader":
-            members = Member.query.filter(Member.department_id == current_user.department_id).all()
+            query = query.filter(Member.department_id.in_(department_tree.descendant_ids(current_user.department_id)))
         else:
             return jsonify({
                 "status": "ERR_FORBIDDEN",
@@ -583,48 +607,45 @@ def get_members_period_tasks(user_id: str):
                 "data": None
             }), 403
 
+        rows, pagination = _paginate(
+            query.order_by(Member.id, PeriodTask.start_time.desc()), page, page_size
+        )
+        latest_progress = get_latest_progress_map([task.task_id for task, *_ in rows])
+
         result = []
-        for member in members:
-            # 查询该成员的未结束周期任务
-            period_tasks = (PeriodTask.query
-                          .filter(
-                              PeriodTask.assignee_id == member.id,
-                              PeriodTask.end_time >= now
-                          )
-                          .order_by(PeriodTask.start_time.desc())
-                          .all())
-            
-            for task in period_tasks:
-                # 计算任务进度
-                if now < task.start_time:
-                    status = "未开始"
-                    progress = 0
-                elif now > task.start_time and now < task.end_time:
-                    status = "进行中"
-                    total_duration = (task.end_time - task.start_time).total_seconds()
-                    elapsed_duration = (now - task.start_time).total_seconds()
-                    progress = min(int((elapsed_duration / total_duration) * 100), 99)
-                else:
-                    status = "已结束"
-                    progress = 100
-
-                result.append({
-                    "member_id": member.id,
-                    "name": member.name,
-                    "major": member.major,
-                    "task_id": task.task_id,
-                    "basic_task_requirements": task.basic_task_requirements,
-                    "start_time": task.start_time.strftime("%Y-%m-%d %H:%M:%S"),
-                    "end_time": task.end_time.strftime("%Y-%m-%d %H:%M:%S"),
-                    "status": status,
-                    "progress": progress
-                })
+        for task, member_id, member_name, member_major in rows:
+            latest = latest_progress.get((task.task_id, member_id))
+            # 计算任务进度
+            if now < task.start_time:
+                status = "未开始"
+                progress = 0
+            elif now > task.start_time and now < task.end_time:
+                status = "进行中"
+                total_duration = (task.end_time - task.start_time).total_seconds()
+                elapsed_duration = (now - task.start_time).total_seconds()
+                progress = min(int((elapsed_duration / total_duration) * 100), 99)
+            else:
+                status = "已结束"
+                progress = 100
 
-        return jsonify({
+            result.append({
+                "member_id": member_id,
+                "name": member_name,
+                "major": member_major,
+                "task_id": task.task_id,
+                "basic_task_requirements": task.basic_task_requirements,
+                "start_time": task.start_time.strftime("%Y-%m-%d %H:%M:%S"),
+                "end_time": task.end_time.strftime("%Y-%m-%d %H:%M:%S"),
+                "status": status,
+                "progress": progress,
+                "latest_progress": latest.progress_value if latest else None
+            })
+
+        return jsonify(_with_pagination({
             "status": "OK",
             "msg": "success",
             "data": result
-        })
+        }, pagination))
 
     except Exception as e:
         print(f"Error in get_members_period_tasks: {str(e)}")
@@ -679,4 +700,21 @@ def get_task_average_score(user_id: str, start_date: str = None, end_date: str =
         return Response(
             status_obj=Response.r.ERR_INTERNAL,
             message=str(e)
-        )
\ No newline at end of file
+        )
+
+def backfill_final_scores() -> int:
+    """将此前以文本形式保存在completed_task_description中的得分回填到final_score
+    只处理final_score为空且描述为纯数字的周期任务，可重复执行
+    Returns:
+        int: 回填的行数
+    """
+    result = db.session.execute(
+        update(PeriodTask)
+        .where(
+            PeriodTask.final_score.is_(None),
+            PeriodTask.completed_task_description.regexp_match(r"^[0-9]+(\.[0-9]+)?$"),
+        )
+        .values(final_score=cast(PeriodTask.completed_task_description, Numeric(10, 2)))
+    )
+    db.session.commit()
+    return result.rowcount
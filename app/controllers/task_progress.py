@@ -1,6 +1,8 @@
+import re
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional
-from sqlalchemy import func
+from sqlalchemy import func, literal_column
+from sqlalchemy.dialects.mysql import insert as mysql_insert
 from app.models.task_progress import TaskProgress
 from app.models.period_task import PeriodTask
 from app.models.daily_report import DailyReport
@@ -12,6 +14,10 @@ from app.modules.sql import db
 from app.utils.logger import Log
 from app.utils.response import Response
 from app.utils.constant import LLMPrompt as LLM
+from app.utils.department_tree import department_tree
+from app.utils.timeseries import build_daily_series, date_range
+
+DEFAULT_REPORT_TEXT = "今日暂无日报内容"  # 找不到最近日报时用于评估的默认内容
 
 def evaluate_daily_progress(user_id: str, task_id: str, report_text: str = None, retry_count: int = 0) -> float:
     """评估当前进度值
@@ -23,12 +29,6 @@ def evaluate_daily_progress(user_id: str, task_id: str, report_text: str = None,
     Returns:
         float: 进度值（0-100）
     """
-    # 限制最大重试次数
-    MAX_RETRIES = 3
-    if retry_count >= MAX_RETRIES:
-        Log.error(f"达到最大重试次数 ({MAX_RETRIES})")
-        return 0.0
-
     try:
         # 获取周期任务信息
         task = PeriodTask.query.filter_by(task_id=task_id).first()
@@ -38,29 +38,10 @@ def evaluate_daily_progress(user_id: str, task_id: str, report_text: str = None,
             
         # 如果未提供report_text，则从数据库中获取最新的日报内容
         if not report_text:
-            from app.models.daily_report import DailyReport
-            
-            # 获取今天的日期
-            today = datetime.now().date()
-            
-            # 记录日志
-            Log.info(f"尝试从数据库获取用户 {user_id} 的最新日报内容，时间范围：{today - timedelta(days=3)} 到 {today}")
-            
-            # 查询用户最近3天内的日报，按创建时间降序排序
-            recent_reports = DailyReport.query.filter(
-                DailyReport.user_id == user_id,
-                DailyReport.created_at >= today - timedelta(days=3)
-            ).order_by(DailyReport.created_at.desc()).all()
-            
-            # 记录日志
-            Log.info(f"查询到用户 {user_id} 最近3天的日报数量: {len(recent_reports) if recent_reports else 0}")
-            
-            if recent_reports:
-                report_text = recent_reports[0].report_text
-                Log.info(f"获取到用户 {user_id} 的最新日报内容: {report_text[:100]}...")
-            else:
+            report_text = get_recent_report_texts([user_id]).get(user_id)
+            if not report_text:
                 # 如果找不到最近的日报，使用默认内容
-                report_text = "今日暂无日报内容"
+                report_text = DEFAULT_REPORT_TEXT
                 Log.info(f"未找到用户 {user_id} 的最近日报，使用默认内容: {report_text}")
 
         # 获取历史进度记录
@@ -69,19 +50,51 @@ def evaluate_daily_progress(user_id: str, task_id: str, report_text: str = None,
             user_id=user_id
         ).order_by(TaskProgress.progress_date.desc()).first()
 
-        # 构建评估提示
-        prompt = f"""作为一个专业的任务进度评估助手，请根据以下信息评估今日工作在整个任务中的进度。
+        return evaluate_progress_value(
+            user_id,
+            task,
+            report_text,
+            last_progress.progress_value if last_progress else None,
+            retry_count,
+        )
+
+    except Exception as e:
+        Log.error(f"评估进度时出错: {str(e)}")
+        return Response(Response.r.ERR_INTERNAL, 
+                      message=f"评估进度时出错: {str(e)}")
+
+def evaluate_progress_value(user_id: str, task: PeriodTask, report_text: str, last_value: Optional[float] = None, retry_count: int = 0) -> float:
+    """使用已取得的任务、日报与历史进度评估当前进度值，不会查询数据库
+    Args:
+        user_id: 用户ID
+        task: 周期任务
+        report_text: 日报内容
+        last_value: 历史进度值（可选，无历史记录时为None）
+        retry_count: 重试次数
+    Returns:
+        float: 进度值（0-100）
+    """
+    # 限制最大重试次数
+    MAX_RETRIES = 3
+    if retry_count >= MAX_RETRIES:
+        Log.error(f"达到最大重试次数 ({MAX_RETRIES})")
+        return 0.0
+
+    history = last_value if last_value is not None else 0
+
+    # 构建评估提示
+    prompt = f"""作为一个专业的任务进度评估助手，请根据以下信息评估今日工作在整个任务中的进度。
 
 任务要求：
 {task.detail_task_requirements}
 
-历史进度：{last_progress.progress_value if last_progress else 0}%
+历史进度：{history}%
 
 今日工作内容：
 {report_text}
 
 评估规则：
-1. 进度只能增加或保持不变，不能低于历史进度 {last_progress.progress_value if last_progress else 0}%
+1. 进度只能增加或保持不变，不能低于历史进度 {history}%
 2. 进度必须是0-100之间的数字
 3. 进度应该反映实际完成情况，不要过分乐观
 4. 如果今日工作对任务完成没有实质性推进，应该保持历史进度不变
@@ -91,71 +104,151 @@ def evaluate_daily_progress(user_id: str, task_id: str, report_text: str = None,
    - 对整体任务目标的推进程度
 
 请直接返回一个0-100之间的数字作为当前总体进度，仅返回数字，不需要其他解释、格式或JSON结构。
-如果无法评估或工作内容与任务无关，请返回历史进度 {last_progress.progress_value if last_progress else 0}。"""
+如果无法评估或工作内容与任务无关，请返回历史进度 {history}。"""
 
-        # 使用Deepseek评估进度
+    # 使用Deepseek评估进度
+    try:
+        Log.info(f"开始为用户 {user_id} 的任务 {task.task_id} 评估进度，日报内容: {report_text[:100]}...")
+        progress_str = create_completion(
+            send_text=prompt,
+            user_id=user_id,
+            method="task",
+            model_type="deepseek",
+            temperature=0.3,
+            max_tokens=10
+        )
+        Log.info(f"DeepSeek返回原始响应: {progress_str}")
+        
+        # 尝试解析返回值，确保是有效的数字
         try:
-            Log.info(f"开始为用户 {user_id} 的任务 {task_id} 评估进度，日报内容: {report_text[:100]}...")
-            progress_str = create_completion(
-                send_text=prompt,
-                user_id=user_id,
-                method="task",
-                model_type="deepseek",
-                temperature=0.3,
-                max_tokens=10
-            )
-            Log.info(f"DeepSeek返回原始响应: {progress_str}")
-            
-            # 尝试解析返回值，确保是有效的数字
-            try:
-                # 尝试提取数字
-                import re
-                # 查找返回内容中的第一个数字
-                number_match = re.search(r'\b\d+(\.\d+)?\b', progress_str)
-                if number_match:
-                    progress = float(number_match.group(0))
-                    Log.info(f"从返回内容中提取到数字: {progress}")
-                else:
-                    # 首先尝试直接转换成浮点数
-                    progress = float(progress_str.strip())
-                    Log.info(f"将响应直接转换为浮点数: {progress}")
-            except ValueError:
-                # 如果直接转换失败，可能返回了JSON或其他格式
-                Log.error(f"无法直接解析进度值: {progress_str}，尝试回退到历史进度")
-                # 回退到历史进度或0
-                if retry_count < MAX_RETRIES:
-                    Log.info(f"尝试重试 ({retry_count + 1}/{MAX_RETRIES})")
-                    return evaluate_daily_progress(user_id, task_id, report_text, retry_count + 1)
-                progress = last_progress.progress_value if last_progress else 0.0
-                Log.info(f"使用历史进度或默认值: {progress}")
-                return progress
-            
-            # 确保进度在0-100之间
-            progress = max(0, min(100, progress))
-            
-            # 确保进度不低于历史进度
-            if last_progress:
-                old_progress = last_progress.progress_value
-                if progress < old_progress:
-                    Log.info(f"新进度 {progress} 低于历史进度 {old_progress}，使用历史进度")
-                    progress = old_progress
-                else:
-                    Log.info(f"新进度 {progress} 高于历史进度 {old_progress}，使用新进度")
+            # 查找返回内容中的第一个数字
+            number_match = re.search(r'\b\d+(\.\d+)?\b', progress_str)
+            if number_match:
+                progress = float(number_match.group(0))
+                Log.info(f"从返回内容中提取到数字: {progress}")
             else:
-                Log.info(f"没有历史进度，使用计算出的进度: {progress}")
-            
-            return progress
-        except (ValueError, TypeError) as e:
-            Log.error(f"无法解析进度值: {progress_str}, 错误: {str(e)}")
+                # 首先尝试直接转换成浮点数
+                progress = float(progress_str.strip())
+                Log.info(f"将响应直接转换为浮点数: {progress}")
+        except ValueError:
+            # 如果直接转换失败，可能返回了JSON或其他格式
+            Log.error(f"无法直接解析进度值: {progress_str}，尝试回退到历史进度")
+            # 回退到历史进度或0
             if retry_count < MAX_RETRIES:
                 Log.info(f"尝试重试 ({retry_count + 1}/{MAX_RETRIES})")
-                return evaluate_daily_progress(user_id, task_id, report_text, retry_count + 1)
-            return last_progress.progress_value if last_progress else 0.0
+                return evaluate_progress_value(user_id, task, report_text, last_value, retry_count + 1)
+            progress = last_value if last_value is not None else 0.0
+            Log.info(f"使用历史进度或默认值: {progress}")
+            return progress
+        
+        # 确保进度在0-100之间
+        progress = max(0, min(100, progress))
+        
+        # 确保进度不低于历史进度
+        if last_value is not None:
+            if progress < last_value:
+                Log.info(f"新进度 {progress} 低于历史进度 {last_value}，使用历史进度")
+                progress = last_value
+            else:
+                Log.info(f"新进度 {progress} 高于历史进度 {last_value}，使用新进度")
+        else:
+            Log.info(f"没有历史进度，使用计算出的进度: {progress}")
+        
+        return progress
+    except (ValueError, TypeError) as e:
+        Log.error(f"无法解析进度值: {progress_str}, 错误: {str(e)}")
+        if retry_count < MAX_RETRIES:
+            Log.info(f"尝试重试 ({retry_count + 1}/{MAX_RETRIES})")
+            return evaluate_progress_value(user_id, task, report_text, last_value, retry_count + 1)
+        return last_value if last_value is not None else 0.0
+
+def get_recent_report_texts(user_ids: List[str], days: int = 3) -> Dict[str, str]:
+    """一次查询获取多个用户最近几天内最新的日报内容
+    Args:
+        user_ids: 用户ID列表
+        days: 向前查找的天数
+    Returns:
+        Dict[str, str]: 用户ID到最新日报内容的映射，没有日报的用户不包含在内
+    """
+    if not user_ids:
+        return {}
+
+    since = datetime.now().date() - timedelta(days=days)
+    reports = DailyReport.query.with_entities(
+        DailyReport.user_id, DailyReport.report_text
+    ).filter(
+        DailyReport.user_id.in_(user_ids),
+        DailyReport.created_at >= since
+    ).order_by(DailyReport.created_at.desc()).all()
+
+    # 结果按时间降序排列，每个用户只保留第一条
+    texts = {}
+    for user_id, report_text in reports:
+        texts.setdefault(user_id, report_text)
+    Log.info(f"查询到 {len(texts)}/{len(user_ids)} 名用户最近{days}天的日报")
+    return texts
+
+def get_latest_progress_map(task_ids: List[str], user_ids: List[str] = None) -> Dict[tuple, object]:
+    """使用窗口函数一次查询获取每个(任务, 用户)最新的进度记录
+    Args:
+        task_ids: 周期任务ID列表
+        user_ids: 用户ID列表（可选）
+    Returns:
+        Dict[tuple, Row]: (task_id, user_id) 到包含 progress_value 与 progress_date 的行的映射
+    """
+    if not task_ids:
+        return {}
+
+    ranked = db.session.query(
+        TaskProgress.task_id,
+        TaskProgress.user_id,
+        TaskProgress.progress_value,
+        TaskProgress.progress_date,
+        func.row_number().over(
+            partition_by=(TaskProgress.task_id, TaskProgress.user_id),
+            order_by=TaskProgress.progress_date.desc()
+        ).label('rn')
+    ).filter(TaskProgress.task_id.in_(task_ids))
+    if user_ids:
+        ranked = ranked.filter(TaskProgress.user_id.in_(user_ids))
+    ranked = ranked.subquery()
+
+    rows = db.session.query(
+        ranked.c.task_id,
+        ranked.c.user_id,
+        ranked.c.progress_value,
+        ranked.c.progress_date
+    ).filter(ranked.c.rn == 1).all()
+
+    return {(row.task_id, row.user_id): row for row in rows}
+
+def bulk_upsert_task_progress(records: List[dict]) -> int:
+    """以单条 INSERT ... ON DUPLICATE KEY UPDATE 语句批量写入任务进度，并在同一事务中提交
+    基于 uix_task_user_date 约束，已存在的记录只会取新旧进度中的较大值，保证进度不会回退。
+    Args:
+        records: 包含 task_id、user_id、progress_date、progress_value 的字典列表
+    Returns:
+        int: 写入的记录数
+    """
+    if not records:
+        return 0
 
-    except Exception as e:
-        Log.error(f"评估进度时出错: {str(e)}")
-        return Response(Response.r.ERR_INTERNAL, 
-                      message=f"评估进度时出错: {str(e)}")
+    now = datetime.utcnow()
+    rows = [{**record, 'created_at': now, 'updated_at': now} for record in records]
+
+    stmt = mysql_insert(TaskProgress).values(rows)
+    stmt = stmt.on_duplicate_key_update(
+        progress_value=func.greatest(TaskProgress.progress_value, stmt.inserted.progress_value),
+        updated_at=stmt.inserted.updated_at
+    )
+
+    try:
+        db.session.execute(stmt)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return len(rows)
 
 def update_task_progress(user_id: str, task_id: str, report_text: str = None) -> Response:
     """更新任务进度
@@ -339,12 +432,13 @@ def create_task_progress(user_id: str, task_id: str, report_text: str = None) ->
         return Response(Response.r.ERR_INTERNAL, 
                       message=f"创建任务进度时出错: {str(e)}")
 
-def get_progress_history(task_id: str, start_date: datetime, end_date: datetime) -> Response:
+def get_progress_history(task_id: str, start_date: datetime, end_date: datetime, columnar: bool = False) -> Response:
     """获取指定时间段的任务进度历史
     Args:
         task_id: 周期任务ID
         start_date: 开始日期
         end_date: 结束日期
+        columnar: 是否以列的形式返回进度历史（日期数组与进度数组）
     Returns:
         Response: 包含进度历史的响应
     """
@@ -369,35 +463,16 @@ def get_progress_history(task_id: str, start_date: datetime, end_date: datetime)
             TaskProgress.progress_date <= query_end
         ).order_by(TaskProgress.progress_date.asc()).all()
 
-        # 构建完整的日期进度记录
-        progress_history = []
-        current_date = query_start
-        last_progress = 0.0
-
-        while current_date <= query_end:
-            # 在任务周期内的日期才记录进度
-            if task_start <= current_date <= task_end:
-                # 查找当天的进度记录
-                record = next(
-                    (r for r in progress_records if r.progress_date == current_date),
-                    None
-                )
-                
-                if record:
-                    last_progress = record.progress_value
-                
-                progress_history.append({
-                    'date': current_date.isoformat(),
-                    'progress': last_progress
-                })
-            else:
-                # 在任务周期外的进度为0
-                progress_history.append({
-                    'date': current_date.isoformat(),
-                    'progress': 0.0
-                })
-            
-            current_date += timedelta(days=1)
+        # 构建完整的日期进度记录，没有记录的日期沿用上一次的进度
+        # 查询范围已限制在任务周期内，因此无需处理周期外的日期
+        progress_history = build_daily_series(
+            progress_records,
+            query_start,
+            query_end,
+            {'progress': 'progress_value'},
+            carry={'progress'},
+            columnar=columnar
+        )
 
         return Response(Response.r.OK, data={
             'task_id': task_id,
@@ -415,6 +490,9 @@ def get_progress_history(task_id: str, start_date: datetime, end_date: datetime)
 
 def get_department_progress(department_id: str, start_date: datetime, end_date: datetime) -> Response:
     """获取部门的任务进度统计
+
+    每日统计与整体统计由同一条 GROUP BY progress_date WITH ROLLUP 查询得到，
+    汇总行（progress_date 为 NULL）即整体统计，没有记录的日期在 Python 中补零。
     Args:
         department_id: 部门ID
         start_date: 开始日期
@@ -423,59 +501,67 @@ def get_department_progress(department_id: str, start_date: datetime, end_date:
         Response: 包含部门进度统计的响应
     """
     try:
-        # 验证部门是否存在
-        department = Department.query.filter_by(id=department_id).first()
+        # 验证部门是否存在，部门信息与成员数从部门树缓存读取
+        department = department_tree.get(int(department_id)) if str(department_id).isdigit() else None
         if not department:
             return Response(Response.r.ERR_NOT_FOUND, message="找不到指定的部门")
 
-        # 获取部门所有成员
-        members = Member.query.filter_by(department_id=department.id).all()
-        if not members:
+        # 获取部门成员数量
+        total_members = department.member_count
+        if not total_members:
             return Response(Response.r.ERR_NOT_FOUND, message="该部门没有成员")
 
-        member_ids = [member.id for member in members]
-
-        # 获取时间范围内的所有进度记录
-        progress_records = TaskProgress.query.filter(
+        member_ids = db.session.query(Member.id).filter(Member.department_id == department.id)
+
+        # 一次查询得到每日统计与整体统计
+        rows = db.session.query(
+            TaskProgress.progress_date,
+            func.avg(TaskProgress.progress_value),
+            func.max(TaskProgress.progress_value),
+            func.min(TaskProgress.progress_value),
+            func.count(),
+            func.count(func.distinct(TaskProgress.user_id)),
+        ).filter(
             TaskProgress.user_id.in_(member_ids),
             TaskProgress.progress_date >= start_date.date(),
             TaskProgress.progress_date <= end_date.date()
+        ).group_by(
+            literal_column(f"{TaskProgress.progress_date.name} WITH ROLLUP")
         ).all()
 
-        # 按日期组织数据
-        daily_stats = {}
-        current_date = start_date.date()
-        while current_date <= end_date.date():
-            # 获取当天的所有进度记录
-            day_records = [r for r in progress_records if r.progress_date == current_date]
-            
-            if day_records:
-                progress_values = [r.progress_value for r in day_records]
-                daily_stats[current_date.isoformat()] = {
-                    'average_progress': sum(progress_values) / len(progress_values),
-                    'max_progress': max(progress_values),
-                    'min_progress': min(progress_values),
-                    'member_count': len(day_records)
-                }
+        stats_by_date = {}
+        overall = None
+        for progress_date, avg_value, max_value, min_value, count, active_members in rows:
+            if progress_date is None:
+                overall = (avg_value, max_value, min_value, active_members)
             else:
-                # 如果当天没有记录，所有值设为0
-                daily_stats[current_date.isoformat()] = {
-                    'average_progress': 0.0,
-                    'max_progress': 0.0,
-                    'min_progress': 0.0,
-                    'member_count': 0
+                stats_by_date[progress_date] = {
+                    'average_progress': float(avg_value),
+                    'max_progress': max_value,
+                    'min_progress': min_value,
+                    'member_count': count
                 }
-            
-            current_date += timedelta(days=1)
 
-        # 计算整体统计信息
-        all_progress_values = [r.progress_value for r in progress_records]
+        # 按日期组织数据，没有记录的日期所有值设为0
+        empty_stats = {
+            'average_progress': 0.0,
+            'max_progress': 0.0,
+            'min_progress': 0.0,
+            'member_count': 0
+        }
+        daily_stats = {
+            day.isoformat(): stats_by_date.get(day, empty_stats)
+            for day in date_range(start_date.date(), end_date.date())
+        }
+
+        # 整体统计信息来自汇总行
+        avg_value, max_value, min_value, active_members = overall or (None, None, None, 0)
         overall_stats = {
-            'average_progress': sum(all_progress_values) / len(all_progress_values) if all_progress_values else 0.0,
-            'max_progress': max(all_progress_values) if all_progress_values else 0.0,
-            'min_progress': min(all_progress_values) if all_progress_values else 0.0,
-            'total_members': len(members),
-            'active_members': len(set(r.user_id for r in progress_records))
+            'average_progress': float(avg_value) if avg_value is not None else 0.0,
+            'max_progress': max_value if max_value is not None else 0.0,
+            'min_progress': min_value if min_value is not None else 0.0,
+            'total_members': total_members,
+            'active_members': active_members
         }
 
         return Response(Response.r.OK, data={
@@ -839,7 +925,7 @@ def update_department_progress(department_id: str, date: datetime = None) -> Res
                       message=f"更新部门进度统计时出错: {str(e)}")
 
 # 获取部门进度历史的函数
-def get_department_progress_history(department_id: str, start_date: datetime, end_date: datetime) -> Response:
+def get_department_progress_history(department_id: str, start_date: datetime, end_date: datetime, columnar: bool = False) -> Response:
     """获取部门指定时间段的成员进度统计历史
     
     部门本身没有任务，部门进度是该部门所有成员的进度统计，
@@ -849,6 +935,7 @@ def get_department_progress_history(department_id: str, start_date: datetime, en
         department_id: 部门ID
         start_date: 开始日期
         end_date: 结束日期
+        columnar: 是否以列的形式返回进度历史（日期数组与各指标数组）
     Returns:
         Response: 包含部门进度历史的响应
     """
@@ -866,40 +953,22 @@ def get_department_progress_history(department_id: str, start_date: datetime, en
             DepartmentProgress.progress_date <= end_date.date()
         ).order_by(DepartmentProgress.progress_date.asc()).all()
 
-        # 构建完整的日期进度记录
-        progress_history = []
-        current_date = start_date.date()
-        last_avg_progress = 0.0
-        last_max_progress = 0.0
-        last_min_progress = 0.0
-
-        while current_date <= end_date.date():
-            # 查找当天的记录
-            record = next(
-                (r for r in progress_records if r.progress_date == current_date),
-                None
-            )
-            
-            if record:
-                last_avg_progress = record.average_progress
-                last_max_progress = record.max_progress
-                last_min_progress = record.min_progress
-                member_count = record.member_count
-                has_record = True
-            else:
-                member_count = 0
-                has_record = False
-            
-            progress_history.append({
-                'date': current_date.isoformat(),
-                'average_progress': last_avg_progress,
-                'max_progress': last_max_progress,
-                'min_progress': last_min_progress,
-                'member_count': member_count,
-                'has_record': has_record
-            })
-            
-            current_date += timedelta(days=1)
+        # 构建完整的日期进度记录，没有记录的日期沿用上一次的进度，成员数为0
+        progress_history = build_daily_series(
+            progress_records,
+            start_date.date(),
+            end_date.date(),
+            {
+                'average_progress': 'average_progress',
+                'max_progress': 'max_progress',
+                'min_progress': 'min_progress',
+                'member_count': 'member_count'
+            },
+            carry={'average_progress', 'max_progress', 'min_progress'},
+            default={'member_count': 0},
+            flag='has_record',
+            columnar=columnar
+        )
 
         return Response(Response.r.OK, data={
             'department_id': department_id,
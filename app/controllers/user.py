@@ -10,6 +10,8 @@ from app.models.daily_report import DailyReport
 from app.models.member import Member
 from app.modules.pool import submit_task
 from app.modules.sql import db
+from app.utils.auth import identity_cache
+from app.utils.department_tree import department_tree
 from app.utils.constant import LocalPath as Local
 from app.utils.constant import UrlTemplate as Url
 from app.utils.database import CRUD
@@ -33,11 +35,11 @@ class MemberController:
 
             # 获取部门名称
             department_name = None
-            if member.department:
-                department_name = member.department.name
+            if department := department_tree.get(member.department_id):
+                department_name = department.name
                 # 如果有父部门，添加父部门名称
-                if member.department.parent:
-                    department_name = f"{member.department.parent.name}/{department_name}"
+                if parent := department_tree.parent(member.department_id):
+                    department_name = f"{parent.name}/{department_name}"
 
             # 处理 domain 字段
             domains = []
@@ -101,13 +103,14 @@ class MemberController:
                         setattr(member, field, data[field])
 
             db.session.commit()
+            identity_cache.invalidate(user_id)
 
             # 获取部门名称
             department_name = None
-            if member.department:
-                department_name = member.department.name
-                if member.department.parent:
-                    department_name = f"{member.department.parent.name}/{department_name}"
+            if department := department_tree.get(member.department_id):
+                department_name = department.name
+                if parent := department_tree.parent(member.department_id):
+                    department_name = f"{parent.name}/{department_name}"
 
             # 构造返回数据
             profile_data = {
@@ -145,6 +148,7 @@ class MemberController:
 
             db.session.delete(member)
             db.session.commit()
+            identity_cache.invalidate(user_id)
 
             return Response(
                 status_obj=Response.r.OK,
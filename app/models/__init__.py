@@ -4,7 +4,7 @@ from flask_migrate import revision, upgrade
 from app.utils.constant import DataStructure as D
 from app.utils.database import CRUD
 from app.utils.logger import Log
-from . import daily_report, department, member, period_task, verification,gpt,daily_task,item,ability_assessment, honor, notification
+from . import daily_report, department, member, period_task, verification,gpt,daily_task,item,ability_assessment, honor, notification, llm_cache, job_lease, job_run, daily_score_rollup, daily_task_checkpoint
 from .department import Department
 from .member import Member
 from .notification import Notification, NotificationType
@@ -16,6 +16,8 @@ def dev_init(app: Flask) -> None:
         with app.app_context():
             upgrade(revision="head")  # 更新db结构
             revision(message="init", autogenerate=True)
+            # 应用刚生成的迁移，新增的表、列与索引在本次启动即生效
+            upgrade(revision="head")
 
             # 创建主要部门 - 开发组
             with CRUD(Department, name="开发组") as d:
@@ -10,6 +10,7 @@ from sqlalchemy import (
     Column,
     DateTime,
     ForeignKey,
+    Index,
     Integer,
     String,
     Text,
@@ -51,5 +52,8 @@ class DailyReport(db.Model):
     # 更新时间，UTC
     updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
 
+    # 按成员与日期范围查询日报
+    __table_args__ = (Index("ix_daily_reports_user_created", "user_id", "created_at"),)
+
     def __repr__(self) -> str:
         return f"<DailyReport report_id={self.report_id}, user_id={self.user_id}>"
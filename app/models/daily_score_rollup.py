@@ -0,0 +1,42 @@
+"""
+模型对象：每日评分汇总
+每个成员每天一行，在日报评价完成时增量更新，供按日期范围读取评分的统计接口使用
+"""
+
+from sqlalchemy import Column, Date, DateTime, ForeignKey, Index, Integer, String, func
+
+from app.modules.sql import db
+
+
+class DailyScoreRollup(db.Model):
+    __tablename__ = "daily_score_rollup"
+
+    # 成员ID
+    user_id = Column(String(20), ForeignKey("members.id", ondelete="CASCADE"), primary_key=True)
+    # 日报所属日期
+    score_date = Column(Date, primary_key=True)
+    # 对应的日报ID
+    report_id = Column(String(36), nullable=False)
+    # 对应日报的创建时间，同一天有多份日报时只保留最新的一份
+    report_created_at = Column(DateTime)
+    # 基本分
+    basic_score = Column(Integer)
+    # 超额分
+    excess_score = Column(Integer)
+    # 额外分
+    extra_score = Column(Integer)
+    # 效率
+    efficiency = Column(Integer)
+    # 创新性
+    innovation = Column(Integer)
+    # 更新时间
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
+
+    __table_args__ = (Index("ix_daily_score_rollup_date_user", "score_date", "user_id"),)
+
+    @property
+    def total_score(self) -> int:
+        return (self.basic_score or 0) + (self.excess_score or 0) + (self.extra_score or 0)
+
+    def __repr__(self) -> str:
+        return f"<DailyScoreRollup user_id={self.user_id}, score_date={self.score_date}>"
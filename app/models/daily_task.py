@@ -1,5 +1,5 @@
 import uuid
-from sqlalchemy import Column, DateTime, ForeignKey, String, Text, func
+from sqlalchemy import Column, Date, DateTime, ForeignKey, Index, String, Text, UniqueConstraint, func
 from sqlalchemy.orm import relationship
 from app.modules.sql import db
 
@@ -16,6 +16,8 @@ class DailyTask(db.Model):
     assignee_id = Column(String(20), ForeignKey("members.id"), nullable=False)
     # 任务日期
     task_date = Column(DateTime, nullable=False)
+    # 任务所属的日期，与周期任务ID唯一，保证每个周期任务每天只有一个每日任务；该列加入前的重复任务中只有最早的一个有值
+    task_day = Column(Date)
     # 基本任务需求
     basic_task_requirements = Column(Text, nullable=False)
     # 详细任务需求
@@ -26,6 +28,13 @@ class DailyTask(db.Model):
     created_at = Column(DateTime, default=func.now())
     # 更新时间
     updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
+
+    # 按成员或周期任务查询某天的每日任务
+    __table_args__ = (
+        Index("ix_daily_tasks_assignee_date", "assignee_id", "task_date"),
+        Index("ix_daily_tasks_period_date", "period_task_id", "task_date"),
+        UniqueConstraint("period_task_id", "task_day", name="uq_daily_tasks_period_day"),
+    )
     
     # 关系
     period_task = relationship("PeriodTask", backref="daily_tasks")
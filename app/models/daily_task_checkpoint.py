@@ -0,0 +1,33 @@
+"""
+模型对象：每日任务生成检查点
+每次批量生成中每个周期任务一行，LLM生成的内容在写入每日任务前先保存在这里，
+中断后重新执行时已生成的内容不会再次调用LLM
+"""
+
+from sqlalchemy import Boolean, Column, Date, DateTime, String, Text, func
+
+from app.modules.sql import db
+
+
+class DailyTaskCheckpoint(db.Model):
+    __tablename__ = "daily_task_checkpoints"
+
+    # 生成日期
+    run_date = Column(Date, primary_key=True)
+    # 周期任务ID
+    period_task_id = Column(String(36), primary_key=True)
+    # 需完成者ID
+    assignee_id = Column(String(20), nullable=False)
+    # 生成的任务概要与详细任务
+    basic_task_requirements = Column(Text, nullable=True)
+    detail_task_requirements = Column(Text, nullable=True)
+    # 是否沿用最近一天未完成的任务
+    is_continued = Column(Boolean, nullable=False, default=False)
+    # 状态：generated、inserted、failed
+    status = Column(String(20), nullable=False, default="generated")
+    # 失败时的错误信息
+    error = Column(Text, nullable=True)
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
+
+    def __repr__(self) -> str:
+        return f"<DailyTaskCheckpoint run_date={self.run_date}, period_task_id={self.period_task_id}, status={self.status}>"
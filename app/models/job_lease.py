@@ -0,0 +1,46 @@
+"""
+模型对象：定时任务租约
+每个定时任务一行，记录当前持有者、租约到期时间以及最近一次执行的耗时与结果
+"""
+
+from sqlalchemy import Column, DateTime, Float, String
+
+from app.modules.sql import db
+
+
+class JobLease(db.Model):
+    __tablename__ = "job_leases"
+
+    # 定时任务id
+    job_id = Column(String(100), primary_key=True)
+    # 当前持有者（主机名:进程号），未被持有时为空
+    holder = Column(String(100), nullable=True)
+    # 获得租约的时间
+    acquired_at = Column(DateTime, nullable=True)
+    # 租约到期时间，持有者崩溃后租约到期即可被其他进程获取
+    expires_at = Column(DateTime, nullable=True)
+    # 最近一次执行的持有者
+    last_holder = Column(String(100), nullable=True)
+    # 最近一次执行的开始与结束时间
+    last_started_at = Column(DateTime, nullable=True)
+    last_finished_at = Column(DateTime, nullable=True)
+    # 最近一次执行的耗时（秒）
+    last_duration = Column(Float, nullable=True)
+    # 最近一次执行的结果：success、failed
+    last_status = Column(String(20), nullable=True)
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.job_id,
+            "holder": self.holder,
+            "acquired_at": self.acquired_at.isoformat() if self.acquired_at else None,
+            "expires_at": self.expires_at.isoformat() if self.expires_at else None,
+            "last_holder": self.last_holder,
+            "last_started_at": self.last_started_at.isoformat() if self.last_started_at else None,
+            "last_finished_at": self.last_finished_at.isoformat() if self.last_finished_at else None,
+            "last_duration": self.last_duration,
+            "last_status": self.last_status,
+        }
+
+    def __repr__(self) -> str:
+        return f"<JobLease job_id={self.job_id}, holder={self.holder}>"
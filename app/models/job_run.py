@@ -0,0 +1,53 @@
+"""
+模型对象：后台任务执行记录
+记录后台任务每次执行的状态、进度与结果，供任务状态接口查询
+"""
+
+import uuid
+
+from sqlalchemy import JSON, Column, DateTime, Integer, String, Text, func
+
+from app.modules.sql import db
+
+
+class JobRun(db.Model):
+    __tablename__ = "job_runs"
+
+    # 执行记录ID
+    run_id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    # 任务id
+    job_id = Column(String(100), nullable=False, index=True)
+    # 状态：pending、running、success、failed
+    status = Column(String(20), nullable=False, default="pending")
+    # 已处理数量与总数
+    progress_done = Column(Integer, nullable=False, default=0)
+    progress_total = Column(Integer, nullable=True)
+    # 最近一条进度说明
+    message = Column(String(255), nullable=True)
+    # 执行结果
+    result = Column(JSON, nullable=True)
+    # 失败时的错误信息
+    error = Column(Text, nullable=True)
+    # 执行者（主机名:进程号）
+    holder = Column(String(100), nullable=True)
+    created_at = Column(DateTime, default=func.now(), index=True)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
+    def to_dict(self) -> dict:
+        return {
+            "run_id": self.run_id,
+            "job_id": self.job_id,
+            "status": self.status,
+            "progress": {"done": self.progress_done, "total": self.progress_total},
+            "message": self.message,
+            "result": self.result,
+            "error": self.error,
+            "holder": self.holder,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+        }
+
+    def __repr__(self) -> str:
+        return f"<JobRun run_id={self.run_id}, job_id={self.job_id}, status={self.status}>"
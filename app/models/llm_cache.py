@@ -0,0 +1,26 @@
+"""
+模型对象：LLM响应缓存
+以请求内容的SHA-256为键持久化LLM的回复
+"""
+
+from sqlalchemy import JSON, Column, DateTime, String, func
+
+from app.modules.sql import db
+
+
+class LLMCacheEntry(db.Model):
+    __tablename__ = "llm_cache"
+
+    # 请求内容的SHA-256摘要
+    cache_key = Column(String(64), primary_key=True)
+    # 使用的模型
+    model = Column(String(50), nullable=True)
+    # 缓存的回复，字符串或字典
+    response = Column(JSON, nullable=False)
+    # 创建时间
+    created_at = Column(DateTime, default=func.now(), index=True)
+    # 过期时间
+    expires_at = Column(DateTime, nullable=False, index=True)
+
+    def __repr__(self) -> str:
+        return f"<LLMCacheEntry cache_key={self.cache_key}, model={self.model}>"
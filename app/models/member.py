@@ -90,12 +90,15 @@ class Member(db.Model):
 
     def to_dict(self) -> dict[str, Any]:
         """将实例信息输出为不包含敏感字符与特别效果的字典"""
+        # 部门信息从进程内的部门树缓存读取，避免逐个成员懒加载部门与父部门
+        from app.utils.department_tree import department_tree
+
         department = ""
         parent_department = ""
-        if self.department_id:
-            department = self.department.name
-            if self.department.parent:
-                parent_department = self.department.parent.name
+        if node := department_tree.get(self.department_id):
+            department = node.name
+            if parent := department_tree.get(node.parent_id):
+                parent_department = parent.name
 
         return {
             "id": self.id,
@@ -4,7 +4,7 @@
 """
 
 import uuid
-from sqlalchemy import Column, DateTime, ForeignKey, String, Text, Boolean, func, Enum
+from sqlalchemy import Column, DateTime, ForeignKey, Index, String, Text, Boolean, func, Enum
 import enum
 from app.modules.sql import db
 
@@ -33,8 +33,14 @@ class Notification(db.Model):
     resource_id = Column(String(36), nullable=True)
     # 是否已读
     is_read = Column(Boolean, default=False)
-    # 创建时间
-    created_at = Column(DateTime, default=func.now())
+    # 创建时间，按月分区时是主键的一部分，因此不可为空
+    created_at = Column(DateTime, nullable=False, default=func.now(), server_default=func.now())
+
+    # 按接收者与已读状态查询并按时间排序；按接收者游标分页
+    __table_args__ = (
+        Index("ix_notifications_receiver_read_created", "receiver_id", "is_read", "created_at"),
+        Index("ix_notifications_receiver_created", "receiver_id", "created_at", "notification_id"),
+    )
     
     def __repr__(self) -> str:
         return f"<Notification notification_id={self.notification_id}, receiver_id={self.receiver_id}, type={self.notification_type.value}>"
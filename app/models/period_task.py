@@ -4,7 +4,7 @@
 
 import uuid
 
-from sqlalchemy import Column, DateTime, ForeignKey, String, Text, func
+from sqlalchemy import Column, DateTime, Float, ForeignKey, Index, String, Text, func
 from sqlalchemy.orm import relationship
 
 from app.modules.sql import db
@@ -31,6 +31,8 @@ class PeriodTask(db.Model):
     completed_task_description = Column(Text)
     # 任务评价
     task_review = Column(Text)
+    # 任务到期后计算的最终得分
+    final_score = Column(Float, nullable=True)
     # 更新者ID
     updated_by = Column(String(20), ForeignKey("members.id"), nullable=True)
     # 创建时间，UTC
@@ -38,6 +40,11 @@ class PeriodTask(db.Model):
     # 更新时间，UTC
     updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
 
+    # 按成员查询进行中的周期任务
+    __table_args__ = (
+        Index("ix_period_tasks_assignee_time", "assignee_id", "start_time", "end_time"),
+    )
+
     assigner = relationship(
         "Member", foreign_keys=[assigner_id], backref="assigned_tasks"
     )
@@ -0,0 +1,140 @@
+"""
+LLM请求的图片负载
+将日报图片缩放并重新编码后按文件摘要缓存在磁盘上，并以流的方式将其写入请求体，
+无论一次请求附带多少张图片，内存中都不会出现完整的base64字符串
+"""
+
+import json
+import os
+import uuid
+from base64 import b64encode
+from tempfile import SpooledTemporaryFile
+from typing import Iterator
+
+from PIL import Image, ImageOps
+
+from app.modules.llm_cache import file_digest
+from app.utils.constant import LocalPath as Local
+from app.utils.logger import Log
+from config import Config
+
+# 每次读取的字节数，必须是3的倍数，保证分块编码的base64可以直接拼接
+_CHUNK_SIZE = 3 * 64 * 1024
+
+_MIME_TYPES = {"JPEG": "image/jpeg", "WEBP": "image/webp"}
+
+
+def encode_image(image_path: str) -> tuple[str, str]:
+    """将图片缩放至模型适用的最长边并重新编码，结果按原图摘要缓存在磁盘上
+    Args:
+        image_path (str): 原图的本地路径
+    Returns:
+        tuple[str, str]: 编码后图片的本地路径与其MIME类型
+    """
+    image_format = Config.LLM_IMAGE_FORMAT
+    max_edge = Config.LLM_IMAGE_MAX_EDGE
+    digest = file_digest(image_path)
+    cache_path = os.path.join(
+        Local.LLM_IMAGE_CACHE, f"{digest}-{max_edge}.{image_format.lower()}"
+    )
+
+    if not os.path.exists(cache_path):
+        os.makedirs(Local.LLM_IMAGE_CACHE, exist_ok=True)
+        # 先写入临时文件再重命名，避免并发请求读到未写完的缓存
+        tmp_path = f"{cache_path}.{uuid.uuid4().hex}.tmp"
+        with Image.open(image_path) as img:
+            # JPEG可在解码阶段直接降采样，避免解码出完整分辨率的位图
+            img.draft("RGB", (max_edge, max_edge))
+            img = ImageOps.exif_transpose(img)
+            if img.mode != "RGB":
+                img = img.convert("RGB")
+            img.thumbnail((max_edge, max_edge))
+            img.save(tmp_path, image_format, quality=Config.LLM_IMAGE_QUALITY)
+        os.replace(tmp_path, cache_path)
+
+    return cache_path, _MIME_TYPES.get(image_format, "image/jpeg")
+
+
+def iter_base64(path: str) -> Iterator[str]:
+    """分块读取文件并逐块产出base64文本"""
+    with open(path, "rb") as f:
+        while chunk := f.read(_CHUNK_SIZE):
+            yield b64encode(chunk).decode("ascii")
+
+
+def image_data_url(image_path: str) -> str:
+    """返回缩放编码后图片的data URL，用于OpenAI格式的image_url消息"""
+    cache_path, mime = encode_image(image_path)
+    return f"data:{mime};base64," + "".join(iter_base64(cache_path))
+
+
+class RequestBody:
+    """记录已写入字节数的请求体文件
+    内容写入SpooledTemporaryFile，超过max_size后才转存磁盘。
+    requests以len()得到请求体长度并设置Content-Length，不会为计算长度调用fileno()而强制转存磁盘。
+    Args:
+        max_size (int): 保留在内存中的最大字节数
+    """
+
+    def __init__(self, max_size: int) -> None:
+        self._file = SpooledTemporaryFile(max_size=max_size)
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __enter__(self) -> "RequestBody":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def write(self, data: bytes) -> None:
+        self._file.write(data)
+        self._size += len(data)
+
+    def read(self, size: int = -1) -> bytes:
+        return self._file.read(size)
+
+    def seek(self, offset: int, whence: int = 0) -> int:
+        return self._file.seek(offset, whence)
+
+    def tell(self) -> int:
+        return self._file.tell()
+
+    def close(self) -> None:
+        self._file.close()
+
+
+def build_request_body(payload: dict, image_paths: list[str]) -> RequestBody:
+    """以流的方式构造附带图片的JSON请求体
+    图片以 <image>base64</image> 的形式追加在最后一条消息的文本之后，与原有格式一致。
+    请求体超过Config.LLM_BODY_SPOOL_SIZE后才转存磁盘。
+    Args:
+        payload (dict): 不含图片的请求体
+        image_paths (list[str]): 需要附带的图片的本地路径
+    Returns:
+        RequestBody: 已回到开头的请求体，可直接作为requests的data参数
+    """
+    placeholder = f"__images_{uuid.uuid4().hex}__"
+    payload = {**payload, "messages": [dict(m) for m in payload["messages"]]}
+    payload["messages"][-1]["content"] += placeholder
+    prefix, suffix = json.dumps(payload, ensure_ascii=False).split(placeholder, 1)
+
+    body = RequestBody(Config.LLM_BODY_SPOOL_SIZE)
+    body.write(prefix.encode("utf-8"))
+    for image_path in image_paths:
+        try:
+            cache_path, _ = encode_image(image_path)
+        except Exception as e:
+            # 与原有逻辑一致：处理失败的图片被跳过
+            Log.error(f"Error processing image {image_path}: {str(e)}")
+            continue
+        # 换行符在JSON字符串中需转义，base64字符本身无需转义
+        body.write(b"\\n<image>")
+        for part in iter_base64(cache_path):
+            body.write(part.encode("ascii"))
+        body.write(b"</image>")
+    body.write(suffix.encode("utf-8"))
+    body.seek(0)
+    return body
@@ -0,0 +1,155 @@
+"""
+索引顾问
+对登记的高频查询执行EXPLAIN，找出未走索引的全表扫描。
+应在有真实规模数据的库上运行，空表或极小的表上优化器可能直接选择全表扫描。
+
+用法：flask index-advisor
+"""
+
+from datetime import datetime, timedelta
+from typing import Callable
+
+import click
+from sqlalchemy import Select, desc, select
+
+from app.models.daily_report import DailyReport
+from app.models.daily_score_rollup import DailyScoreRollup
+from app.models.daily_task import DailyTask
+from app.models.member import Member
+from app.models.notification import Notification
+from app.models.period_task import PeriodTask
+from app.modules.sql import db
+
+# 名称 -> 根据示例成员id生成查询的函数
+HOT_QUERIES: dict[str, Callable[[str], Select]] = {}
+
+
+def hot_query(name: str) -> Callable:
+    """登记一条高频查询"""
+
+    def decorator(func: Callable[[str], Select]) -> Callable[[str], Select]:
+        HOT_QUERIES[name] = func
+        return func
+
+    return decorator
+
+
+def _today() -> datetime:
+    return datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+@hot_query("daily_report_by_user_day")
+def _daily_report_by_user_day(user_id: str) -> Select:
+    today = _today()
+    return select(DailyReport).where(
+        DailyReport.user_id == user_id,
+        DailyReport.created_at >= today,
+        DailyReport.created_at < today + timedelta(days=1),
+    )
+
+
+@hot_query("daily_task_by_assignee_day")
+def _daily_task_by_assignee_day(user_id: str) -> Select:
+    today = _today()
+    return select(DailyTask).where(
+        DailyTask.assignee_id == user_id,
+        DailyTask.task_date >= today,
+        DailyTask.task_date < today + timedelta(days=1),
+    )
+
+
+@hot_query("daily_task_by_period_day")
+def _daily_task_by_period_day(user_id: str) -> Select:
+    today = _today()
+    period_task_ids = select(PeriodTask.task_id).where(PeriodTask.assignee_id == user_id)
+    return select(DailyTask).where(
+        DailyTask.period_task_id.in_(period_task_ids),
+        DailyTask.task_date >= today,
+        DailyTask.task_date < today + timedelta(days=1),
+    )
+
+
+@hot_query("active_period_tasks_by_assignee")
+def _active_period_tasks_by_assignee(user_id: str) -> Select:
+    now = datetime.now()
+    return select(PeriodTask).where(
+        PeriodTask.assignee_id == user_id,
+        PeriodTask.start_time <= now,
+        PeriodTask.end_time >= now,
+    )
+
+
+@hot_query("unread_notifications")
+def _unread_notifications(user_id: str) -> Select:
+    return (
+        select(Notification)
+        .where(Notification.receiver_id == user_id, Notification.is_read == False)
+        .order_by(desc(Notification.created_at))
+    )
+
+
+@hot_query("notifications_page")
+def _notifications_page(user_id: str) -> Select:
+    return (
+        select(Notification)
+        .where(Notification.receiver_id == user_id)
+        .order_by(desc(Notification.created_at), desc(Notification.notification_id))
+        .limit(20)
+    )
+
+
+@hot_query("daily_scores_by_range")
+def _daily_scores_by_range(user_id: str) -> Select:
+    today = _today().date()
+    return select(DailyScoreRollup).where(
+        DailyScoreRollup.user_id == user_id,
+        DailyScoreRollup.score_date >= today - timedelta(days=6),
+        DailyScoreRollup.score_date <= today,
+    )
+
+
+def explain(query: Select) -> list[dict]:
+    """对查询执行EXPLAIN，返回执行计划的每一行"""
+    connection = db.session.connection()
+    compiled = query.compile(dialect=connection.dialect)
+    params = compiled.construct_params()
+    if compiled.positional:
+        params = tuple(params[name] for name in compiled.positiontup)
+    result = connection.exec_driver_sql(f"EXPLAIN {compiled}", params)
+    return [dict(row._mapping) for row in result]
+
+
+def advise(user_id: str | None = None) -> list[dict]:
+    """对所有登记的高频查询执行EXPLAIN
+    Args:
+        user_id (str, optional): 代入查询的成员id，默认取任意一名成员
+    Returns:
+        list[dict]: 每条查询的名称、执行计划与是否存在全表扫描
+    """
+    if user_id is None:
+        user_id = db.session.execute(select(Member.id).limit(1)).scalar() or ""
+
+    reports = []
+    for name, build in HOT_QUERIES.items():
+        plan = explain(build(user_id))
+        full_scans = [row.get("table") for row in plan if row.get("type") == "ALL"]
+        reports.append({"name": name, "plan": plan, "full_scans": full_scans})
+    return reports
+
+
+@click.command("index-advisor")
+@click.option("--user-id", default=None, help="代入查询的成员id，默认取任意一名成员")
+def index_advisor_command(user_id: str | None) -> None:
+    """对高频查询执行EXPLAIN并标出全表扫描"""
+    reports = advise(user_id)
+    for report in reports:
+        flag = "FULL SCAN" if report["full_scans"] else "ok"
+        click.echo(f"[{flag}] {report['name']}")
+        for row in report["plan"]:
+            click.echo(
+                f"    table={row.get('table')} type={row.get('type')} "
+                f"key={row.get('key')} rows={row.get('rows')} extra={row.get('Extra')}"
+            )
+
+    if flagged := [report["name"] for report in reports if report["full_scans"]]:
+        raise click.ClickException(f"以下查询存在全表扫描: {', '.join(flagged)}")
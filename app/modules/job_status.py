@@ -0,0 +1,108 @@
+"""
+后台任务状态
+后台任务在共用线程池中以应用上下文执行，执行状态、进度与结果写入job_runs表，
+调用方立即拿到run_id，之后通过任务状态接口查询，而不是阻塞等待HTTP响应。
+状态更新使用独立的连接提交，不会提前提交任务自身在db.session中未完成的修改。
+"""
+
+import json
+import uuid
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Any, Callable
+
+from sqlalchemy import insert, update
+
+from app.models.job_run import JobRun
+from app.modules.lease import HOLDER_ID
+from app.modules.runtime import runtime
+from app.modules.sql import db
+from app.utils.logger import Log
+from app.utils.response import Response
+
+# 当前线程正在执行的run_id，供report_progress使用
+_current_run: ContextVar[str | None] = ContextVar("current_job_run", default=None)
+
+
+def _write(run_id: str, **values) -> None:
+    with db.engine.begin() as connection:
+        connection.execute(
+            update(JobRun.__table__).where(JobRun.run_id == run_id).values(**values)
+        )
+
+
+def _jsonable(value: Any) -> Any:
+    if isinstance(value, Response):
+        value = {"status": str(value.status_obj), "message": str(value.message), "data": value.data}
+    return json.loads(json.dumps(value, ensure_ascii=False, default=str))
+
+
+def create_run(job_id: str) -> str:
+    """创建一条待执行的记录并返回其run_id"""
+    run_id = str(uuid.uuid4())
+    with db.engine.begin() as connection:
+        connection.execute(
+            insert(JobRun.__table__).values(
+                run_id=run_id, job_id=job_id, status="pending", progress_done=0,
+                created_at=datetime.now(),
+            )
+        )
+    return run_id
+
+
+def report_progress(done: int, total: int | None = None, message: str | None = None) -> None:
+    """汇报当前后台任务的进度，不在后台任务中调用时不做任何事"""
+    if not (run_id := _current_run.get()):
+        return
+    values = {"progress_done": done}
+    if total is not None:
+        values["progress_total"] = total
+    if message is not None:
+        values["message"] = message[:255]
+    try:
+        _write(run_id, **values)
+    except Exception as e:
+        Log.error(f"更新任务 {run_id} 的进度失败: {e}")
+
+
+def run_tracked(run_id: str, func: Callable[..., Any], *args, **kwargs) -> Any:
+    """执行函数并将状态、结果写入执行记录，返回值为Response时以其状态判断成败"""
+    _write(run_id, status="running", holder=HOLDER_ID, started_at=datetime.now())
+    token = _current_run.set(run_id)
+    try:
+        result = func(*args, **kwargs)
+    except Exception as e:
+        _write(run_id, status="failed", error=str(e), finished_at=datetime.now())
+        raise
+    finally:
+        _current_run.reset(token)
+
+    ok = not isinstance(result, Response) or result.status_obj in (None, Response.r.OK)
+    _write(
+        run_id,
+        status="success" if ok else "failed",
+        result=_jsonable(result),
+        finished_at=datetime.now(),
+    )
+    return result
+
+
+def start_background(job_id: str, func: Callable[..., Any], *args, **kwargs) -> str:
+    """在共用线程池中异步执行函数，立即返回run_id"""
+    run_id = create_run(job_id)
+    runtime.submit(run_tracked, run_id, func, *args, **kwargs)
+    return run_id
+
+
+def get_run(run_id: str) -> dict | None:
+    """查询执行记录"""
+    run = db.session.get(JobRun, run_id)
+    return run.to_dict() if run else None
+
+
+def list_runs(job_id: str | None = None, limit: int = 20) -> list[dict]:
+    """按创建时间倒序列出执行记录"""
+    query = JobRun.query
+    if job_id:
+        query = query.filter(JobRun.job_id == job_id)
+    return [run.to_dict() for run in query.order_by(JobRun.created_at.desc()).limit(limit)]
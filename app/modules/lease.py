@@ -0,0 +1,108 @@
+"""
+定时任务租约锁
+基于数据库中的job_leases表，多个进程或多台机器执行同一定时任务前需先获得其租约，
+租约带有到期时间，持有者崩溃后不会永久占用。
+"""
+
+import os
+import socket
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Iterator
+
+from sqlalchemy import or_, update
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+
+from app.models.job_lease import JobLease
+from app.modules.sql import db
+from app.utils.logger import Log
+from config import Config
+
+# 当前进程的持有者标识
+HOLDER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+
+def acquire_lease(job_id: str, ttl: timedelta | None = None) -> bool:
+    """尝试获取任务的租约，租约空闲、已过期或已由本进程持有时成功
+    Args:
+        job_id (str): 任务id
+        ttl (timedelta, optional): 租约有效期，默认为Config.JOB_LEASE_TTL
+    Returns:
+        bool: 是否获得租约
+    """
+    now = datetime.now()
+    ttl = ttl or Config.JOB_LEASE_TTL
+    lease = JobLease.__table__
+    try:
+        # 使用独立的连接与事务，不提交也不受任务所在db.session中的状态影响
+        with db.engine.begin() as connection:
+            connection.execute(mysql_insert(lease).prefix_with("IGNORE").values(job_id=job_id))
+            # 条件更新在数据库中原子执行，只有一个进程能更新成功
+            result = connection.execute(
+                update(lease)
+                .where(
+                    lease.c.job_id == job_id,
+                    or_(
+                        lease.c.holder.is_(None),
+                        lease.c.expires_at < now,
+                        lease.c.holder == HOLDER_ID,
+                    ),
+                )
+                .values(holder=HOLDER_ID, acquired_at=now, expires_at=now + ttl)
+            )
+        return result.rowcount == 1
+    except Exception as e:
+        Log.error(f"获取任务 {job_id} 的租约失败: {e}")
+        return False
+
+
+def release_lease(job_id: str, started_at: datetime, duration: float, status: str) -> None:
+    """释放本进程持有的租约，并记录本次执行的耗时与结果
+    与acquire_lease相同使用独立的事务，任务的db.session处于失败状态或有未提交的修改时也能释放，且不会提交这些修改
+    """
+    lease = JobLease.__table__
+    try:
+        with db.engine.begin() as connection:
+            connection.execute(
+                update(lease)
+                .where(lease.c.job_id == job_id, lease.c.holder == HOLDER_ID)
+                .values(
+                    holder=None,
+                    expires_at=None,
+                    last_holder=HOLDER_ID,
+                    last_started_at=started_at,
+                    last_finished_at=datetime.now(),
+                    last_duration=round(duration, 3),
+                    last_status=status,
+                )
+            )
+    except Exception as e:
+        Log.error(f"释放任务 {job_id} 的租约失败: {e}")
+
+
+@contextmanager
+def job_lease(job_id: str, ttl: timedelta | None = None) -> Iterator[bool]:
+    """在租约保护下执行任务，产出是否获得租约；获得时在退出后释放并记录耗时
+    Examples:
+        with job_lease("member_score_updater") as acquired:
+            if acquired:
+                ...
+    """
+    if not acquire_lease(job_id, ttl):
+        yield False
+        return
+
+    started_at = datetime.now()
+    start = time.monotonic()
+    status = "failed"
+    try:
+        yield True
+        status = "success"
+    finally:
+        release_lease(job_id, started_at, time.monotonic() - start, status)
+
+
+def get_leases() -> dict[str, dict]:
+    """返回所有任务的租约信息，以任务id为键"""
+    return {lease.job_id: lease.to_dict() for lease in JobLease.query.all()}
@@ -1,11 +1,15 @@
 import json
-from base64 import b64encode
+import time
 from typing import Callable, Literal, Optional, Any
-import requests
 import re
+import requests
 from openai import OpenAI
 
 from app.models.llm_record import LLMRecord
+from app.modules.image_payload import build_request_body, image_data_url
+from app.modules.llm_cache import file_digest, llm_cache
+from app.modules.llm_pool import get_rate_limiter
+from app.modules.llm_transport import backoff_delay, transport
 from app.utils.database import CRUD
 from app.utils.logger import Log
 from config import Config
@@ -25,8 +29,8 @@ class DeepSeekClient:
             "Content-Type": "application/json"
         }
     
-    def chat_completion_create(self, model, messages, **kwargs):
-        """创建聊天补全"""
+    def chat_completion_create(self, model, messages, images=None, **kwargs):
+        """创建聊天补全，images为需要附带在最后一条消息中的图片路径"""
         url = f"{self.base_url}/chat/completions"
         data = {
             "model": model,
@@ -34,8 +38,16 @@ class DeepSeekClient:
             **kwargs
         }
         
+        if limiter := get_rate_limiter("deepseek"):
+            limiter.acquire()
+
         Log.info(f"Sending request to DeepSeek API: {json.dumps(data, ensure_ascii=False)}")
-        response = requests.post(url, json=data, headers=self.headers)
+        if images:
+            # 附带图片时以流的方式构造请求体，避免在内存中拼接完整的base64字符串
+            with build_request_body(data, images) as body:
+                response = transport.post(url, data=body, headers=self.headers)
+        else:
+            response = transport.post(url, json=data, headers=self.headers)
         Log.info(f"DeepSeek API response status: {response.status_code}")
         Log.info(f"DeepSeek API response: {response.text}")
         response.raise_for_status()
@@ -43,54 +55,8 @@ class DeepSeekClient:
 
 deepseek_client = DeepSeekClient(api_key)
 
-def create_completion(
-    send_text: str,
-    user_id: str,
-    method: Literal["report", "task"],
-    send_images: list[str] | None = None,
-    model_name: str = "deepseek-chat",
-    dictionary_like: bool = False,
-    response_format: Optional[Any] = None,
-    retries: int = 0,
-    **kwargs,
-) -> str | dict:
-    """向LLM发送对话请求，每次请求会被记录
-    Args:
-        send_text (str): 要发送的文本。
-        user_id (str): 调用者id。
-        method (Literal[&quot;report&quot;, &quot;task&quot;]): 该调用用于什么方面，仅提供日报或任务选项。
-        send_images (list[str] | None, optional): 需要发送的图片的本地路径，可选。
-        model_name (str, optional): DeepSeek 模型名称，默认为 "deepseek-chat"。
-        dictionary_like (bool, optional): 是否以字典形式输出回复。
-        response_format (Optional[Any], optional): 期望的响应格式。
-        **kwargs: LLM的参数调整
-    Returns:
-        (str | dict): 返回的回复，字符串或字典
-    """
-    reply = ""
-    err = None
-    try:
-        if not send_images:
-            send_images = []
-        
-        # 准备消息内容
-        message_content = send_text
-        if send_images:
-            # 将图片转换为base64并添加到消息中
-            image_contents = []
-            for image_path in send_images:
-                try:
-                    with open(image_path, "rb") as image:
-                        base64_image = b64encode(image.read()).decode('utf-8')
-                        image_contents.append(f"<image>{base64_image}</image>")
-                except Exception as e:
-                    Log.error(f"Error processing image {image_path}: {str(e)}")
-            
-            # 将文本和图片组合
-            message_content = message_content + "\n" + "\n".join(image_contents)
-        
-        # 构建系统提示
-        system_content = """你是一个专业的学习评估助手。请严格按照以下JSON格式返回评估结果，确保所有字段都存在且格式正确。不要添加任何其他解释或前缀。直接返回JSON对象：
+# 日报评分的系统提示
+REVIEW_SYSTEM_PROMPT = """你是一个专业的学习评估助手。请严格按照以下JSON格式返回评估结果，确保所有字段都存在且格式正确。不要添加任何其他解释或前缀。直接返回JSON对象：
 {
     "basic": { 
         "review": "每日任务完成情况的详细评价",
@@ -118,119 +84,131 @@ def create_completion(
     }
 }"""
 
-        messages = [
-            {
-                "role": "system",
-                "content": system_content
-            },
-            {
-                "role": "user",
-                "content": message_content
-            }
-        ]
-        
-        # 设置默认参数
-        default_params = {
-            "model": model_name,
-            "messages": messages,
-            "temperature": 0.3,  # 默认温度
-            "max_tokens": 2000,  # 默认最大token数
+def create_completion(
+    send_text: str,
+    user_id: str,
+    method: Literal["report", "task"],
+    send_images: list[str] | None = None,
+    model_name: str = "deepseek-chat",
+    dictionary_like: bool = False,
+    response_format: Optional[Any] = None,
+    retries: int = 0,
+    use_cache: bool = True,
+    **kwargs,
+) -> str | dict:
+    """向LLM发送对话请求，每次请求会被记录
+    Args:
+        send_text (str): 要发送的文本。
+        user_id (str): 调用者id。
+        method (Literal[&quot;report&quot;, &quot;task&quot;]): 该调用用于什么方面，仅提供日报或任务选项。
+        send_images (list[str] | None, optional): 需要发送的图片的本地路径，可选。
+        model_name (str, optional): DeepSeek 模型名称，默认为 "deepseek-chat"。
+        dictionary_like (bool, optional): 是否以字典形式输出回复。
+        response_format (Optional[Any], optional): 期望的响应格式。
+        use_cache (bool, optional): 是否使用按请求内容哈希的响应缓存，命中时不再调用LLM。生成任务、总结等每次需要新内容的调用应传入False。
+        **kwargs: LLM的参数调整
+    Returns:
+        (str | dict): 返回的回复，字符串或字典
+    """
+    if not send_images:
+        send_images = []
+
+    # 在编码图片之前计算缓存键，命中时无需读取和编码图片
+    cache_key = None
+    if use_cache:
+        try:
+            cache_key = llm_cache.make_key(
+                model=model_name,
+                messages=[REVIEW_SYSTEM_PROMPT, send_text],
+                temperature=kwargs.get("temperature", 0.3),
+                max_tokens=kwargs.get("max_tokens", 2000),
+                image_digests=[file_digest(path) for path in send_images],
+                dictionary_like=dictionary_like,
+                **{k: v for k, v in kwargs.items() if k not in ("temperature", "max_tokens")},
+            )
+        except OSError as e:
+            Log.error(f"计算LLM缓存键失败: {e}")
+        if cache_key and (cached := llm_cache.get(cache_key)) is not None:
+            Log.info(f"LLM缓存命中: {cache_key}")
+            return cached
+
+    messages = [
+        {
+            "role": "system",
+            "content": REVIEW_SYSTEM_PROMPT
+        },
+        {
+            "role": "user",
+            "content": send_text
         }
-        
-        # 使用传入的参数覆盖默认参数
-        params = {**default_params, **kwargs}
-        
-        # 调用DeepSeek API
-        response = deepseek_client.chat_completion_create(**params)
-        
-        reply = response["choices"][0]["message"]["content"]
-        Log.info(f"Raw reply from DeepSeek: {reply}")
-        
+    ]
+    
+    # 设置默认参数
+    default_params = {
+        "model": model_name,
+        "messages": messages,
+        "temperature": 0.3,  # 默认温度
+        "max_tokens": 2000,  # 默认最大token数
+    }
+    
+    # 使用传入的参数覆盖默认参数
+    params = {**default_params, **kwargs}
+
+    reply = ""
+    err = None
+    # 回复为空或无法解析时以指数退避加抖动的方式重试，而不是递归调用自身
+    for attempt in range(retries, Config.LLM_MAX_RETRY_TIMES + 1):
+        if attempt > retries:
+            delay = backoff_delay(attempt - retries - 1)
+            Log.info(f"尝试重试 ({attempt}/{Config.LLM_MAX_RETRY_TIMES})，等待 {delay:.2f} 秒")
+            time.sleep(delay)
+
+        reply = ""
+        err = None
+        try:
+            # 调用DeepSeek API
+            # 图片在发送时才以流的方式写入请求体
+            response = deepseek_client.chat_completion_create(**params, images=send_images)
+            reply = response["choices"][0]["message"]["content"]
+            Log.info(f"Raw reply from DeepSeek: {reply}")
+        except requests.RequestException as e:
+            # 网络错误与暂时性状态码已在传输层退避重试，这里不再叠加重试
+            err = e
+            Log.error(f"Failed while get reply from DeepSeek: {str(e)}")
+            Log.error(f"Error details: {e.__class__.__name__}")
+            break
+        except Exception as e:
+            err = e
+            Log.error(f"Failed while get reply from DeepSeek: {str(e)}")
+            Log.error(f"Error details: {e.__class__.__name__}")
+            continue
+
+        if not reply:
+            continue
+
         if dictionary_like:
             try:
-                # 提取和清理JSON内容
-                cleaned_json = extract_json(reply)
-                Log.info(f"Cleaned JSON: {cleaned_json}")
-                reply_dict = json.loads(cleaned_json)
-                Log.info(f"Parsed reply dict: {json.dumps(reply_dict, ensure_ascii=False)}")
-                
-                # 验证所有必需的字段
-                required_fields = ["basic", "excess", "extra", "efficiency", "innovation", "total"]
-                for field in required_fields:
-                    if field not in reply_dict:
-                        raise ValueError(f"Missing required field: {field}")
-                    if "review" not in reply_dict[field] or "score" not in reply_dict[field]:
-                        raise ValueError(f"Missing review or score in {field}")
-                    
-                    # 确保分数是整数并在正确范围内
-                    try:
-                        score = int(float(reply_dict[field]["score"]))
-                        if field == "basic":
-                            score = max(0, min(100, score))
-                        elif field == "excess":
-                            score = max(0, min(10, score))
-                        elif field == "extra":
-                            score = max(0, min(5, score))
-                        elif field in ["efficiency", "innovation"]:
-                            score = max(0, min(100, score))
-                        reply_dict[field]["score"] = score
-                    except (ValueError, TypeError) as e:
-                        Log.error(f"Error converting score to int for {field}: {e}")
-                        reply_dict[field]["score"] = 0
-                
-                # 计算总分
-                total_score = (
-                    reply_dict["basic"]["score"] +
-                    reply_dict["excess"]["score"] +
-                    reply_dict["extra"]["score"]
-                )
-                reply_dict["total"]["score"] = total_score
-                
-                reply = reply_dict
+                reply = parse_review_reply(reply)
                 Log.info(f"Final processed reply: {json.dumps(reply, ensure_ascii=False)}")
-                
             except (json.JSONDecodeError, ValueError) as e:
                 Log.error(f"JSON解析错误: {e}, 原始内容: {reply[:200]}...")
-                if retries < Config.LLM_MAX_RETRY_TIMES:
-                    Log.info(f"尝试重试 ({retries+1}/{Config.LLM_MAX_RETRY_TIMES})")
-                    return create_completion(
-                        send_text,
-                        user_id,
-                        method,
-                        send_images,
-                        model_name,
-                        dictionary_like,
-                        response_format,
-                        retries + 1,
-                        **kwargs
-                    )
-                # 如果达到最大重试次数，返回默认评分
-                return {
-                    "basic": {"review": "评分生成失败", "score": 60},
-                    "excess": {"review": "评分生成失败", "score": 0},
-                    "extra": {"review": "评分生成失败", "score": 0},
-                    "efficiency": {"review": "评分生成失败", "score": 60},
-                    "innovation": {"review": "评分生成失败", "score": 60},
-                    "total": {"review": "评分生成失败", "score": 60}
-                }
+                reply = ""
+                continue
+        break
 
-    except Exception as e:
-        err = e
-        Log.error(f"Failed while get reply from DeepSeek: {str(e)}")
-        Log.error(f"Error details: {e.__class__.__name__}")
+    if dictionary_like and not reply:
+        # 如果达到最大重试次数，返回默认评分
+        return {
+            "basic": {"review": "评分生成失败", "score": 60},
+            "excess": {"review": "评分生成失败", "score": 0},
+            "extra": {"review": "评分生成失败", "score": 0},
+            "efficiency": {"review": "评分生成失败", "score": 60},
+            "innovation": {"review": "评分生成失败", "score": 60},
+            "total": {"review": "评分生成失败", "score": 60}
+        }
 
-    if err or ((not reply) and retries <= Config.LLM_MAX_RETRY_TIMES):
-        return create_completion(
-            send_text,
-            user_id,
-            method,
-            send_images,
-            model_name,
-            dictionary_like,
-            response_format,
-            retries + 1,
-            **kwargs
-        )
+    if err:
+        return reply
 
     with CRUD(LLMRecord) as insert:
         insert.add(
@@ -241,23 +219,67 @@ def create_completion(
             request_images=send_images,
         )
 
+    # 所有尝试都得到空回复时不缓存，避免在有效期内一直返回空回复
+    if cache_key and reply:
+        llm_cache.set(cache_key, model_name, reply)
+
     return reply
 
+def parse_review_reply(reply: str) -> dict:
+    """从LLM的回复中解析日报评分，校验字段并将分数限制在各自的范围内
+    Args:
+        reply (str): LLM返回的原始文本
+    Returns:
+        dict: 处理后的评分字典
+    Raises:
+        json.JSONDecodeError: 无法解析为JSON时
+        ValueError: 缺少必需字段时
+    """
+    # 提取和清理JSON内容
+    cleaned_json = extract_json(reply)
+    Log.info(f"Cleaned JSON: {cleaned_json}")
+    reply_dict = json.loads(cleaned_json)
+    Log.info(f"Parsed reply dict: {json.dumps(reply_dict, ensure_ascii=False)}")
+    
+    # 验证所有必需的字段
+    required_fields = ["basic", "excess", "extra", "efficiency", "innovation", "total"]
+    for field in required_fields:
+        if field not in reply_dict:
+            raise ValueError(f"Missing required field: {field}")
+        if "review" not in reply_dict[field] or "score" not in reply_dict[field]:
+            raise ValueError(f"Missing review or score in {field}")
+        
+        # 确保分数是整数并在正确范围内
+        try:
+            score = int(float(reply_dict[field]["score"]))
+            if field == "basic":
+                score = max(0, min(100, score))
+            elif field == "excess":
+                score = max(0, min(10, score))
+            elif field == "extra":
+                score = max(0, min(5, score))
+            elif field in ["efficiency", "innovation"]:
+                score = max(0, min(100, score))
+            reply_dict[field]["score"] = score
+        except (ValueError, TypeError) as e:
+            Log.error(f"Error converting score to int for {field}: {e}")
+            reply_dict[field]["score"] = 0
+    
+    # 计算总分
+    reply_dict["total"]["score"] = (
+        reply_dict["basic"]["score"] +
+        reply_dict["excess"]["score"] +
+        reply_dict["extra"]["score"]
+    )
+    return reply_dict
+
 def openai_image(image_paths: list[str]) -> list:
-    """通过图片路径打开图片，并转为LLM API支持的格式"""
+    """通过图片路径打开图片，缩放编码后转为LLM API支持的格式"""
     images = []
-    template = {"type": "image_url", "image_url": {}}
 
     for image_path in image_paths:
         try:
-            with open(image_path, "rb") as image:
-                image_dict = template.copy()
-                # 将 bytes 转换为 string
-                base64_image = b64encode(image.read()).decode('utf-8')
-                image_dict["image_url"] = {
-                    "url": f"data:image/png;base64,{base64_image}"
-                }
-                images.append(image_dict)
+            images.append({"type": "image_url", "image_url": {"url": image_data_url(image_path)}})
         except Exception as e:
             Log.error(f"Error processing image {image_path}: {str(e)}")
 
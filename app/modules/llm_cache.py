@@ -0,0 +1,180 @@
+"""
+LLM响应缓存
+两级缓存：进程内的LRU与以请求内容SHA-256为键的持久化表，相同的请求不会再次调用LLM
+"""
+
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Iterable
+
+from sqlalchemy import delete, func, select
+from sqlalchemy.orm import Session
+
+from app.models.llm_cache import LLMCacheEntry
+from app.modules.sql import db
+from app.utils.logger import Log
+from config import Config
+
+
+def file_digest(path: str) -> str:
+    """以分块读取的方式计算文件的SHA-256摘要"""
+    with open(path, "rb") as f:
+        return hashlib.file_digest(f, "sha256").hexdigest()
+
+
+class LLMResponseCache:
+    """两级LLM响应缓存
+    Args:
+        memory_size (int): 进程内LRU保留的最大条目数
+        db_max_rows (int): 持久化表保留的最大行数，超出时淘汰最旧的行
+        purge_interval (int): 每写入多少次持久化表执行一次过期与超量清理
+    """
+
+    def __init__(self, memory_size: int, db_max_rows: int, purge_interval: int = 100) -> None:
+        self.memory_size = memory_size
+        self.db_max_rows = db_max_rows
+        self.purge_interval = purge_interval
+
+        self._entries: OrderedDict[str, tuple[datetime, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._writes = 0
+
+        self.memory_hits = 0
+        self.database_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(
+        model: str,
+        messages: list,
+        temperature: float | None = None,
+        max_tokens: int | None = None,
+        image_digests: Iterable[str] = (),
+        **extra: Any,
+    ) -> str:
+        """计算请求内容的SHA-256摘要作为缓存键
+        Args:
+            model (str): 模型名称
+            messages (list): 发送的消息
+            temperature (float, optional): 温度
+            max_tokens (int, optional): 最大token数
+            image_digests (Iterable[str], optional): 附带图片的摘要
+            **extra: 其他会影响回复的参数
+        Returns:
+            str: 64位十六进制摘要
+        """
+        payload = json.dumps(
+            {
+                "model": model,
+                "messages": messages,
+                "temperature": temperature,
+                "max_tokens": max_tokens,
+                "images": list(image_digests),
+                "extra": extra,
+            },
+            ensure_ascii=False,
+            sort_keys=True,
+            default=str,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Any | None:
+        """依次从进程内LRU与持久化表中获取未过期的回复，未命中时返回None"""
+        now = datetime.now()
+        with self._lock:
+            if entry := self._entries.get(key):
+                expires_at, value = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.memory_hits += 1
+                    return value
+                del self._entries[key]
+
+        try:
+            row = LLMCacheEntry.query.filter(
+                LLMCacheEntry.cache_key == key, LLMCacheEntry.expires_at > now
+            ).first()
+        except Exception as e:
+            Log.error(f"读取LLM缓存失败: {e}")
+            row = None
+
+        with self._lock:
+            if row is None:
+                self.misses += 1
+                return None
+            self.database_hits += 1
+            self._remember(key, row.expires_at, row.response)
+        return row.response
+
+    def set(self, key: str, model: str, value: Any) -> None:
+        """同时写入进程内LRU与持久化表，空回复不缓存
+        持久化表使用独立的会话写入，不会提交或回滚调用者会话中的修改
+        """
+        if not value:
+            return
+        expires_at = datetime.now() + Config.LLM_CACHE_TTL
+        with self._lock:
+            self._remember(key, expires_at, value)
+            self._writes += 1
+            need_purge = self._writes % self.purge_interval == 0
+
+        try:
+            with Session(db.engine) as session:
+                session.merge(
+                    LLMCacheEntry(
+                        cache_key=key, model=model, response=value, expires_at=expires_at
+                    )
+                )
+                session.commit()
+                if need_purge:
+                    self.purge(session)
+        except Exception as e:
+            Log.error(f"写入LLM缓存失败: {e}")
+
+    def purge(self, session: Session | None = None) -> None:
+        """删除持久化表中已过期的行，并在超出容量时淘汰最旧的行
+        Args:
+            session (Session, optional): 执行删除的会话，默认新建独立的会话
+        """
+        if session is None:
+            with Session(db.engine) as session:
+                self.purge(session)
+            return
+
+        session.execute(delete(LLMCacheEntry).where(LLMCacheEntry.expires_at <= datetime.now()))
+        surplus = session.scalar(select(func.count()).select_from(LLMCacheEntry)) - self.db_max_rows
+        if surplus > 0:
+            oldest = session.scalars(
+                select(LLMCacheEntry.cache_key).order_by(LLMCacheEntry.created_at.asc()).limit(surplus)
+            ).all()
+            session.execute(delete(LLMCacheEntry).where(LLMCacheEntry.cache_key.in_(oldest)))
+        session.commit()
+
+    def stats(self) -> dict:
+        """返回缓存的命中与未命中计数"""
+        with self._lock:
+            hits = self.memory_hits + self.database_hits
+            total = hits + self.misses
+            return {
+                "memory_hits": self.memory_hits,
+                "database_hits": self.database_hits,
+                "misses": self.misses,
+                "hit_rate": round(hits / total, 4) if total else 0.0,
+                "memory_entries": len(self._entries),
+            }
+
+    def _remember(self, key: str, expires_at: datetime, value: Any) -> None:
+        """写入进程内LRU，超出容量时淘汰最久未使用的条目，调用者需持有锁"""
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.memory_size:
+            self._entries.popitem(last=False)
+
+
+llm_cache = LLMResponseCache(
+    memory_size=Config.LLM_CACHE_MEMORY_SIZE,
+    db_max_rows=Config.LLM_CACHE_DB_MAX_ROWS,
+)
@@ -0,0 +1,86 @@
+"""
+LLM并发调用池
+为夜间批量任务提供有并发上限的线程池，以及按服务商区分的限流器
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Iterable
+
+from flask import current_app
+
+from config import Config
+
+
+class RateLimiter:
+    """线程安全的令牌桶限流器
+    Args:
+        rate (float): 每秒补充的令牌数，即稳定状态下每秒允许的请求数
+        burst (int, optional): 令牌桶容量，即允许的瞬时突发请求数，默认与rate相同
+    """
+
+    def __init__(self, rate: float, burst: int | None = None) -> None:
+        self.rate = rate
+        self.capacity = burst or max(1, int(rate))
+        self._tokens = float(self.capacity)
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """获取一个令牌，令牌不足时阻塞等待"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(
+                    self.capacity, self._tokens + (now - self._updated_at) * self.rate
+                )
+                self._updated_at = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+_rate_limiters: dict[str, RateLimiter] = {}
+_rate_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(provider: str) -> RateLimiter | None:
+    """获取指定服务商的限流器，未配置限流的服务商返回None"""
+    if not (rate := Config.LLM_RATE_LIMITS.get(provider)):
+        return None
+    with _rate_limiters_lock:
+        if provider not in _rate_limiters:
+            _rate_limiters[provider] = RateLimiter(rate)
+        return _rate_limiters[provider]
+
+
+def map_concurrently(
+    func: Callable[..., Any], items: Iterable[Any], max_workers: int | None = None
+) -> list[Any | Exception]:
+    """在有并发上限的线程池中对每个元素执行函数，每个线程都会推入当前应用的上下文
+    Args:
+        func (Callable): 需要执行的函数，接收单个元素作为参数
+        items (Iterable): 需要处理的元素
+        max_workers (int, optional): 最大并发数，默认为Config.LLM_POOL_WORKERS
+    Returns:
+        (list[Any | Exception]): 与输入顺序一致的结果列表，执行失败的元素对应其异常对象
+    """
+    items = list(items)
+    if not items:
+        return []
+
+    app = current_app._get_current_object()
+
+    def run(item: Any) -> Any | Exception:
+        with app.app_context():
+            try:
+                return func(item)
+            except Exception as e:
+                return e
+
+    workers = min(max_workers or Config.LLM_POOL_WORKERS, len(items))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(run, items))
@@ -0,0 +1,109 @@
+"""
+LLM HTTP传输层
+所有对LLM服务商的HTTP请求共用一个带连接池、keep-alive与超时的会话，并以指数退避加抖动的方式重试
+"""
+
+import logging
+import random
+import time
+from typing import IO
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from config import Config
+
+# 视为暂时性故障、值得重试的HTTP状态码
+RETRY_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+
+def backoff_delay(attempt: int) -> float:
+    """计算第attempt次重试前需要等待的秒数（指数退避 + 全抖动）
+    Args:
+        attempt (int): 已失败的次数，从0开始
+    Returns:
+        float: 需要等待的秒数
+    """
+    ceiling = min(Config.LLM_BACKOFF_MAX, Config.LLM_BACKOFF_BASE * (2**attempt))
+    return random.uniform(0, ceiling)
+
+
+class LLMTransport:
+    """带连接池的LLM HTTP客户端
+    Args:
+        pool_size (int): 每个主机保持的最大连接数
+        connect_timeout (float): 建立连接的超时秒数
+        read_timeout (float): 读取响应（流式时为相邻两块数据之间）的超时秒数
+        max_retries (int): 连接失败或遇到暂时性状态码时的最大重试次数
+    """
+
+    def __init__(
+        self,
+        pool_size: int,
+        connect_timeout: float,
+        read_timeout: float,
+        max_retries: int,
+    ) -> None:
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({"Connection": "keep-alive"})
+
+    def post(
+        self,
+        url: str,
+        json: dict | None = None,
+        data: IO[bytes] | None = None,
+        headers: dict | None = None,
+        stream: bool = False,
+        timeout: tuple[float, float] | float | None = None,
+    ) -> requests.Response:
+        """发送POST请求，连接失败、超时或遇到暂时性状态码时自动重试
+        Args:
+            url (str): 请求地址
+            json (dict, optional): 请求体
+            data (IO[bytes], optional): 以流的方式发送的请求体文件对象，重试前会回到开头
+            headers (dict, optional): 请求头
+            stream (bool, optional): 是否以流的方式读取响应
+            timeout (optional): 覆盖默认的(连接, 读取)超时
+        Returns:
+            requests.Response: 最后一次请求的响应，调用者仍需自行调用raise_for_status
+        """
+        for attempt in range(self.max_retries + 1):
+            try:
+                if data is not None:
+                    data.seek(0)
+                response = self.session.post(
+                    url,
+                    json=json,
+                    data=data,
+                    headers=headers,
+                    stream=stream,
+                    timeout=timeout or self.timeout,
+                )
+                if (
+                    response.status_code not in RETRY_STATUS_CODES
+                    or attempt >= self.max_retries
+                ):
+                    return response
+                response.close()
+                logging.warning(
+                    f"LLM请求 {url} 返回 {response.status_code}，第 {attempt + 1} 次重试"
+                )
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if attempt >= self.max_retries:
+                    raise
+                logging.warning(f"LLM请求 {url} 失败: {e}，第 {attempt + 1} 次重试")
+            time.sleep(backoff_delay(attempt))
+
+
+transport = LLMTransport(
+    pool_size=Config.LLM_HTTP_POOL_SIZE,
+    connect_timeout=Config.LLM_CONNECT_TIMEOUT,
+    read_timeout=Config.LLM_READ_TIMEOUT,
+    max_retries=Config.LLM_HTTP_MAX_RETRIES,
+)
@@ -0,0 +1,168 @@
+"""
+通知表的清理与保留
+过期的重复性通知按块在服务端删除，每块单独提交，不会长时间持有锁；
+可选将通知表按月分区，超过保留期的月份整块删除分区。
+
+启用分区：设置Config.NOTIFICATION_RETENTION_MONTHS后执行 flask notification-partition
+"""
+
+from datetime import date, datetime
+from typing import Iterable
+
+import click
+from sqlalchemy import delete, inspect, text
+
+from app.models.notification import Notification, NotificationType
+from app.modules.job_status import report_progress
+from app.modules.unread_counts import unread_counts
+from app.modules.sql import db
+from app.utils.logger import Log
+from config import Config
+
+TABLE = Notification.__tablename__
+# 兜底分区，接收所有尚未建立分区的月份
+MAX_PARTITION = "pmax"
+
+
+def delete_expired_notifications(
+    before: datetime, types: Iterable[NotificationType], chunk_size: int | None = None
+) -> int:
+    """按块删除指定时间之前的指定类型通知，每块单独提交
+    Args:
+        before (datetime): 删除该时间之前创建的通知
+        types (Iterable[NotificationType]): 需要删除的通知类型
+        chunk_size (int, optional): 每块删除的行数，默认为Config.NOTIFICATION_DELETE_CHUNK
+    Returns:
+        int: 删除的总行数
+    """
+    chunk_size = chunk_size or Config.NOTIFICATION_DELETE_CHUNK
+    statement = (
+        delete(Notification)
+        .where(Notification.created_at < before, Notification.notification_type.in_(list(types)))
+        .with_dialect_options(mysql_limit=chunk_size)
+    )
+
+    deleted = 0
+    while True:
+        try:
+            count = db.session.execute(statement).rowcount
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        deleted += count
+        report_progress(deleted, message=f"已删除 {deleted} 条过期通知")
+        if count < chunk_size:
+            # 无法得知被删除通知的接收者，清空未读数缓存使其重新读取
+            if deleted:
+                unread_counts.clear()
+            return deleted
+
+
+def _month_start(day: date, offset: int = 0) -> date:
+    """获取某天所在月份偏移offset个月后的第一天"""
+    months = day.year * 12 + day.month - 1 + offset
+    return date(months // 12, months % 12 + 1, 1)
+
+
+def _partition_name(month: date) -> str:
+    return f"p{month:%Y%m}"
+
+
+def _partition_clause(month: date) -> str:
+    """某月的分区定义，分区内为该月的所有通知"""
+    return (
+        f"PARTITION {_partition_name(month)} "
+        f"VALUES LESS THAN (TO_DAYS('{_month_start(month, 1).isoformat()}'))"
+    )
+
+
+def get_partitions() -> list[str]:
+    """获取通知表的分区名，未分区时为空列表"""
+    rows = db.session.execute(
+        text(
+            "SELECT PARTITION_NAME FROM information_schema.PARTITIONS "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table "
+            "AND PARTITION_NAME IS NOT NULL ORDER BY PARTITION_ORDINAL_POSITION"
+        ),
+        {"table": TABLE},
+    )
+    return [name for name, in rows]
+
+
+def partition_table(months_ahead: int = 2) -> None:
+    """将通知表转换为按月分区，只需执行一次
+    MySQL的分区表不支持外键，且主键需包含分区列，因此会删除接收者外键并将主键改为(notification_id, created_at)
+    """
+    if get_partitions():
+        return
+
+    for foreign_key in inspect(db.engine).get_foreign_keys(TABLE):
+        db.session.execute(text(f"ALTER TABLE {TABLE} DROP FOREIGN KEY {foreign_key['name']}"))
+    # 分区列作为主键的一部分不能为空，与模型中的声明一致
+    db.session.execute(text(f"UPDATE {TABLE} SET created_at = CURRENT_TIMESTAMP WHERE created_at IS NULL"))
+    db.session.execute(
+        text(
+            f"ALTER TABLE {TABLE} "
+            "MODIFY created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP, "
+            "DROP PRIMARY KEY, ADD PRIMARY KEY (notification_id, created_at)"
+        )
+    )
+
+    today = date.today()
+    oldest = db.session.execute(text(f"SELECT MIN(created_at) FROM {TABLE}")).scalar()
+    month = _month_start(oldest.date() if oldest else today)
+    clauses = []
+    while month <= _month_start(today, months_ahead):
+        clauses.append(_partition_clause(month))
+        month = _month_start(month, 1)
+    clauses.append(f"PARTITION {MAX_PARTITION} VALUES LESS THAN MAXVALUE")
+    db.session.execute(
+        text(f"ALTER TABLE {TABLE} PARTITION BY RANGE (TO_DAYS(created_at)) ({', '.join(clauses)})")
+    )
+    db.session.commit()
+    Log.info(f"通知表已按月分区: {len(clauses)} 个分区")
+
+
+def rotate_partitions(retention_months: int, months_ahead: int = 2) -> dict:
+    """为未来的月份建立分区，并删除超过保留期的月份分区
+    Args:
+        retention_months (int): 保留的月数，包含当月
+        months_ahead (int, optional): 提前建立分区的月数
+    Returns:
+        dict: 新建与删除的分区名
+    """
+    partitions = get_partitions()
+    if not partitions:
+        return {"added": [], "dropped": []}
+
+    today = date.today()
+    added = []
+    for offset in range(months_ahead + 1):
+        month = _month_start(today, offset)
+        if _partition_name(month) not in partitions:
+            # 从兜底分区中拆出新月份，兜底分区中通常没有数据，拆分很快
+            db.session.execute(
+                text(
+                    f"ALTER TABLE {TABLE} REORGANIZE PARTITION {MAX_PARTITION} INTO "
+                    f"({_partition_clause(month)}, PARTITION {MAX_PARTITION} VALUES LESS THAN MAXVALUE)"
+                )
+            )
+            added.append(_partition_name(month))
+
+    cutoff = _partition_name(_month_start(today, 1 - retention_months))
+    dropped = [name for name in partitions if name != MAX_PARTITION and name < cutoff]
+    if dropped:
+        db.session.execute(text(f"ALTER TABLE {TABLE} DROP PARTITION {', '.join(dropped)}"))
+    db.session.commit()
+    if dropped:
+        unread_counts.clear()
+    return {"added": added, "dropped": dropped}
+
+
+@click.command("notification-partition")
+@click.option("--months-ahead", default=2, help="提前建立分区的月数")
+def notification_partition_command(months_ahead: int) -> None:
+    """将通知表转换为按月分区"""
+    partition_table(months_ahead)
+    click.echo(f"通知表分区: {', '.join(get_partitions())}")
@@ -3,14 +3,37 @@
 处理通知的创建和管理
 """
 
+import base64
+import binascii
 import logging
+import uuid
 from datetime import datetime
-from typing import List, Optional, Dict, Any
+from typing import Iterable, List, Optional, Dict, Any, Tuple
+
+from sqlalchemy import and_, func, or_
 
 from app.models.notification import Notification, NotificationType
 from app.models.member import Member
 from app.models.daily_task import DailyTask
+from app.modules.unread_counts import unread_counts
 from app.modules.sql import db
+from config import Config
+
+
+def encode_cursor(created_at: datetime, notification_id: str) -> str:
+    """将分页位置编码为不透明的游标"""
+    raw = f"{created_at.isoformat()}|{notification_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    """解析游标，格式错误时抛出ValueError"""
+    try:
+        created_at, notification_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|", 1)
+        return datetime.fromisoformat(created_at), notification_id
+    except (binascii.Error, UnicodeDecodeError) as e:
+        raise ValueError(f"无效的游标: {cursor}") from e
+
 
 class NotificationService:
     """通知服务类"""
@@ -52,6 +75,7 @@ class NotificationService:
             
             # 如果已存在同类型通知，则更新内容而不是创建新通知
             if existing_notification:
+                was_read = existing_notification.is_read
                 existing_notification.title = title
                 existing_notification.content = content
                 existing_notification.resource_id = resource_id
@@ -60,6 +84,7 @@ class NotificationService:
                 
                 db.session.commit()
                 logging.info(f"更新用户 {receiver_id} 已存在的类型为 {notification_type.value} 的通知")
+                NotificationService._count_created(receiver_id, was_read)
                 return existing_notification
             
             # 不存在则创建新通知
@@ -77,12 +102,107 @@ class NotificationService:
             db.session.commit()
             
             logging.info(f"为用户 {receiver_id} 创建了类型为 {notification_type.value} 的通知")
+            NotificationService._count_created(receiver_id, True)
             return notification
         except Exception as e:
             db.session.rollback()
             logging.error(f"创建通知失败: {str(e)}")
             return None
     
+    @staticmethod
+    def create_notifications_bulk(
+        receivers: Iterable[str],
+        notification_type: NotificationType,
+        category: str,
+        title: str,
+        content: str,
+        resource_ids: Optional[Dict[str, str]] = None
+    ) -> Dict[str, int]:
+        """
+        批量创建通知，与create_notification的去重规则相同：
+        接收者当天已有同类型通知时更新该通知，否则创建新通知。
+        一次查询找出已存在的通知，一次批量插入与一次批量更新，在同一事务中提交。
+        
+        Args:
+            receivers: 接收者ID，重复的ID只处理一次
+            notification_type: 通知类型
+            category: 通知分类
+            title: 通知标题
+            content: 通知内容
+            resource_ids: 接收者ID到相关资源ID的映射 (可选)
+            
+        Returns:
+            创建与更新的通知数量，失败时均为0
+        """
+        receiver_ids = list(dict.fromkeys(receivers))
+        resource_ids = resource_ids or {}
+        if not receiver_ids:
+            return {"created": 0, "updated": 0}
+
+        try:
+            now = datetime.now()
+            today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+            tomorrow = today.replace(hour=23, minute=59, second=59)
+
+            # 一次查询找出当天已有同类型通知的接收者
+            existing = {}
+            was_read = {}
+            for receiver_id, notification_id, is_read in db.session.query(
+                Notification.receiver_id, Notification.notification_id, Notification.is_read
+            ).filter(
+                Notification.receiver_id.in_(receiver_ids),
+                Notification.notification_type == notification_type,
+                Notification.created_at >= today,
+                Notification.created_at <= tomorrow
+            ):
+                existing[receiver_id] = notification_id
+                was_read[receiver_id] = is_read
+
+            values = {
+                "title": title,
+                "content": content,
+                "is_read": False,  # 重置为未读
+                "created_at": now
+            }
+            db.session.bulk_update_mappings(Notification, [
+                {"notification_id": notification_id, "resource_id": resource_ids.get(receiver_id), **values}
+                for receiver_id, notification_id in existing.items()
+            ])
+            new_ids = {
+                receiver_id: str(uuid.uuid4())
+                for receiver_id in receiver_ids
+                if receiver_id not in existing
+            }
+            db.session.bulk_insert_mappings(Notification, [
+                {
+                    "notification_id": notification_id,
+                    "receiver_id": receiver_id,
+                    "notification_type": notification_type,
+                    "category": category,
+                    "resource_id": resource_ids.get(receiver_id),
+                    **values
+                }
+                for receiver_id, notification_id in new_ids.items()
+            ])
+            db.session.commit()
+
+            for receiver_id in receiver_ids:
+                NotificationService._count_created(receiver_id, was_read.get(receiver_id, True))
+
+            result = {"created": len(new_ids), "updated": len(receiver_ids) - len(new_ids)}
+            logging.info(f"批量处理类型为 {notification_type.value} 的通知: {result}")
+            return result
+        except Exception as e:
+            db.session.rollback()
+            logging.error(f"批量创建通知失败: {str(e)}")
+            return {"created": 0, "updated": 0}
+    
+    @staticmethod
+    def _count_created(receiver_id: str, was_read: bool) -> None:
+        """通知新建或从已读重置为未读时增加缓存的未读数"""
+        if was_read:
+            unread_counts.adjust(receiver_id, 1)
+    
     @staticmethod
     def get_user_notifications(user_id: str, unread_only: bool = False) -> List[Dict[str, Any]]:
         """
@@ -101,7 +221,7 @@ class NotificationService:
             if unread_only:
                 query = query.filter(Notification.is_read == False)
                 
-            query = query.order_by(Notification.created_at.desc())
+            query = query.order_by(Notification.created_at.desc(), Notification.notification_id.desc())
             
             notifications = query.all()
             return [notification.to_dict() for notification in notifications]
@@ -109,6 +229,78 @@ class NotificationService:
             logging.error(f"获取用户通知失败: {str(e)}")
             return []
     
+    @staticmethod
+    def get_user_notifications_page(
+        user_id: str,
+        unread_only: bool = False,
+        cursor: Optional[str] = None,
+        limit: int = 20,
+        since: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        按游标分页获取用户的通知列表，结果按创建时间倒序
+        
+        Args:
+            user_id: 用户ID
+            unread_only: 是否只获取未读通知
+            cursor: 上一页返回的next_cursor，获取更早的一页，为空时获取最新的一页
+            limit: 每页数量，不超过Config.NOTIFICATION_PAGE_SIZE_MAX
+            since: 上次返回的sync_cursor，只获取此后新增的通知，用于增量同步
+            
+        Returns:
+            notifications为当前页的通知；next_cursor为获取更早一页的游标，没有时为None；
+            sync_cursor为当前已获取的最新位置，下次作为since传入；
+            since模式下新增通知超过一页时从最早的开始返回，需以sync_cursor继续获取
+            
+        Raises:
+            ValueError: 游标格式错误，或同时传入cursor与since
+        """
+        if cursor and since:
+            raise ValueError("cursor与since不能同时使用")
+        limit = max(1, min(limit, Config.NOTIFICATION_PAGE_SIZE_MAX))
+
+        query = Notification.query.filter(Notification.receiver_id == user_id)
+        if unread_only:
+            query = query.filter(Notification.is_read == False)
+
+        if since:
+            created_at, notification_id = decode_cursor(since)
+            query = query.filter(or_(
+                Notification.created_at > created_at,
+                and_(Notification.created_at == created_at, Notification.notification_id > notification_id)
+            )).order_by(Notification.created_at.asc(), Notification.notification_id.asc())
+        else:
+            if cursor:
+                created_at, notification_id = decode_cursor(cursor)
+                query = query.filter(or_(
+                    Notification.created_at < created_at,
+                    and_(Notification.created_at == created_at, Notification.notification_id < notification_id)
+                ))
+            query = query.order_by(Notification.created_at.desc(), Notification.notification_id.desc())
+
+        # 多取一条用于判断是否还有下一页
+        notifications = query.limit(limit + 1).all()
+        has_more = len(notifications) > limit
+        notifications = notifications[:limit]
+
+        next_cursor = None
+        if since:
+            notifications.reverse()
+        elif has_more:
+            last = notifications[-1]
+            next_cursor = encode_cursor(last.created_at, last.notification_id)
+
+        sync_cursor = since
+        if notifications and not cursor:
+            newest = notifications[0]
+            sync_cursor = encode_cursor(newest.created_at, newest.notification_id)
+
+        return {
+            "notifications": [notification.to_dict() for notification in notifications],
+            "next_cursor": next_cursor,
+            "sync_cursor": sync_cursor
+        }
+    
     @staticmethod
     def mark_as_read(notification_id: str) -> bool:
         """
@@ -123,8 +315,11 @@ class NotificationService:
         try:
             notification = Notification.query.get(notification_id)
             if notification:
+                was_read = notification.is_read
                 notification.is_read = True
                 db.session.commit()
+                if not was_read:
+                    unread_counts.adjust(notification.receiver_id, -1)
                 return True
             return False
         except Exception as e:
@@ -144,15 +339,13 @@ class NotificationService:
             是否成功
         """
         try:
-            notifications = Notification.query.filter(
+            # 单条UPDATE完成，不将未读通知逐条加载到会话中
+            Notification.query.filter(
                 Notification.receiver_id == user_id,
                 Notification.is_read == False
-            ).all()
-            
-            for notification in notifications:
-                notification.is_read = True
-                
+            ).update({Notification.is_read: True}, synchronize_session=False)
             db.session.commit()
+            unread_counts.set(user_id, 0)
             return True
         except Exception as e:
             db.session.rollback()
@@ -171,14 +364,52 @@ class NotificationService:
             未读通知数量
         """
         try:
-            return Notification.query.filter(
+            # 未读数缓存在内存中，未缓存或已过期时才查询数据库
+            return unread_counts.get(user_id, lambda user_id: Notification.query.filter(
                 Notification.receiver_id == user_id,
                 Notification.is_read == False
-            ).count()
+            ).count())
         except Exception as e:
             logging.error(f"获取未读通知数量失败: {str(e)}")
             return 0
-    
+
+    @staticmethod
+    def get_recent_notifications(user_ids: Iterable[str], since: datetime) -> List[Dict[str, Any]]:
+        """
+        获取多个用户在since之后创建或重置为未读的通知，供网关中的通知推送轮询
+
+        Args:
+            user_ids: 用户ID列表
+            since: 起始时间
+
+        Returns:
+            按创建时间升序的通知列表
+        """
+        notifications = Notification.query.filter(
+            Notification.receiver_id.in_(list(user_ids)),
+            Notification.created_at >= since
+        ).order_by(Notification.created_at.asc(), Notification.notification_id.asc()).all()
+        return [notification.to_dict() for notification in notifications]
+
+    @staticmethod
+    def get_unread_counts(user_ids: Iterable[str]) -> Dict[str, int]:
+        """
+        一次查询获取多个用户的未读通知数量，直接读取数据库而不使用进程内缓存
+
+        Args:
+            user_ids: 用户ID列表
+
+        Returns:
+            用户ID到未读数的映射，没有未读通知的用户为0
+        """
+        user_ids = list(user_ids)
+        counts = dict.fromkeys(user_ids, 0)
+        counts.update(db.session.query(Notification.receiver_id, func.count()).filter(
+            Notification.receiver_id.in_(user_ids),
+            Notification.is_read == False
+        ).group_by(Notification.receiver_id).all())
+        return counts
+
     @staticmethod
     def delete_notification(notification_id: str) -> bool:
         """
@@ -193,8 +424,11 @@ class NotificationService:
         try:
             notification = Notification.query.get(notification_id)
             if notification:
+                receiver_id, was_read = notification.receiver_id, notification.is_read
                 db.session.delete(notification)
                 db.session.commit()
+                if not was_read:
+                    unread_counts.adjust(receiver_id, -1)
                 return True
             return False
         except Exception as e:
@@ -226,24 +460,44 @@ class NotificationService:
         except Exception as e:
             logging.error(f"创建每日任务通知失败: {str(e)}")
     
+    @staticmethod
+    def notify_daily_tasks_created(tasks: List[DailyTask]) -> Dict[str, int]:
+        """
+        批量通知用户每日任务已创建，同一用户有多个任务时通知指向最后一个任务
+        
+        Args:
+            tasks: 每日任务对象列表
+            
+        Returns:
+            创建与更新的通知数量
+        """
+        if not tasks:
+            return {"created": 0, "updated": 0}
+
+        task_date = tasks[0].task_date.strftime('%Y-%m-%d')
+        return NotificationService.create_notifications_bulk(
+            receivers=[task.assignee_id for task in tasks],
+            notification_type=NotificationType.DAILY_TASK_CREATED,
+            category="system",
+            title="每日任务已生成",
+            content=f"您的 {task_date} 每日任务已生成，请查看并完成。",
+            resource_ids={task.assignee_id: task.task_id for task in tasks}
+        )
+    
     @staticmethod
     def notify_daily_report_reminder() -> None:
         """发送日报填写提醒通知"""
         try:
-            # 获取所有成员
-            members = Member.query.all()
-            
             # 当前日期
             today = datetime.now().strftime('%Y-%m-%d')
             
-            # 为每个成员创建或更新通知
-            for member in members:
-                NotificationService.create_notification(
-                    receiver_id=member.id,
-                    notification_type=NotificationType.DAILY_REPORT_REMINDER,
-                    category="forewarning",
-                    title="日报填写提醒",
-                    content=f"请填写 {today} 的日报，别忘了提交哦！"
-                )
+            # 为所有成员批量创建或更新通知
+            NotificationService.create_notifications_bulk(
+                receivers=[member_id for member_id, in db.session.query(Member.id)],
+                notification_type=NotificationType.DAILY_REPORT_REMINDER,
+                category="forewarning",
+                title="日报填写提醒",
+                content=f"请填写 {today} 的日报，别忘了提交哦！"
+            )
         except Exception as e:
             logging.error(f"创建日报提醒通知失败: {str(e)}") 
\ No newline at end of file
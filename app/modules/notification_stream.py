@@ -0,0 +1,120 @@
+"""
+通知推送
+在异步网关中为 /notifications/stream 的SSE连接推送新通知与未读数变化。
+
+通知可能由任意进程写入（Flask的各个worker、执行定时任务的leader），因此不依赖进程内的发布订阅，
+而是由每个网关进程轮询数据库：每Config.NOTIFICATION_STREAM_POLL秒以一次查询取出本进程所有在线用户
+最近Config.NOTIFICATION_STREAM_WINDOW秒内创建或重置为未读的通知，再以一次分组查询取出他们的未读数。
+查询时间与在线用户数成正比，与连接数和网关进程数无关；没有连接时停止轮询。
+删除通知不单独推送，只体现为未读数的变化。
+"""
+
+import asyncio
+import json
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Iterable
+
+from flask import Flask
+
+from app.modules.notification_service import NotificationService
+from app.modules.sql import db
+
+
+def format_event(event: str, data: Any) -> bytes:
+    """按SSE格式编码一个事件"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n".encode("utf-8")
+
+
+class NotificationStream:
+    """按用户分发通知事件的轮询器
+    Args:
+        flask_app (Flask): 提供数据库上下文的Flask应用
+        poll_interval (float): 轮询数据库的间隔秒数
+        window (float): 每次轮询回看的秒数，需覆盖写入进程之间的时钟偏差与事务提交的延迟
+        queue_size (int): 每个连接最多积压的事件数，超出后丢弃新事件
+    """
+
+    def __init__(self, flask_app: Flask, poll_interval: float, window: float, queue_size: int = 100) -> None:
+        self.flask_app = flask_app
+        self.poll_interval = poll_interval
+        self.window = timedelta(seconds=window)
+        self.queue_size = queue_size
+        self._subscribers: dict[str, set[asyncio.Queue]] = {}
+        # 已推送的(通知ID, 创建时间)，通知被重置为未读时创建时间改变，会再次推送
+        self._seen: dict[tuple[str, str], datetime] = {}
+        self._counts: dict[str, int] = {}
+        self._task: asyncio.Task | None = None
+
+    async def subscribe(self, user_id: str) -> asyncio.Queue:
+        """订阅用户的事件，返回的队列中首先是当前的未读数"""
+        notifications, counts = await asyncio.to_thread(self._load, [user_id])
+        # 连接之前的通知由客户端通过 /notifications/get 获取，不再推送
+        self._mark_seen(notifications)
+
+        events = asyncio.Queue(self.queue_size)
+        events.put_nowait(format_event("unread", {"count": counts[user_id]}))
+        self._subscribers.setdefault(user_id, set()).add(events)
+        self._counts[user_id] = counts[user_id]
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._poll())
+        return events
+
+    def unsubscribe(self, user_id: str, events: asyncio.Queue) -> None:
+        subscribers = self._subscribers.get(user_id)
+        if subscribers is None:
+            return
+        subscribers.discard(events)
+        if not subscribers:
+            del self._subscribers[user_id]
+            self._counts.pop(user_id, None)
+
+    def _load(self, user_ids: list[str]) -> tuple[list[dict], dict[str, int]]:
+        """在线程中读取用户最近的通知与未读数"""
+        with self.flask_app.app_context():
+            try:
+                since = datetime.now() - self.window
+                notifications = NotificationService.get_recent_notifications(user_ids, since)
+                counts = NotificationService.get_unread_counts(user_ids)
+            finally:
+                db.session.remove()
+        return notifications, counts
+
+    def _mark_seen(self, notifications: Iterable[dict]) -> list[dict]:
+        """记录已推送的通知，返回其中尚未推送过的"""
+        unseen = []
+        for notification in notifications:
+            key = (notification["notification_id"], notification["created_at"])
+            if key not in self._seen:
+                self._seen[key] = datetime.fromisoformat(notification["created_at"])
+                unseen.append(notification)
+        return unseen
+
+    def _publish(self, user_id: str, event: bytes) -> None:
+        for events in self._subscribers.get(user_id, ()):
+            try:
+                events.put_nowait(event)
+            except asyncio.QueueFull:
+                # 客户端读取过慢时丢弃事件，避免积压占用内存
+                pass
+
+    async def _poll(self) -> None:
+        while self._subscribers:
+            await asyncio.sleep(self.poll_interval)
+            if not (user_ids := list(self._subscribers)):
+                break
+            try:
+                notifications, counts = await asyncio.to_thread(self._load, user_ids)
+            except Exception as e:
+                logging.error(f"Error polling notifications: {str(e)}")
+                continue
+
+            # 清理早已移出回看窗口的记录，保留一个窗口的余量，避免本次查询结果中的通知被重复推送
+            since = datetime.now() - 2 * self.window
+            self._seen = {key: created_at for key, created_at in self._seen.items() if created_at >= since}
+            for notification in self._mark_seen(notifications):
+                self._publish(notification["receiver_id"], format_event("notification", notification))
+            for user_id, count in counts.items():
+                if user_id in self._subscribers and self._counts.get(user_id) != count:
+                    self._counts[user_id] = count
+                    self._publish(user_id, format_event("unread", {"count": count}))
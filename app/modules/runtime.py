@@ -0,0 +1,336 @@
+"""
+统一的定时任务运行时
+所有调度器共用一个BackgroundScheduler与一个线程池，任务以id注册并可单独限制并发数。
+定时任务保存在数据库的任务存储中，重启后仍能按misfire_grace_time补跑；
+多个gunicorn worker之间通过MySQL的GET_LOCK选出唯一的leader，只有leader执行定时任务；
+每次执行前还需获得job_leases表中该任务的租约，leader切换的间隙也不会重复执行。
+"""
+
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable
+
+import pytz
+from apscheduler.executors.pool import ThreadPoolExecutor
+from apscheduler.jobstores.sqlalchemy import SQLAlchemyJobStore
+from apscheduler.schedulers.background import BackgroundScheduler
+from apscheduler.triggers.cron import CronTrigger
+from apscheduler.triggers.date import DateTrigger
+from apscheduler.triggers.interval import IntervalTrigger
+from flask import Flask
+from sqlalchemy import text
+
+from app.modules.lease import job_lease
+from app.modules.sql import db
+from app.utils.utils import Timer
+from config import Config
+
+TIMEZONE = pytz.timezone(Config.TIMEZONE)
+
+# 持久化任务存储的别名，仅leader进程会添加该存储
+PERSISTENT_STORE = "persistent"
+
+_TRIGGERS = {"cron": CronTrigger, "interval": IntervalTrigger, "date": DateTrigger}
+
+
+@dataclass
+class JobSpec:
+    """注册到运行时的任务"""
+
+    id: str
+    func: Callable[[], Any]
+    trigger: Any
+    name: str
+    max_instances: int = 1
+    # 为False时只保存在内存中，每个进程各自执行（如调度器自检任务）
+    persistent: bool = True
+    next_run_time: Any = None
+
+
+class LeaderLock:
+    """基于MySQL GET_LOCK的进程级leader锁
+    锁与数据库连接绑定，持有锁的进程退出或连接断开后锁会自动释放，其他进程随后可以接管。
+    Args:
+        name (str): 锁名称
+    """
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self._connection = None
+
+    def acquire(self) -> bool:
+        """尝试以非阻塞的方式获取锁，非MySQL数据库时视为单进程部署直接获得锁"""
+        if db.engine.dialect.name != "mysql":
+            return True
+        if self.is_held():
+            return True
+
+        self.release()
+        connection = db.engine.connect()
+        try:
+            acquired = connection.execute(
+                text("SELECT GET_LOCK(:name, 0)"), {"name": self.name}
+            ).scalar()
+        except Exception:
+            connection.close()
+            raise
+        if acquired == 1:
+            self._connection = connection
+            return True
+        connection.close()
+        return False
+
+    def is_held(self) -> bool:
+        """检查当前进程是否仍然持有锁"""
+        if db.engine.dialect.name != "mysql":
+            return True
+        if self._connection is None:
+            return False
+        try:
+            return bool(
+                self._connection.execute(
+                    text("SELECT IS_USED_LOCK(:name) = CONNECTION_ID()"),
+                    {"name": self.name},
+                ).scalar()
+            )
+        except Exception:
+            # 连接已断开，锁随之释放
+            self.release()
+            return False
+
+    def release(self) -> None:
+        """释放锁并关闭其连接"""
+        if self._connection is None:
+            return
+        try:
+            self._connection.execute(text("SELECT RELEASE_LOCK(:name)"), {"name": self.name})
+        except Exception:
+            pass
+        finally:
+            self._connection.close()
+            self._connection = None
+
+
+class JobRuntime:
+    """统一的定时任务运行时
+    每个进程都会启动调度器以执行本进程提交的一次性任务与非持久化任务；
+    只有获得leader锁的进程会挂载持久化任务存储并执行定时任务。
+    """
+
+    def __init__(self) -> None:
+        self.app: Flask | None = None
+        self.scheduler = BackgroundScheduler(
+            executors={"default": ThreadPoolExecutor(Config.SCHEDULER_WORKERS)},
+            job_defaults={
+                "coalesce": True,
+                "max_instances": 1,
+                "misfire_grace_time": Config.SCHEDULER_MISFIRE_GRACE_TIME,
+            },
+            timezone=TIMEZONE,
+        )
+        self.leader_lock = LeaderLock(Config.SCHEDULER_LEADER_LOCK)
+        self.is_leader = False
+
+        self._jobs: dict[str, JobSpec] = {}
+        self._lock = threading.RLock()
+        self._elector: threading.Thread | None = None
+
+    def init_app(self, app: Flask) -> None:
+        """绑定应用并启动调度器与leader选举线程，重复调用不会重复启动"""
+        with self._lock:
+            self.app = app
+            if self.scheduler.running:
+                return
+            self.scheduler.start()
+            logging.info("定时任务运行时已启动")
+
+        self._try_become_leader()
+        self._elector = threading.Thread(
+            target=self._elect_forever, name="scheduler-leader-elector", daemon=True
+        )
+        self._elector.start()
+
+    def add_job(
+        self,
+        func: Callable[[], Any],
+        trigger: str,
+        id: str,
+        name: str | None = None,
+        max_instances: int = 1,
+        persistent: bool = True,
+        next_run_time: Any = None,
+        **trigger_args,
+    ) -> None:
+        """注册定时任务，相同id的任务会被替换
+        Args:
+            func (Callable): 任务函数，执行时已处于应用上下文中
+            trigger (str): 触发器类型，cron、interval或date
+            id (str): 任务id，在整个运行时内唯一
+            name (str, optional): 任务名称
+            max_instances (int, optional): 该任务允许同时运行的实例数
+            persistent (bool, optional): 是否保存在持久化存储中并只由leader执行
+            next_run_time (optional): 首次执行时间
+            **trigger_args: 触发器参数，如hour、minute、minutes
+        """
+        trigger_args.setdefault("timezone", TIMEZONE)
+        spec = JobSpec(
+            id=id,
+            func=func,
+            trigger=_TRIGGERS[trigger](**trigger_args),
+            name=name or id,
+            max_instances=max_instances,
+            persistent=persistent,
+            next_run_time=next_run_time,
+        )
+        with self._lock:
+            self._jobs[id] = spec
+            if not persistent or self.is_leader:
+                self._schedule(spec)
+
+    def submit(self, func: Callable[..., Any], *args, delay: Timer = None, **kwargs) -> None:
+        """在本进程中提交一次性任务，任务在共用线程池中以应用上下文执行
+        Args:
+            func (Callable): 需要执行的函数
+            *args: 需要向函数传递的参数
+            delay (Timer, optional): 需要延迟执行的时间，默认为立即执行
+            **kwargs: 需要向函数传递的关键字参数
+        """
+        run_date = delay.as_future() if delay else None
+        self.scheduler.add_job(
+            self._call_in_context,
+            trigger=DateTrigger(run_date=run_date, timezone=TIMEZONE),
+            args=[func, *args],
+            kwargs=kwargs,
+            misfire_grace_time=None,
+        )
+
+    def run(self, job_id: str) -> Any:
+        """在应用上下文中执行已注册的任务，执行前需获得该任务的租约"""
+        spec = self._jobs.get(job_id)
+        if spec is None:
+            logging.warning(f"任务 {job_id} 未在本进程注册，跳过执行")
+            return None
+        with self.app.app_context(), job_lease(job_id) as acquired:
+            if not acquired:
+                logging.info(f"任务 {job_id} 的租约由其他进程持有，跳过本次执行")
+                return None
+            return spec.func()
+
+    def get_jobs(self) -> list[dict]:
+        """返回所有已注册任务的信息"""
+        jobs = []
+        for spec in list(self._jobs.values()):
+            store = PERSISTENT_STORE if spec.persistent else "default"
+            job = (
+                self.scheduler.get_job(spec.id, store)
+                if not spec.persistent or self.is_leader
+                else None
+            )
+            jobs.append(
+                {
+                    "id": spec.id,
+                    "name": spec.name,
+                    "trigger": str(spec.trigger),
+                    "max_instances": spec.max_instances,
+                    "persistent": spec.persistent,
+                    "next_run_time": job.next_run_time.isoformat()
+                    if job and job.next_run_time
+                    else None,
+                }
+            )
+        return jobs
+
+    def shutdown(self) -> None:
+        """关闭调度器并释放leader锁"""
+        with self._lock:
+            if self.scheduler.running:
+                self.scheduler.shutdown(wait=False)
+            self._step_down()
+        logging.info("定时任务运行时已关闭")
+
+    def _call_in_context(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        with self.app.app_context():
+            return func(*args, **kwargs)
+
+    def _schedule(self, spec: JobSpec) -> None:
+        """将任务加入调度器，持久化任务的触发器未变化时保留原有的下次执行时间以便补跑"""
+        if not spec.persistent:
+            options = {"next_run_time": spec.next_run_time} if spec.next_run_time else {}
+            self.scheduler.add_job(
+                self._call_in_context,
+                trigger=spec.trigger,
+                args=[spec.func],
+                id=spec.id,
+                name=spec.name,
+                max_instances=spec.max_instances,
+                replace_existing=True,
+                **options,
+            )
+            return
+
+        existing = self.scheduler.get_job(spec.id, PERSISTENT_STORE)
+        if existing and str(existing.trigger) == str(spec.trigger):
+            if existing.max_instances != spec.max_instances or existing.name != spec.name:
+                existing.modify(max_instances=spec.max_instances, name=spec.name)
+            return
+        # 持久化存储只能保存可按引用序列化的函数，因此统一通过模块级的run_job间接调用
+        self.scheduler.add_job(
+            run_job,
+            trigger=spec.trigger,
+            args=[spec.id],
+            id=spec.id,
+            name=spec.name,
+            max_instances=spec.max_instances,
+            jobstore=PERSISTENT_STORE,
+            replace_existing=True,
+        )
+
+    def _try_become_leader(self) -> None:
+        with self._lock, self.app.app_context():
+            try:
+                held = self.leader_lock.acquire()
+            except Exception as e:
+                logging.error(f"获取调度器leader锁失败: {e}")
+                held = False
+
+            if held and not self.is_leader:
+                self.scheduler.add_jobstore(
+                    SQLAlchemyJobStore(
+                        engine=db.engine, tablename=Config.SCHEDULER_JOBSTORE_TABLE
+                    ),
+                    alias=PERSISTENT_STORE,
+                )
+                self.is_leader = True
+                for spec in self._jobs.values():
+                    if spec.persistent:
+                        self._schedule(spec)
+                logging.info("当前进程成为定时任务leader")
+            elif not held and self.is_leader:
+                self._step_down()
+                logging.warning("当前进程失去定时任务leader锁")
+
+    def _step_down(self) -> None:
+        if self.is_leader:
+            try:
+                self.scheduler.remove_jobstore(PERSISTENT_STORE, shutdown=False)
+            except Exception:
+                pass
+            self.is_leader = False
+        if self.app is not None:
+            with self.app.app_context():
+                self.leader_lock.release()
+
+    def _elect_forever(self) -> None:
+        while self.scheduler.running:
+            time.sleep(Config.SCHEDULER_LEADER_CHECK_SECONDS)
+            self._try_become_leader()
+
+
+runtime = JobRuntime()
+
+
+def run_job(job_id: str) -> Any:
+    """持久化任务的入口，按id找到本进程注册的任务并执行"""
+    return runtime.run(job_id)
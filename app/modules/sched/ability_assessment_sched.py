@@ -1,6 +1,6 @@
-from apscheduler.schedulers.background import BackgroundScheduler
 from datetime import datetime
 from app.models.member import Member
+from app.modules.runtime import runtime
 from app.modules.sql import db
 from app.utils.logger import Log
 import pytz
@@ -30,14 +30,6 @@ class AbilityAssessmentScheduler:
         
         logging.info(f"初始化 AbilityAssessmentScheduler (实例 ID: {self.instance_id})")
         
-        self.scheduler = BackgroundScheduler({
-            'apscheduler.timezone': 'Asia/Shanghai',
-            'apscheduler.job_defaults.coalesce': True,
-            'apscheduler.job_defaults.max_instances': 1,
-            'apscheduler.misfire_grace_time': 3600,
-            'id': f'ability_assessment_scheduler_{self.instance_id}'
-        })
-        
         if app is not None:
             logging.info(f"立即初始化 app (实例 ID: {self.instance_id})")
             self.init_app(app)
@@ -52,25 +44,22 @@ class AbilityAssessmentScheduler:
             now = datetime.now(self.timezone)
             
             # 每周一凌晨3点执行能力评估
-            self.scheduler.add_job(
+            runtime.add_job(
                 self._run_ability_assessment,
                 'cron',
                 hour='21',           # 凌晨3点
                 minute='0',
                 id='ability_assessment_job',
-                replace_existing=True,
                 name='能力评估任务',
-                timezone=self.timezone,
-                misfire_grace_time=3600
             )
             
             # 测试任务，每半小时执行一次
-            self.scheduler.add_job(
+            runtime.add_job(
                 self._test_scheduler,
                 'interval',
                 minutes=30,
                 id='assessment_scheduler_test_job',
-                replace_existing=True,
+                persistent=False,  # 自检任务在每个进程中各自执行
                 name='能力评估调度器测试任务',
                 next_run_time=now
             )
@@ -112,34 +101,20 @@ class AbilityAssessmentScheduler:
             logging.error(error_msg, exc_info=True)
 
     def start_scheduler(self):
+        """确保统一的定时任务运行时已启动"""
         try:
-            if not self.scheduler.running:
-                self.scheduler.start()
-                logging.info("能力评估定时任务调度器启动成功")
-                
-                jobs = self.scheduler.get_jobs()
-                logging.info("当前注册的所有能力评估任务:")
-                for job in jobs:
-                    next_run = job.next_run_time.astimezone(self.timezone)
-                    logging.info(f"- 任务名称: {job.name}")
-                    logging.info(f"  任务ID: {job.id}")
-                    logging.info(f"  下次执行时间: {next_run}")
-                
-            else:
-                logging.info("能力评估调度器已在运行中")
+            runtime.init_app(self.app)
+            logging.info("能力评估定时任务已注册到统一运行时")
         except Exception as e:
-            logging.error(f"能力评估定时任务调度器启动失败: {str(e)}", exc_info=True)
+            logging.error(f"能力评估定时任务运行时启动失败: {str(e)}", exc_info=True)
             raise
 
     def stop_scheduler(self):
+        """关闭统一的定时任务运行时"""
         try:
-            if self.scheduler.running:
-                self.scheduler.shutdown(wait=False)
-                logging.info("能力评估定时任务调度器已关闭")
-            else:
-                logging.info("能力评估调度器已经是停止状态")
+            runtime.shutdown()
         except Exception as e:
-            logging.error(f"能力评估定时任务调度器关闭失败: {str(e)}", exc_info=True)
+            logging.error(f"能力评估定时任务运行时关闭失败: {str(e)}", exc_info=True)
             raise
 
     def run_assessment_now(self):
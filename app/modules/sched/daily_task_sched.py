@@ -1,14 +1,19 @@
-from apscheduler.schedulers.background import BackgroundScheduler
 from datetime import datetime
 from app.models.period_task import PeriodTask
 from app.models.daily_report import DailyReport
 # from app.models.user import User
-from sqlalchemy import func
+from sqlalchemy import and_, func
+from app.modules.runtime import runtime
 from app.modules.sql import db
+import numpy as np
 import pytz
 import os
 import logging
 
+# 基础分、超额分、额外分的每日满分与在最终得分中的权重
+SCORE_PER_DAY = np.array([100, 10, 5], dtype=float)
+SCORE_WEIGHTS = np.array([80, 20, 15], dtype=float)
+
 
 class PeriodTaskScheduler:
     _instance = None
@@ -30,14 +35,6 @@ class PeriodTaskScheduler:
         
         logging.info(f"初始化 PeriodTaskScheduler (实例 ID: {self.instance_id})")
         
-        self.scheduler = BackgroundScheduler({
-            'apscheduler.timezone': 'Asia/Shanghai',
-            'apscheduler.job_defaults.coalesce': True,
-            'apscheduler.job_defaults.max_instances': 1,
-            'apscheduler.misfire_grace_time': 3600,
-            'id': f'period_task_scheduler_{self.instance_id}'
-        })
-        
         if app is not None:
             logging.info(f"立即初始化 app (实例 ID: {self.instance_id})")
             self._init_app(app)
@@ -52,25 +49,22 @@ class PeriodTaskScheduler:
             now = datetime.now(self.timezone)
             
             # 添加主计分任务，使用 cron 但确时区正确
-            self.scheduler.add_job(
+            runtime.add_job(
                 self._auto_calculate_scores_wrapper,
                 'cron',
                 hour='9',        # 每小时
                 minute='45',   # 每30分钟
                 id='period_task_score_calculator',
-                replace_existing=True,
                 name='周期任务得分计算',
-                timezone=self.timezone,  # 明确指定时区
-                misfire_grace_time=3600
             )
             
             # 测试任务保持 interval 方式
-            self.scheduler.add_job(
+            runtime.add_job(
                 self._test_scheduler,
                 'interval',
                 minutes=30,          # 每30分钟执行一次
-                id='scheduler_test_job',
-                replace_existing=True,
+                id='period_task_scheduler_test',
+                persistent=False,  # 自检任务在每个进程中各自执行
                 name='调度器测试任务',
                 next_run_time=now   # 立即执行第一次
             )
@@ -114,125 +108,103 @@ class PeriodTaskScheduler:
             logging.error(error_msg, exc_info=True)
 
     def auto_calculate_period_task_scores(self):
+        """计算已到期且尚未评分的周期任务的最终得分
+
+        一次聚合查询取得每个任务时间窗口内负责人日报的天数与各项分数之和，
+        以NumPy数组批量计算加权得分后，一次批量更新写入。
+        """
         try:
             now = datetime.now()
-            today = now.date()
             logging.info(f"开始检查到期周期任务，当前时间: {now}")
 
-            expiring_tasks = PeriodTask.query.filter(
-                func.date(PeriodTask.end_time) <= today
-            ).all()
-
-            logging.info(f"今日有 {len(expiring_tasks)} 个周期任务到期")
-
-            for task in expiring_tasks:
-                try:
-                    logging.info(f"开始计算周期任务 {task.task_id} 的最终得分")
-                    
-                    daily_reports = DailyReport.query.filter(
-                        DailyReport.user_id == task.assignee_id,
-                        DailyReport.created_at >= task.start_time,
-                        DailyReport.created_at <= task.end_time
-                    ).all()
-
-                    total_days = len(daily_reports)
-                    score_config = {
-                        'basic_score_day': 100,
-                        'excess_score_day': 10,
-                        'extra_score_day': 5
-                    }
-
-                    if total_days > 0:
-                        score_totals = {
-                            'basic': sum(report.basic_score or 0 for report in daily_reports),
-                            'excess': sum(report.excess_score or 0 for report in daily_reports),
-                            'extra': sum(report.extra_score or 0 for report in daily_reports)
-                        }
-
-                        max_scores = {
-                            'basic': total_days * score_config['basic_score_day'],
-                            'excess': total_days * score_config['excess_score_day'],
-                            'extra': total_days * score_config['extra_score_day']
-                        }
-
-                        final_scores = {
-                            'basic': (score_totals['basic'] / max_scores['basic']) * 80 if max_scores['basic'] > 0 else 0,
-                            'excess': (score_totals['excess'] / max_scores['excess']) * 20 if max_scores['excess'] > 0 else 0,
-                            'extra': (score_totals['extra'] / max_scores['extra']) * 15 if max_scores['extra'] > 0 else 0
-                        }
-
-                        final_total_score = sum(final_scores.values())
-                        
-                        task.completed_task_description = str(round(final_total_score, 2))
-                        task.updated_at = now
-                        
-                        logging.info(f"""周期任务 {task.task_id} 得分计算详情:
-                            总天数: {total_days}
-                            基础得分: {final_scores['basic']:.2f}
-                            超额得分: {final_scores['excess']:.2f}
-                            额外得分: {final_scores['extra']:.2f}
-                            最终总分: {final_total_score:.2f}
-                        """)
-                        
-                        db.session.commit()
-                        logging.info(f"周期任务 {task.task_id} 得分计算完成并已保存")
-
-                except Exception as e:
-                    logging.error(f"计算周期任务 {task.task_id} 得分时出错: {str(e)}", exc_info=True)
-                    db.session.rollback()
-                    continue
+            expiring_tasks = (db.session.query(
+                    PeriodTask.task_id,
+                    PeriodTask.assignee_id,
+                    PeriodTask.start_time,
+                    PeriodTask.end_time
+                )
+                .filter(
+                    # 只对已真正结束的任务评分，评分后不再重算
+                    PeriodTask.end_time <= now,
+                    PeriodTask.final_score.is_(None)
+                )
+                .subquery())
+
+            # 按任务汇总其时间窗口内负责人的日报
+            rows = (db.session.query(
+                    expiring_tasks.c.task_id,
+                    func.count(DailyReport.report_id),
+                    func.coalesce(func.sum(DailyReport.basic_score), 0),
+                    func.coalesce(func.sum(DailyReport.excess_score), 0),
+                    func.coalesce(func.sum(DailyReport.extra_score), 0)
+                )
+                .join(DailyReport, and_(
+                    DailyReport.user_id == expiring_tasks.c.assignee_id,
+                    DailyReport.created_at >= expiring_tasks.c.start_time,
+                    DailyReport.created_at <= expiring_tasks.c.end_time
+                ))
+                .group_by(expiring_tasks.c.task_id)
+                .all())
+
+            logging.info(f"有 {len(rows)} 个到期未评分且有日报的周期任务")
+            if not rows:
+                return
+
+            task_ids = [row[0] for row in rows]
+            totals = np.array([row[1:] for row in rows], dtype=float)
+            total_days, score_totals = totals[:, 0], totals[:, 1:]
+
+            # 各项得分 = 实际总分 / (天数 * 每日满分) * 权重
+            max_scores = total_days[:, None] * SCORE_PER_DAY
+            final_scores = score_totals / max_scores * SCORE_WEIGHTS
+            final_total_scores = np.round(final_scores.sum(axis=1), 2)
+
+            db.session.bulk_update_mappings(PeriodTask, [
+                {
+                    "task_id": task_id,
+                    "final_score": float(score),
+                    "completed_task_description": str(float(score)),
+                    "updated_at": now
+                }
+                for task_id, score in zip(task_ids, final_total_scores)
+            ])
+            db.session.commit()
+
+            for task_id, days, scores, total in zip(task_ids, total_days, final_scores, final_total_scores):
+                logging.info(
+                    f"周期任务 {task_id} 得分: 总天数 {int(days)}，基础得分 {scores[0]:.2f}，"
+                    f"超额得分 {scores[1]:.2f}，额外得分 {scores[2]:.2f}，最终总分 {total:.2f}"
+                )
+            logging.info(f"{len(task_ids)} 个周期任务得分计算完成并已保存")
 
         except Exception as e:
             logging.error(f"检查到期周期任务失败: {str(e)}", exc_info=True)
             db.session.rollback()
 
     def start_scheduler(self):
+        """确保统一的定时任务运行时已启动"""
         try:
-            if not self.scheduler.running:
-                # 启动调度器
-                self.scheduler.start()
-                logging.info("定时任务调度器启动成功")
-                
-                # 在调度器启动后获取任务信息
-                jobs = self.scheduler.get_jobs()
-                logging.info("当前注册的所有任务:")
-                for job in jobs:
-                    next_run = job.next_run_time.astimezone(self.timezone)
-                    logging.info(f"- 任务名称: {job.name}")
-                    logging.info(f"  任务ID: {job.id}")
-                    logging.info(f"  下次执行时间: {next_run}")
-                
-            else:
-                logging.info("调度器已在运行中")
+            runtime.init_app(self.app)
+            logging.info("周期任务定时任务已注册到统一运行时")
         except Exception as e:
-            logging.error(f"定时任务调度器启动失败: {str(e)}", exc_info=True)
+            logging.error(f"周期任务定时任务运行时启动失败: {str(e)}", exc_info=True)
             raise
 
     def _print_jobs_info(self):
         """打印所有任务信息"""
         try:
-            jobs = self.scheduler.get_jobs()
             logging.info("当前注册的所有任务:")
-            for job in jobs:
-                try:
-                    next_run = job.next_run_time
-                    if next_run:
-                        next_run = next_run.astimezone(self.timezone)
-                        logging.info(f"- 任务名称: {job.name}")
-                        logging.info(f"  任务ID: {job.id}")
-                        logging.info(f"  下次执行时间: {next_run}")
-                except Exception as e:
-                    logging.error(f"获取任务 {job.name} 信息时出错: {str(e)}")
+            for job in runtime.get_jobs():
+                logging.info(f"- 任务名称: {job['name']}")
+                logging.info(f"  任务ID: {job['id']}")
+                logging.info(f"  下次执行时间: {job['next_run_time']}")
         except Exception as e:
             logging.error(f"获取任务信息时出错: {str(e)}")
 
     def stop_scheduler(self):
+        """关闭统一的定时任务运行时"""
         try:
-            if self.scheduler.running:
-                self.scheduler.shutdown(wait=False)  # 设置 wait=False
-                logging.info("定时任务调度器已关闭")
-            else:
-                logging.info("调度器已经是停止状态")
+            runtime.shutdown()
         except Exception as e:
-            logging.error(f"定时任务调度器关闭失败: {str(e)}", exc_info=True)
-            raise
\ No newline at end of file
+            logging.error(f"周期任务定时任务运行时关闭失败: {str(e)}", exc_info=True)
+            raise
@@ -1,8 +1,9 @@
-from apscheduler.schedulers.background import BackgroundScheduler
 from datetime import datetime, timedelta
 from app.models.member import Member
 from app.models.period_task import PeriodTask
+from app.modules.runtime import runtime
 from app.modules.sql import db
+from sqlalchemy import func, select, update
 import pytz
 import logging
 
@@ -26,14 +27,6 @@ class MemberScoreScheduler:
         
         logging.info(f"初始化 MemberScoreScheduler (实例 ID: {self.instance_id})")
         
-        self.scheduler = BackgroundScheduler({
-            'apscheduler.timezone': 'Asia/Shanghai',
-            'apscheduler.job_defaults.coalesce': True,
-            'apscheduler.job_defaults.max_instances': 1,
-            'apscheduler.misfire_grace_time': 3600,
-            'id': f'member_score_scheduler_{self.instance_id}'
-        })
-        
         if app is not None:
             self.init_app(app)
 
@@ -45,13 +38,12 @@ class MemberScoreScheduler:
     def setup_jobs(self):
         try:
             # 每天凌晨3点执行
-            self.scheduler.add_job(
+            runtime.add_job(
                 self._update_member_scores,
                 'cron',
                 hour='15',
                 minute='13',
                 id='member_score_updater',
-                replace_existing=True,
                 name='成员学期任务平均分更新',
                 timezone=self.timezone
             )
@@ -66,60 +58,51 @@ class MemberScoreScheduler:
         logging.info("=== 开始更新成员学期任务平均分 ===")
         try:
             with self.app.app_context():
-                members = Member.query.all()
-                
-                for member in members:
-                    # 查询该成员的所有已完成周期任务
-                    period_tasks = PeriodTask.query.filter(
-                        PeriodTask.assignee_id == member.id,
-                        PeriodTask.completed_task_description.isnot(None)
-                    ).all()
-
-                    total_score = 0
-                    reviewed_count = 0
-                    
-                    for task in period_tasks:
-                        try:
-                            if task.completed_task_description:
-                                score = float(task.completed_task_description)
-                                total_score += score
-                                reviewed_count += 1
-                        except (ValueError, TypeError):
-                            continue
-
-                    # 只有在有已评分的任务时才更新平均分
-                    if reviewed_count > 0:
-                        average_score = round(total_score / reviewed_count, 2)
-                        member.period_task_score = average_score
-                        
-                    logging.info(f"成员 {member.id} 的学期任务平均分更新为: {member.period_task_score}")
-
-                db.session.commit()
-                logging.info("=== 成员学期任务平均分更新完成 ===")
+                updated = self.update_member_scores()
+                logging.info(f"=== 成员学期任务平均分更新完成，共更新 {updated} 名成员 ===")
                 
         except Exception as e:
             db.session.rollback()
             error_msg = f"更新成员学期任务平均分失败: {str(e)}"
             logging.error(error_msg, exc_info=True)
 
+    @staticmethod
+    def update_member_scores() -> int:
+        """以一条 UPDATE ... FROM 聚合子查询更新所有成员的学期任务平均分
+        只有存在已评分周期任务的成员才会被更新
+        Returns:
+            int: 更新的成员数
+        """
+        averages = (select(
+                PeriodTask.assignee_id,
+                func.round(func.avg(PeriodTask.final_score), 2).label("average_score")
+            )
+            .where(PeriodTask.final_score.isnot(None))
+            .group_by(PeriodTask.assignee_id)
+            .subquery())
+
+        result = db.session.execute(
+            update(Member)
+            .where(Member.id == averages.c.assignee_id)
+            .values(period_task_score=averages.c.average_score)
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        return result.rowcount
+
     def start_scheduler(self):
+        """确保统一的定时任务运行时已启动"""
         try:
-            if not self.scheduler.running:
-                self.scheduler.start()
-                logging.info("成员得分更新调度器启动成功")
-            else:
-                logging.info("成员得分更新调度器已在运行中")
+            runtime.init_app(self.app)
+            logging.info("成员得分更新定时任务已注册到统一运行时")
         except Exception as e:
-            logging.error(f"成员得分更新调度器启动失败: {str(e)}", exc_info=True)
+            logging.error(f"成员得分更新定时任务运行时启动失败: {str(e)}", exc_info=True)
             raise
 
     def stop_scheduler(self):
+        """关闭统一的定时任务运行时"""
         try:
-            if self.scheduler.running:
-                self.scheduler.shutdown(wait=False)
-                logging.info("成员得分更新调度器已关闭")
-            else:
-                logging.info("调度器已经是停止状态")
+            runtime.shutdown()
         except Exception as e:
-            logging.error(f"成员得分更新调度器关闭失败: {str(e)}", exc_info=True)
-            raise 
\ No newline at end of file
+            logging.error(f"成员得分更新定时任务运行时关闭失败: {str(e)}", exc_info=True)
+            raise
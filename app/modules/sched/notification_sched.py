@@ -3,7 +3,6 @@
 专门处理通知相关的定时任务
 """
 
-from apscheduler.schedulers.background import BackgroundScheduler
 from datetime import datetime, timedelta
 import pytz
 import logging
@@ -13,8 +12,11 @@ from app.models.member import Member
 from app.models.daily_task import DailyTask
 from app.models.notification import Notification, NotificationType
 from app.controllers.daily_task import generate_daily_task_from_period
+from app.modules.notification_retention import delete_expired_notifications, rotate_partitions
 from app.modules.notification_service import NotificationService
+from app.modules.runtime import runtime
 from app.modules.sql import db
+from config import Config
 
 class NotificationScheduler:
     """通知调度器类，处理所有与通知相关的定时任务"""
@@ -38,14 +40,6 @@ class NotificationScheduler:
         
         logging.info(f"初始化 NotificationScheduler (实例 ID: {self.instance_id})")
         
-        self.scheduler = BackgroundScheduler({
-            'apscheduler.timezone': 'Asia/Shanghai',
-            'apscheduler.job_defaults.coalesce': True,
-            'apscheduler.job_defaults.max_instances': 1,
-            'apscheduler.misfire_grace_time': 3600,
-            'id': f'notification_scheduler_{self.instance_id}'
-        })
-        
         if app is not None:
             logging.info(f"立即初始化 app (实例 ID: {self.instance_id})")
             self.init_app(app)
@@ -61,51 +55,42 @@ class NotificationScheduler:
             now = datetime.now(self.timezone)
             
             # 每日任务生成通知：在每日任务生成后（1:15）发送通知
-            self.scheduler.add_job(
+            runtime.add_job(
                 self.send_daily_task_notifications,
                 'cron',
                 hour='1',
                 minute='15',
                 id='daily_task_notification',
-                replace_existing=True,
                 name='每日任务生成通知',
-                timezone=self.timezone,
-                misfire_grace_time=3600
             )
             
             # 日报填写提醒通知：每天晚上8点提醒填写日报
-            self.scheduler.add_job(
+            runtime.add_job(
                 self.send_daily_report_reminder,
                 'cron',
                 hour='20',
                 minute='0',
                 id='daily_report_reminder',
-                replace_existing=True,
                 name='日报填写提醒',
-                timezone=self.timezone,
-                misfire_grace_time=3600
             )
             
             # 通知清理任务：每天晚上12点清理非当天的重复性通知
-            self.scheduler.add_job(
+            runtime.add_job(
                 self.clean_expired_notifications,
                 'cron',
                 hour='0',
                 minute='0',
                 id='notification_cleanup',
-                replace_existing=True,
                 name='通知清理任务',
-                timezone=self.timezone,
-                misfire_grace_time=3600
             )
             
             # 测试任务
-            self.scheduler.add_job(
+            runtime.add_job(
                 self._test_scheduler,
                 'interval',
                 minutes=30,
                 id='notification_test_job',
-                replace_existing=True,
+                persistent=False,  # 自检任务在每个进程中各自执行
                 name='通知调度器测试任务',
                 next_run_time=now
             )
@@ -146,12 +131,11 @@ class NotificationScheduler:
                     DailyTask.task_date <= tomorrow
                 ).all()
                 
-                notification_count = 0
-                for task in daily_tasks:
-                    NotificationService.notify_daily_task_created(task)
-                    notification_count += 1
+                # 按日期排序，同一用户有多个任务时通知指向最后一个任务
+                daily_tasks.sort(key=lambda task: task.task_date)
+                result = NotificationService.notify_daily_tasks_created(daily_tasks)
                 
-                logging.info(f"=== 每日任务通知发送完成，共发送 {notification_count} 条通知 ===")
+                logging.info(f"=== 每日任务通知发送完成，新建 {result['created']} 条，更新 {result['updated']} 条通知 ===")
         except Exception as e:
             error_msg = f"每日任务通知发送失败: {str(e)}"
             print(error_msg)
@@ -178,27 +162,17 @@ class NotificationScheduler:
                 # 获取当天的开始时间
                 today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
                 
-                # 查找所有非当天的每日任务生成和日报填写提醒通知
-                expired_notifications = Notification.query.filter(
-                    db.and_(
-                        Notification.created_at < today,
-                        Notification.notification_type.in_([
-                            NotificationType.DAILY_TASK_CREATED,
-                            NotificationType.DAILY_REPORT_REMINDER
-                        ])
-                    )
-                ).all()
-                
-                # 删除这些过期通知
-                deleted_count = 0
-                for notification in expired_notifications:
-                    db.session.delete(notification)
-                    deleted_count += 1
-                
-                # 提交事务
-                db.session.commit()
-                
+                # 按块删除所有非当天的每日任务生成和日报填写提醒通知
+                deleted_count = delete_expired_notifications(today, [
+                    NotificationType.DAILY_TASK_CREATED,
+                    NotificationType.DAILY_REPORT_REMINDER
+                ])
                 logging.info(f"=== 通知清理完成，共删除 {deleted_count} 条过期通知 ===")
+
+                # 启用按月分区时，删除超过保留期的分区并预建未来的分区
+                if Config.NOTIFICATION_RETENTION_MONTHS:
+                    result = rotate_partitions(Config.NOTIFICATION_RETENTION_MONTHS)
+                    logging.info(f"=== 通知分区轮换完成: {result} ===")
         except Exception as e:
             db.session.rollback()
             error_msg = f"清理过期通知失败: {str(e)}"
@@ -206,34 +180,18 @@ class NotificationScheduler:
             logging.error(error_msg, exc_info=True)
 
     def start_scheduler(self):
-        """启动通知调度器"""
+        """确保统一的定时任务运行时已启动"""
         try:
-            if not self.scheduler.running:
-                self.scheduler.start()
-                logging.info("通知调度器启动成功")
-                
-                jobs = self.scheduler.get_jobs()
-                logging.info("当前注册的所有通知任务:")
-                for job in jobs:
-                    next_run = job.next_run_time.astimezone(self.timezone)
-                    logging.info(f"- 任务名称: {job.name}")
-                    logging.info(f"  任务ID: {job.id}")
-                    logging.info(f"  下次执行时间: {next_run}")
-                
-            else:
-                logging.info("通知调度器已在运行中")
+            runtime.init_app(self.app)
+            logging.info("通知定时任务已注册到统一运行时")
         except Exception as e:
-            logging.error(f"通知调度器启动失败: {str(e)}", exc_info=True)
+            logging.error(f"通知定时任务运行时启动失败: {str(e)}", exc_info=True)
             raise
 
     def stop_scheduler(self):
-        """停止通知调度器"""
+        """关闭统一的定时任务运行时"""
         try:
-            if self.scheduler.running:
-                self.scheduler.shutdown(wait=False)
-                logging.info("通知调度器已关闭")
-            else:
-                logging.info("通知调度器已经是停止状态")
+            runtime.shutdown()
         except Exception as e:
-            logging.error(f"通知调度器关闭失败: {str(e)}", exc_info=True)
-            raise 
\ No newline at end of file
+            logging.error(f"通知定时任务运行时关闭失败: {str(e)}", exc_info=True)
+            raise
@@ -1,11 +1,21 @@
 from datetime import datetime
 from flask import Flask
-from apscheduler.schedulers.background import BackgroundScheduler
-from app.models.department import Department
-from app.controllers.task_progress import update_task_progress, update_department_progress, create_task_progress
+from sqlalchemy import and_
+from app.controllers.task_progress import (
+    DEFAULT_REPORT_TEXT,
+    bulk_upsert_task_progress,
+    evaluate_progress_value,
+    get_latest_progress_map,
+    get_recent_report_texts,
+    update_department_progress,
+)
+from app.utils.department_tree import department_tree
 from app.utils.logger import Log
 from app.models.member import Member
 from app.models.period_task import PeriodTask
+from app.modules.llm_pool import map_concurrently
+from app.modules.runtime import runtime
+from app.modules.sql import db
 
 class ProgressUpdateScheduler:
     _instance = None
@@ -24,24 +34,24 @@ class ProgressUpdateScheduler:
             app: Flask应用实例
         """
         self.app = app
-        self.scheduler = BackgroundScheduler()
         self.setup_jobs()
 
     def setup_jobs(self):
         """设置调度任务"""
         # 每天早上5点执行批量进度更新
-        self.scheduler.add_job(
-            func=self.batch_update_all_departments_progress,
-            trigger='cron',
+        runtime.add_job(
+            self.batch_update_all_departments_progress,
+            'cron',
             hour=5,
             minute=0,
-            id='batch_progress_update'
+            id='batch_progress_update',
+            name='批量进度更新'
         )
 
     def start(self):
         """启动调度器"""
         try:
-            self.scheduler.start()
+            runtime.init_app(self.app)
             Log.info("进度更新调度器已启动")
         except Exception as e:
             Log.error(f"启动进度更新调度器失败: {str(e)}")
@@ -49,13 +59,16 @@ class ProgressUpdateScheduler:
     def stop(self):
         """停止调度器"""
         try:
-            self.scheduler.shutdown()
+            runtime.shutdown()
             Log.info("进度更新调度器已停止")
         except Exception as e:
             Log.error(f"停止进度更新调度器失败: {str(e)}")
 
     def batch_update_task_progress(self, department_id: str = None) -> dict:
         """批量创建或更新所有成员的任务进度记录
+
+        以集合方式处理：一次关联查询取得所有(成员, 活跃任务)对，一次窗口查询取得每对的最新进度，
+        一次查询取得成员最近的日报，评估后以单条 INSERT ... ON DUPLICATE KEY UPDATE 在同一事务中写入。
         Args:
             department_id: 部门ID（可选）
         Returns:
@@ -63,103 +76,124 @@ class ProgressUpdateScheduler:
         """
         try:
             current_time = datetime.now()
-            
-            # 获取需要处理的成员列表
-            query = Member.query
+            today = current_time.date()
+
+            # 以左连接一次取得成员及其活跃任务，没有活跃任务的成员对应的任务为None
+            query = db.session.query(Member.id, Member.department_id, PeriodTask).outerjoin(
+                PeriodTask,
+                and_(
+                    PeriodTask.assignee_id == Member.id,
+                    PeriodTask.start_time <= current_time,
+                    PeriodTask.end_time >= current_time
+                )
+            )
             if department_id:
-                query = query.filter_by(department_id=department_id)
-            members = query.all()
+                query = query.filter(Member.department_id == department_id)
+            rows = query.all()
 
-            if not members:
+            if not rows:
                 Log.error(f"找不到需要处理的成员 (department_id: {department_id if department_id else 'all'})")
                 return {
                     'success': False,
                     'message': "找不到需要处理的成员"
                 }
 
-            # 批量处理每个成员的进度
+            member_tasks = {}
+            member_departments = {}
+            for member_id, member_department_id, task in rows:
+                member_departments[member_id] = member_department_id
+                tasks = member_tasks.setdefault(member_id, [])
+                if task is not None:
+                    tasks.append(task)
+
+            pairs = [(member_id, task) for member_id, tasks in member_tasks.items() for task in tasks]
+            latest_progress = get_latest_progress_map(
+                list({task.task_id for _, task in pairs}),
+                list({member_id for member_id, _ in pairs})
+            )
+            report_texts = get_recent_report_texts(list({member_id for member_id, _ in pairs}))
+
+            # 在有并发上限的线程池中评估所有进度
+            def evaluate(pair):
+                member_id, task = pair
+                last = latest_progress.get((task.task_id, member_id))
+                return evaluate_progress_value(
+                    member_id,
+                    task,
+                    report_texts.get(member_id) or DEFAULT_REPORT_TEXT,
+                    last.progress_value if last else None
+                )
+
+            evaluated = {}
+            for (member_id, task), value in zip(pairs, map_concurrently(evaluate, pairs)):
+                if isinstance(value, Exception):
+                    Log.error(f"评估成员 {member_id} 的任务 {task.task_id} 进度时出错: {str(value)}")
+                    continue
+                evaluated[(member_id, task.task_id)] = value
+
+            # 单条语句、单个事务写入所有进度
+            records = [
+                {
+                    'task_id': task_id,
+                    'user_id': member_id,
+                    'progress_date': today,
+                    'progress_value': value
+                }
+                for (member_id, task_id), value in evaluated.items()
+            ]
+            bulk_upsert_task_progress(records)
+
+            # 整理结果
             results = []
             success_count = 0
-            total_tasks_count = 0
+            total_tasks_count = len(pairs)
             updated_task_ids = set()  # 记录已更新的任务ID，用于后续更新部门统计
             departments_to_update = set()  # 记录需要更新统计的部门ID
-            
-            for member in members:
-                try:
-                    # 查找该成员的所有活跃任务
-                    member_tasks = PeriodTask.query.filter(
-                        PeriodTask.assignee_id == member.id,
-                        PeriodTask.start_time <= current_time,
-                        PeriodTask.end_time >= current_time
-                    ).all()
-                    
-                    if not member_tasks:
-                        Log.info(f"成员 {member.id} 没有需要更新的活跃任务")
-                        results.append({
-                            'user_id': member.id,
-                            'success': True,
-                            'message': '没有需要更新的活跃任务',
-                            'data': None
-                        })
-                        continue
-                    
-                    # 为每个任务更新进度
-                    member_success_count = 0
-                    member_task_results = []
-                    
-                    for task in member_tasks:
-                        total_tasks_count += 1
-                        
-                        # 尝试创建进度记录
-                        result = create_task_progress(
-                            user_id=member.id,
-                            task_id=task.task_id
-                        )
-                        
-                        # 如果创建失败（可能已存在记录），尝试更新
-                        if result.code != 200:
-                            result = update_task_progress(
-                                user_id=member.id,
-                                task_id=task.task_id
-                            )
-                        
-                        if result.code == 200:
-                            member_success_count += 1
-                            success_count += 1
-                            member_task_results.append({
-                                'task_id': task.task_id,
-                                'success': True,
-                                'message': '进度更新成功',
-                                'data': result.data
-                            })
-                            
-                            # 记录已更新的任务，用于后续更新部门统计
-                            updated_task_ids.add(task.task_id)
-                            departments_to_update.add(member.department_id)
-                        else:
-                            member_task_results.append({
-                                'task_id': task.task_id,
-                                'success': False,
-                                'message': str(result.message),
-                                'data': result.data
-                            })
-                    
-                    # 记录该成员的所有任务结果
-                    results.append({
-                        'user_id': member.id,
-                        'success': member_success_count > 0,
-                        'message': f'成功更新 {member_success_count}/{len(member_tasks)} 个任务',
-                        'tasks': member_task_results
-                    })
-                        
-                except Exception as e:
-                    Log.error(f"处理成员 {member.id} 的进度时出错: {str(e)}")
+
+            for member_id, tasks in member_tasks.items():
+                if not tasks:
+                    Log.info(f"成员 {member_id} 没有需要更新的活跃任务")
                     results.append({
-                        'user_id': member.id,
-                        'success': False,
-                        'message': str(e),
+                        'user_id': member_id,
+                        'success': True,
+                        'message': '没有需要更新的活跃任务',
                         'data': None
                     })
+                    continue
+
+                member_success_count = 0
+                member_task_results = []
+                for task in tasks:
+                    if (member_id, task.task_id) in evaluated:
+                        member_success_count += 1
+                        success_count += 1
+                        member_task_results.append({
+                            'task_id': task.task_id,
+                            'success': True,
+                            'message': '进度更新成功',
+                            'data': {
+                                'task_id': task.task_id,
+                                'user_id': member_id,
+                                'progress_date': today.isoformat(),
+                                'progress_value': evaluated[(member_id, task.task_id)]
+                            }
+                        })
+                        updated_task_ids.add(task.task_id)
+                        departments_to_update.add(member_departments[member_id])
+                    else:
+                        member_task_results.append({
+                            'task_id': task.task_id,
+                            'success': False,
+                            'message': '评估进度失败',
+                            'data': None
+                        })
+
+                results.append({
+                    'user_id': member_id,
+                    'success': member_success_count > 0,
+                    'message': f'成功更新 {member_success_count}/{len(tasks)} 个任务',
+                    'tasks': member_task_results
+                })
 
             # 更新部门进度统计
             department_stats = []
@@ -198,11 +232,11 @@ class ProgressUpdateScheduler:
                             'message': str(e)
                         })
 
-            Log.info(f"批量处理任务进度完成：总计 {len(members)} 人，{total_tasks_count} 个任务，成功 {success_count} 个，更新了 {len(department_stats)} 个部门成员进度汇总")
+            Log.info(f"批量处理任务进度完成：总计 {len(member_tasks)} 人，{total_tasks_count} 个任务，成功 {success_count} 个，更新了 {len(department_stats)} 个部门成员进度汇总")
             
             return {
                 'success': True,
-                'total_members': len(members),
+                'total_members': len(member_tasks),
                 'total_tasks': total_tasks_count,
                 'success_count': success_count,
                 'results': results,
@@ -239,54 +273,25 @@ class ProgressUpdateScheduler:
         
         注意：部门本身没有任务，部门进度是指该部门所有成员的进度统计，
         包括平均进度、最高进度、最低进度等指标。
+        所有部门的进度评估在同一个并发池中进行，并由一次批量写入落库。
         """
         try:
             with self.app.app_context():
-                # 获取所有部门
-                departments = Department.query.all()
-                if not departments:
+                if department_tree.is_empty():
                     Log.error("没有找到任何部门")
                     return False
 
-                total_results = []
-                success_count = 0
-                
-                # 为每个部门计算所有成员的进度统计
-                for department in departments:
-                    try:
-                        Log.info(f"开始计算部门 {department.name} 的成员进度统计")
-                        
-                        # 更新该部门所有成员的进度数据
-                        result = self.batch_update_task_progress(department_id=department.id)
-                        
-                        if result['success']:
-                            Log.info(f"成功更新部门 {department.name} 的成员进度: {result['success_count']}/{result['total_tasks']} 个任务")
-                            success_count += 1
-                        else:
-                            Log.error(f"更新部门 {department.name} 的成员进度失败: {result.get('message', '未知错误')}")
-                        
-                        total_results.append({
-                            'department_id': department.id,
-                            'department_name': department.name,
-                            'result': result
-                        })
-                    
-                    except Exception as e:
-                        error_msg = str(e)
-                        Log.error(f"计算部门 {department.name} 的成员进度统计时出错: {error_msg}")
-                        total_results.append({
-                            'department_id': department.id,
-                            'department_name': department.name,
-                            'error': error_msg
-                        })
+                result = self.batch_update_task_progress()
+                if not result['success']:
+                    Log.error(f"更新部门成员进度失败: {result.get('message', '未知错误')}")
+                    return False
 
-                # 统计总体结果
-                success_departments = sum(1 for r in total_results if r.get('result', {}).get('success', False))
-                total_departments = len(total_results)
-                
-                Log.info(f"部门成员进度统计完成：总计 {total_departments} 个部门，成功 {success_departments} 个")
-                return success_departments > 0  # 只要有一个部门成功就返回True
+                department_stats = result['department_stats']
+                success_departments = sum(1 for r in department_stats if r['success'])
+                Log.info(f"成功更新成员进度: {result['success_count']}/{result['total_tasks']} 个任务")
+                Log.info(f"部门成员进度统计完成：总计 {len(department_stats)} 个部门，成功 {success_departments} 个")
+                return result['success_count'] > 0 or result['total_tasks'] == 0
 
         except Exception as e:
             Log.error(f"执行部门成员进度统计时出错: {str(e)}")
-            return False 
\ No newline at end of file
+            return False
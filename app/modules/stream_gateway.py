@@ -0,0 +1,297 @@
+"""
+异步流式网关
+以ASGI应用单独部署，在一个事件循环上同时承载所有长连接，不再为每个连接占用一个同步worker：
+- /gpt/chat：聊天的流式响应，上游的流式响应通过共用的httpx.AsyncClient读取，响应的格式与Flask中的chat_query完全一致
+- /notifications/stream：通知的SSE推送，见NotificationStream
+鉴权、请求解析与数据库的读写沿用Flask应用中的实现，在线程中执行。
+
+部署：uvicorn asgi:app --port 5003，并在反向代理中将 /gpt/chat 与 /notifications/stream 转发到该进程，
+其余路由仍由Flask应用处理。通知通过轮询数据库获取，可以启动多个网关进程（--workers N），无需共享状态。
+"""
+
+import asyncio
+import json
+import logging
+from contextlib import aclosing
+from typing import Any, Awaitable, Callable, Coroutine
+
+import httpx
+from flask import Flask, jsonify
+from flask_jwt_extended import get_jwt_identity, jwt_required
+
+from app.controllers.gpt import astream_openai_response
+from app.modules.notification_stream import NotificationStream
+from app.utils.auth import require_role
+from app.utils.constant import DataStructure as D
+from app.utils.response import Response
+from app.views.gpt import ChatRequest, chat_event, finish_chat, prepare_chat
+from config import Config
+
+CHAT_PATH = "/gpt/chat"
+NOTIFICATION_PATH = "/notifications/stream"
+
+Receive = Callable[[], Awaitable[dict]]
+Send = Callable[[dict], Awaitable[None]]
+
+SSE_HEADERS = [
+    (b"content-type", b"text/event-stream; charset=utf-8"),
+    (b"cache-control", b"no-cache"),
+    (b"x-accel-buffering", b"no"),
+]
+
+# 与Flask中的chat_query相同的角色限制
+_prepare_chat = require_role(D.admin, D.leader, D.sub_leader)(prepare_chat)
+
+
+@jwt_required(locations=["headers", "query_string"])
+def _notification_identity() -> str:
+    """EventSource无法设置请求头时，可通过查询参数jwt传递token"""
+    return get_jwt_identity()
+
+
+class StreamGateway:
+    """/gpt/chat与/notifications/stream的ASGI网关
+    Args:
+        flask_app (Flask): 提供鉴权与数据库上下文的Flask应用
+        max_streams (int): 同时进行的聊天流上限，超出时直接返回503
+    每块数据在send完成后才读取上游的下一块，客户端读取缓慢时上游的读取随之暂停；
+    客户端断开时取消对应的流并关闭上游连接。
+    """
+
+    def __init__(self, flask_app: Flask, max_streams: int) -> None:
+        self.flask_app = flask_app
+        self.max_streams = max_streams
+        self.active_streams = 0
+        self.client: httpx.AsyncClient | None = None
+        self.notifications = NotificationStream(
+            flask_app,
+            poll_interval=Config.NOTIFICATION_STREAM_POLL,
+            window=Config.NOTIFICATION_STREAM_WINDOW,
+        )
+
+    async def __call__(self, scope: dict, receive: Receive, send: Send) -> None:
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+        elif scope["type"] == "http":
+            await self._http(scope, receive, send)
+
+    def _get_client(self) -> httpx.AsyncClient:
+        """获取共用的上游客户端，服务器不支持lifespan时在首次请求时创建"""
+        if self.client is None:
+            self.client = httpx.AsyncClient(
+                timeout=httpx.Timeout(Config.LLM_READ_TIMEOUT, connect=Config.LLM_CONNECT_TIMEOUT),
+                limits=httpx.Limits(
+                    max_connections=self.max_streams,
+                    max_keepalive_connections=Config.LLM_HTTP_POOL_SIZE,
+                ),
+            )
+        return self.client
+
+    async def _lifespan(self, receive: Receive, send: Send) -> None:
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                self._get_client()
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                if self.client is not None:
+                    await self.client.aclose()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def _http(self, scope: dict, receive: Receive, send: Send) -> None:
+        headers = [(key.decode("latin-1"), value.decode("latin-1")) for key, value in scope["headers"]]
+        request_headers = {key.lower(): value for key, value in headers}
+        cors = _cors_headers(request_headers)
+
+        methods = {CHAT_PATH: "POST", NOTIFICATION_PATH: "GET"}
+        if (method := methods.get(scope["path"])) is None:
+            await _send_json(send, 404, Response.r.ERR_NOT_FOUND, "Not Found", cors)
+            return
+        if scope["method"] == "OPTIONS":
+            preflight = cors + [
+                (b"access-control-allow-methods", f"{method}, OPTIONS".encode("latin-1")),
+                (
+                    b"access-control-allow-headers",
+                    request_headers.get("access-control-request-headers", "*").encode("latin-1"),
+                ),
+            ]
+            await _send(send, 200, preflight, b"")
+            return
+        if scope["method"] != method:
+            await _send_json(send, 405, Response.r.ERR_INVALID_REQUEST, "Method Not Allowed", cors)
+            return
+
+        if scope["path"] == NOTIFICATION_PATH:
+            await self._notification_http(scope, receive, send, headers, cors)
+        else:
+            await self._chat_http(scope, receive, send, headers, cors)
+
+    async def _chat_http(
+        self, scope: dict, receive: Receive, send: Send, headers: list[tuple[str, str]], cors: list[tuple[bytes, bytes]]
+    ) -> None:
+        if self.active_streams >= self.max_streams:
+            await _send_json(send, 503, Response.r.ERR_TOO_MUCH_TIME, "Too many concurrent chats", cors)
+            return
+
+        self.active_streams += 1
+        try:
+            if (body := await _read_body(receive)) is None:
+                return
+            chat = await asyncio.to_thread(self._prepare, _prepare_chat, ChatRequest, scope, headers, body)
+            if not isinstance(chat, ChatRequest):
+                status, response_headers, content = chat
+                await _send(send, status, response_headers + cors, content)
+                return
+            await _until_disconnect(self._stream(chat, send, cors), receive, "chat gateway")
+        finally:
+            self.active_streams -= 1
+
+    async def _notification_http(
+        self, scope: dict, receive: Receive, send: Send, headers: list[tuple[str, str]], cors: list[tuple[bytes, bytes]]
+    ) -> None:
+        user_id = await asyncio.to_thread(self._prepare, _notification_identity, str, scope, headers, b"")
+        if not isinstance(user_id, str):
+            status, response_headers, content = user_id
+            await _send(send, status, response_headers + cors, content)
+            return
+
+        try:
+            events = await self.notifications.subscribe(user_id)
+        except Exception as e:
+            logging.error(f"Error in notification stream: {str(e)}")
+            await _send_json(send, 500, "ERR.INTERNAL", str(e), cors)
+            return
+        try:
+            await _until_disconnect(self._push(events, send, cors), receive, "notification stream")
+        finally:
+            self.notifications.unsubscribe(user_id, events)
+
+    def _prepare(
+        self, view: Callable[[], Any], expected: type, scope: dict, headers: list[tuple[str, str]], body: bytes
+    ) -> Any:
+        """在线程中以Flask请求上下文执行view，完成鉴权与请求解析
+        Returns:
+            view返回expected类型的结果时原样返回，否则为(状态码, 响应头, 响应体)
+        """
+        with self.flask_app.test_request_context(
+            scope["path"],
+            method=scope["method"],
+            headers=headers,
+            data=body,
+            query_string=scope.get("query_string", b""),
+        ):
+            try:
+                result = view()
+            except Exception as e:
+                try:
+                    # 交给Flask中注册的错误处理，如jwt缺失或无效时的响应
+                    result = self.flask_app.handle_user_exception(e)
+                except Exception:
+                    logging.error(f"Error in {view.__name__}: {str(e)}")
+                    result = jsonify({"code": "ERR.INTERNAL", "message": str(e), "data": None}), 500
+            if isinstance(result, expected):
+                return result
+
+            response = self.flask_app.make_response(result)
+            response_headers = [
+                (key.lower().encode("latin-1"), value.encode("latin-1")) for key, value in response.headers.items()
+            ]
+            return response.status_code, response_headers, response.get_data()
+
+    def _finish(self, chat: ChatRequest, content: str) -> None:
+        with self.flask_app.app_context():
+            finish_chat(chat, content)
+
+    async def _stream(self, chat: ChatRequest, send: Send, cors: list[tuple[bytes, bytes]]) -> None:
+        """将上游的流式响应按chat_query的格式转发给客户端"""
+        await send({"type": "http.response.start", "status": 200, "headers": SSE_HEADERS + cors})
+
+        async def write(payload: Any) -> None:
+            await send({"type": "http.response.body", "body": chat_event(payload), "more_body": True})
+
+        last_content = None
+        try:
+            # 被取消时也立即关闭生成器，从而关闭上游连接
+            async with aclosing(astream_openai_response(self._get_client(), chat.messages)) as chunks:
+                async for chunk_data in chunks:
+                    if chunk_data["type"] == "chunk":
+                        last_content = chunk_data["content"]
+                        await write({'content': chunk_data['content']})
+                    elif chunk_data["type"] == "done":
+                        if last_content:
+                            await asyncio.to_thread(self._finish, chat, last_content)
+                        await write({'final_content': last_content})
+                        await write("[DONE]")
+                    elif chunk_data["type"] == "error":
+                        await write({'error': chunk_data['content']})
+        except Exception as e:
+            logging.error(f"Error in generate: {str(e)}")
+            await write({'error': str(e)})
+        await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+    async def _push(self, events: asyncio.Queue, send: Send, cors: list[tuple[bytes, bytes]]) -> None:
+        """持续转发用户的通知事件，直到客户端断开"""
+        await send({"type": "http.response.start", "status": 200, "headers": SSE_HEADERS + cors})
+        while True:
+            try:
+                event = await asyncio.wait_for(events.get(), Config.NOTIFICATION_STREAM_HEARTBEAT)
+            except asyncio.TimeoutError:
+                # 心跳注释，防止反向代理因空闲关闭连接
+                event = b": ping\n\n"
+            await send({"type": "http.response.body", "body": event, "more_body": True})
+
+
+def _cors_headers(request_headers: dict[str, str]) -> list[tuple[bytes, bytes]]:
+    """与Flask应用的CORS配置一致，允许所有源并携带凭据"""
+    if not (origin := request_headers.get("origin")):
+        return []
+    return [
+        (b"access-control-allow-origin", origin.encode("latin-1")),
+        (b"access-control-allow-credentials", b"true"),
+        (b"vary", b"Origin"),
+    ]
+
+
+async def _read_body(receive: Receive) -> bytes | None:
+    """读取完整的请求体，读取期间客户端断开时返回None"""
+    chunks = []
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            return None
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body", False):
+            return b"".join(chunks)
+
+
+async def _until_disconnect(stream: Coroutine, receive: Receive, name: str) -> None:
+    """运行stream直到其结束或客户端断开，客户端先断开时取消stream"""
+    stream = asyncio.ensure_future(stream)
+    disconnect = asyncio.ensure_future(_wait_disconnect(receive))
+    try:
+        await asyncio.wait({stream, disconnect}, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        # 取消聊天流时退出httpx的上下文即关闭上游连接
+        stream.cancel()
+        disconnect.cancel()
+    for result in await asyncio.gather(stream, disconnect, return_exceptions=True):
+        if isinstance(result, Exception):
+            logging.error(f"Error in {name}: {str(result)}")
+
+
+async def _wait_disconnect(receive: Receive) -> None:
+    while (await receive())["type"] != "http.disconnect":
+        pass
+
+
+async def _send(send: Send, status: int, headers: list[tuple[bytes, bytes]], body: bytes) -> None:
+    await send({"type": "http.response.start", "status": status, "headers": headers})
+    await send({"type": "http.response.body", "body": body})
+
+
+async def _send_json(
+    send: Send, status: int, code: str, message: str, cors: list[tuple[bytes, bytes]]
+) -> None:
+    body = json.dumps({"code": code, "message": message, "data": None}).encode("utf-8")
+    await _send(send, status, [(b"content-type", b"application/json")] + cors, body)
@@ -0,0 +1,55 @@
+"""
+未读通知数缓存
+在内存中维护各用户的未读数，在通知创建、已读、删除时增减，避免每次查询都执行COUNT。
+
+缓存只在当前进程内有效，其他进程（如执行定时任务的leader）写入的通知在Config.NOTIFICATION_COUNT_TTL内同步；
+需要实时推送时由网关中的NotificationStream直接轮询数据库，不依赖该缓存。
+"""
+
+import threading
+import time
+from typing import Callable
+
+from config import Config
+
+
+class UnreadCountCache:
+    """进程内的未读数缓存
+    Args:
+        ttl (int): 缓存条目的有效秒数
+    """
+
+    def __init__(self, ttl: int) -> None:
+        self.ttl = ttl
+        self._counts: dict[str, tuple[float, int]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, user_id: str, load: Callable[[str], int]) -> int:
+        """获取用户的未读数，缓存不存在或已过期时调用load从数据库读取"""
+        with self._lock:
+            entry = self._counts.get(user_id)
+            if entry and entry[0] > time.monotonic():
+                return entry[1]
+        count = load(user_id)
+        with self._lock:
+            self._counts[user_id] = (time.monotonic() + self.ttl, count)
+        return count
+
+    def adjust(self, user_id: str, delta: int) -> None:
+        """增减已缓存的未读数，未缓存时不做任何事"""
+        with self._lock:
+            if entry := self._counts.get(user_id):
+                self._counts[user_id] = (entry[0], max(entry[1] + delta, 0))
+
+    def set(self, user_id: str, count: int) -> None:
+        """设置用户的未读数"""
+        with self._lock:
+            self._counts[user_id] = (time.monotonic() + self.ttl, count)
+
+    def clear(self) -> None:
+        """清空所有缓存，用于无法按用户追踪的批量删除之后"""
+        with self._lock:
+            self._counts.clear()
+
+
+unread_counts = UnreadCountCache(Config.NOTIFICATION_COUNT_TTL)
@@ -1,6 +1,8 @@
 import inspect
+import time
 from functools import wraps
-from typing import Any, Callable
+from threading import Lock
+from typing import Any, Callable, NamedTuple
 
 from flask_jwt_extended import get_jwt_identity, jwt_required
 from jwt.exceptions import ExpiredSignatureError
@@ -8,10 +10,79 @@ from jwt.exceptions import ExpiredSignatureError
 from app.models.member import Member
 from app.utils.database import CRUD
 from app.utils.response import Response
+from config import Config
+
+
+class Identity(NamedTuple):
+    """鉴权所需的最小用户身份信息"""
+
+    id: str
+    role: str
+    department_id: int | None
+
+
+class IdentityCache:
+    """进程内的用户身份缓存，以jwt的identity为键，在有效期内鉴权时不再查询数据库
+    Args:
+        ttl (int): 缓存条目的有效秒数
+    当用户的角色或部门发生变化、或用户被删除时，需要调用invalidate以使缓存失效。
+    """
+
+    def __init__(self, ttl: int) -> None:
+        self.ttl = ttl
+        self._entries: dict[str, tuple[float, Identity]] = {}
+        self._lock = Lock()
+
+    def get(self, user_id: str) -> Identity | None:
+        """获取未过期的身份信息，不存在或已过期时返回None"""
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if not entry:
+                return None
+            expires_at, identity = entry
+            if expires_at < time.monotonic():
+                del self._entries[user_id]
+                return None
+            return identity
+
+    def set(self, member: Member) -> Identity:
+        """将成员的身份信息写入缓存"""
+        identity = Identity(member.id, member.role.value, member.department_id)
+        with self._lock:
+            self._entries[member.id] = (time.monotonic() + self.ttl, identity)
+        return identity
+
+    def invalidate(self, user_id: str) -> None:
+        """使指定用户的缓存失效"""
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self) -> None:
+        """清空所有缓存"""
+        with self._lock:
+            self._entries.clear()
+
+
+identity_cache = IdentityCache(Config.IDENTITY_CACHE_TTL)
+
+
+def load_identity(user_id: str) -> Identity | None:
+    """优先从缓存中获取用户身份，未命中时查询数据库并写入缓存
+    Args:
+        user_id (str): jwt中的identity，即用户id
+    Returns:
+        (Identity | None): 用户身份，用户不存在时返回None
+    """
+    if identity := identity_cache.get(user_id):
+        return identity
+
+    if not (query := CRUD(Member, id=user_id).query_key()):
+        return None
+    return identity_cache.set(query.first())
 
 
 def require_role(*roles: str) -> Callable:
-    """装饰器，用以验证用户是否合法用户，并检测发送请求的用户是否在列出的角色中，否则返回认证失败响应。如果需要获取请求的角色或id，被装饰的函数必须包含键为role或user_id的参数
+    """装饰器，用以验证用户是否合法用户，并检测发送请求的用户是否在列出的角色中，否则返回认证失败响应。如果需要获取请求的角色、id或部门id，被装饰的函数必须包含键为role、user_id或department_id的参数
     Args:
         *roles: 在Member模型中包含的角色，空则允许所有角色
     :Example:
@@ -36,6 +107,11 @@ def require_role(*roles: str) -> Callable:
         Returns:
             Callable: 包装后的视图函数
         """
+        # 在装饰时解析一次函数签名，而不是在每次请求时解析
+        func_params = inspect.signature(fn).parameters
+        pass_role = "role" in func_params
+        pass_user_id = "user_id" in func_params
+        pass_department_id = "department_id" in func_params
 
         @wraps(fn)
         @jwt_required()  # 验证jwt
@@ -47,21 +123,20 @@ def require_role(*roles: str) -> Callable:
             try:
                 current_id = get_jwt_identity()
 
-                if not (query := CRUD(Member, id=current_id).query_key()):
+                if not (identity := load_identity(current_id)):
                     return Response(
                         Response.r.ERR_NOT_FOUND, message="该用户不存在", immediate=True
                     )
 
-                res = query.first()
-
-                if roles and res.role.value not in roles:
+                if roles and identity.role not in roles:
                     return Response(Response.r.AUTH_FAILED, immediate=True)
 
-                func_params = inspect.signature(fn).parameters
-                if "role" in func_params:
-                    kwargs["role"] = res.role.value  # 向原有函数传入键为role的参数
-                if "user_id" in func_params:
-                    kwargs["user_id"] = res.id  # 向原有函数传入键为user_id的参数
+                if pass_role:
+                    kwargs["role"] = identity.role  # 向原有函数传入键为role的参数
+                if pass_user_id:
+                    kwargs["user_id"] = identity.id  # 向原有函数传入键为user_id的参数
+                if pass_department_id:
+                    kwargs["department_id"] = identity.department_id  # 向原有函数传入键为department_id的参数
 
                 return fn(*args, **kwargs)
             except ExpiredSignatureError:
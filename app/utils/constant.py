@@ -129,6 +129,7 @@ class LocalPath:
     STATIC_FOLDER = "public"
     REPORT_PICTURE = "public/report/daily"
     PROFILE_PICTURE = "public/user/picture"
+    LLM_IMAGE_CACHE = "cache/llm_image"  # 发送给LLM前缩放编码后的图片缓存
     HONOR_PICTURE = os.path.join(ROOT_PATH, "public", "honors")  # 荣誉证书图片存储路径
 
 
@@ -1,5 +1,8 @@
+from typing import Any, Iterator
+
 from flask_sqlalchemy.model import Model
 from flask_sqlalchemy.query import Query
+from sqlalchemy import literal
 from sqlalchemy.exc import SQLAlchemyError
 
 from app.modules.sql import db
@@ -8,6 +11,50 @@ from app.utils.constant import SQLStatus
 from .logger import Log
 
 
+class QueryResult:
+    """惰性物化的查询结果，由CRUD.query_key返回
+    Args:
+        query (Query): 已构建好过滤条件的查询对象
+        first (Model): 探测时已取得的第一条记录
+    首条记录在探测时已取得，调用first()不会再次查询；调用all()或迭代时仅执行一次完整查询并缓存结果。
+    其他Query的方法（如filter、order_by、delete）会被转发至原始的查询对象。\n
+    :Example:
+    .. code-block:: python
+        if result := CRUD(Model, id=user_id).query_key():
+            instance = result.first()  # 不会再次发出SELECT
+            for row in result:  # 仅发出一次完整的SELECT
+                ...
+    """
+
+    def __init__(self, query: Query, first: Model) -> None:
+        self.query = query
+        self._first = first
+        self._all: list[Model] | None = None
+
+    def first(self) -> Model:
+        """返回探测时已取得的第一条记录"""
+        return self._first
+
+    def all(self) -> list[Model]:
+        """返回所有匹配的记录，完整查询仅执行一次"""
+        if self._all is None:
+            self._all = self.query.all()
+        return self._all
+
+    def exists(self) -> bool:
+        """以SELECT 1 ... LIMIT 1的方式重新确认匹配的记录是否仍然存在"""
+        return self.query.with_entities(literal(1)).limit(1).first() is not None
+
+    def __iter__(self) -> Iterator[Model]:
+        return iter(self.all())
+
+    def __bool__(self) -> bool:
+        return True
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.query, name)
+
+
 class CRUD(SQLStatus):
     """操作数据库模型的上下文管理器
     Args:
@@ -37,6 +84,7 @@ class CRUD(SQLStatus):
         self.error: Exception | None = None
         self.status = self.OK
         self._need_commit: bool = False
+        self._result: QueryResult | None = None
 
     def __enter__(self) -> "CRUD":
         return self
@@ -102,14 +150,27 @@ class CRUD(SQLStatus):
             self.status = self.INTERNAL_ERR
         return None
 
-    def query_key(self, *args, **kwargs) -> Query | None:
+    def _build_query(self, args: tuple, kwargs: dict) -> Query:
+        """根据表达式与键值构建查询对象"""
+        kw = kwargs or self.kwargs
+
+        query = self.model.query
+        # 仅表达式的情况
+        if args:
+            query = query.filter(*args)
+        # 仅键值的情况或表达式与键值的情况
+        if kw:
+            query = query.filter_by(**kw)
+        return query
+
+    def query_key(self, *args, **kwargs) -> QueryResult | None:
         """通过指定的条件查询条目
         Args:
             *args: 可选参数，使用比较来过滤查询的内容
             **kwargs: 当提供kwargs或args时，会使用kwargs或args的值进行查询，否则使用创建实例时传入的kwargs进行查询
         **当args与kwargs皆传入时，将会同时查询两者均匹配的条件**
         Returns:
-            (Query | None): 如果查询存在内容，则返回Query对象。否则返回None。
+            (QueryResult | None): 如果查询存在内容，则返回已取得首条记录的QueryResult对象。否则返回None。
         :Example:
         .. code-block:: python
             # 查询在某天的content为空的所有记录
@@ -117,20 +178,16 @@ class CRUD(SQLStatus):
                 q.query_key(func.date(q.model.datetime) == my_date)
         """
         try:
-            kw = kwargs or self.kwargs
+            query = self._build_query(args, kwargs)
 
-            query = self.model.query
-            # 仅表达式的情况
-            if args:
-                query = query.filter(*args)
-            # 仅键值的情况或表达式与键值的情况
-            if kw:
-                query = query.filter_by(**kw)
-
-            if not query.first():
+            if (first := query.first()) is None:
                 self.status = self.NOT_FOUND
                 return None
-            return query
+
+            result = QueryResult(query, first)
+            if not (args or kwargs):
+                self._result = result  # 缓存以类参数查询的结果，供update复用
+            return result
         except SQLAlchemyError as e:
             self.error = e
             self.status = self.SQL_ERR
@@ -139,6 +196,28 @@ class CRUD(SQLStatus):
             self.status = self.INTERNAL_ERR
         return None
 
+    def exists(self, *args, **kwargs) -> bool:
+        """以SELECT 1 ... LIMIT 1的方式检查是否存在匹配的条目，不会取得整行
+        Args:
+            *args: 同query_key
+            **kwargs: 同query_key
+        Returns:
+            bool: 是否存在匹配的条目
+        """
+        try:
+            query = self._build_query(args, kwargs)
+            if query.with_entities(literal(1)).limit(1).first() is None:
+                self.status = self.NOT_FOUND
+                return False
+            return True
+        except SQLAlchemyError as e:
+            self.error = e
+            self.status = self.SQL_ERR
+        except Exception as e:
+            self.error = e
+            self.status = self.INTERNAL_ERR
+        return False
+
     def update(self, instance: Model = None, **kwargs) -> Model | None:
         """更新条目
         Args:
@@ -149,7 +228,7 @@ class CRUD(SQLStatus):
         """
         try:
             # 为了兼容add的操作，如果创建的实例在表内不存在，则直接进入setattr操作
-            if (query := self.query_key()) and not instance:
+            if not instance and (query := self._result or self.query_key()):
                 instance = query.first()
                 # raise LookupError(f"Cannot find row by specified keys: {self.kwargs}.")
             for k, v in kwargs.items():
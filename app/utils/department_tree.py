@@ -0,0 +1,167 @@
+import time
+from threading import Lock
+from typing import NamedTuple
+
+from sqlalchemy import event, func, inspect
+from sqlalchemy.orm import Session, object_session
+
+from app.models.department import Department
+from app.models.member import Member
+from app.modules.sql import db
+from config import Config
+
+# 开发组的根部门名，leader可见其下所有子部门的成员
+DEV_DEPARTMENT_NAME = "开发组"
+
+
+class DepartmentNode(NamedTuple):
+    """部门树中的一个节点"""
+
+    id: int
+    name: str
+    parent_id: int | None
+    # 祖先部门id，由近及远
+    ancestors: tuple[int, ...]
+    # 子树中所有部门的id，包含自身
+    descendants: frozenset[int]
+    # 直属成员数
+    member_count: int
+
+
+class DepartmentTree:
+    """进程内的部门树缓存，在有效期内查询部门信息、祖先与子树时不再查询数据库
+    Args:
+        ttl (int): 缓存的有效秒数
+    部门或成员所属部门发生写入时自动失效，有效期用于兜底其他进程中的写入。
+    """
+
+    def __init__(self, ttl: int) -> None:
+        self.ttl = ttl
+        self._expires_at = 0.0
+        self._nodes: dict[int, DepartmentNode] = {}
+        self._lock = Lock()
+
+    def _load(self) -> dict[int, DepartmentNode]:
+        """有效期外时从数据库重新读取全部部门与各部门的成员数"""
+        with self._lock:
+            if self._expires_at > time.monotonic():
+                return self._nodes
+
+            # 读取时不自动flush，避免在持有锁时触发写入事件
+            with db.session.no_autoflush:
+                rows = db.session.query(Department.id, Department.name, Department.parent_id).all()
+                counts = dict(
+                    db.session.query(Member.department_id, func.count(Member.id))
+                    .filter(Member.department_id.isnot(None))
+                    .group_by(Member.department_id)
+                    .all()
+                )
+
+            parents = {department_id: parent_id for department_id, _, parent_id in rows}
+            ancestors, descendants = {}, {department_id: {department_id} for department_id in parents}
+            for department_id in parents:
+                chain, current = [], parents[department_id]
+                # 已访问的节点用于防止脏数据中的环
+                while current in parents and current != department_id and current not in chain:
+                    chain.append(current)
+                    descendants[current].add(department_id)
+                    current = parents[current]
+                ancestors[department_id] = tuple(chain)
+
+            self._nodes = {
+                department_id: DepartmentNode(
+                    department_id,
+                    name,
+                    parent_id,
+                    ancestors[department_id],
+                    frozenset(descendants[department_id]),
+                    counts.get(department_id, 0),
+                )
+                for department_id, name, parent_id in rows
+            }
+            self._expires_at = time.monotonic() + self.ttl
+            return self._nodes
+
+    def get(self, department_id: int | None) -> DepartmentNode | None:
+        """获取部门节点，不存在时返回None"""
+        if department_id is None:
+            return None
+        return self._load().get(department_id)
+
+    def parent(self, department_id: int | None) -> DepartmentNode | None:
+        """获取父部门节点，没有父部门时返回None"""
+        if not (node := self.get(department_id)):
+            return None
+        return self.get(node.parent_id)
+
+    def descendant_ids(self, department_id: int, include_self: bool = True) -> list[int]:
+        """获取部门子树中所有部门的id
+        Args:
+            department_id (int): 子树的根部门id
+            include_self (bool, optional): 结果中是否包含根部门本身
+        Returns:
+            list[int]: 部门id列表，根部门不存在时为空
+        """
+        if not (node := self.get(department_id)):
+            return []
+        return [i for i in node.descendants if include_self or i != department_id]
+
+    def subtree_member_count(self, department_id: int) -> int:
+        """获取部门子树中的成员总数"""
+        nodes = self._load()
+        if department_id not in nodes:
+            return 0
+        return sum(nodes[i].member_count for i in nodes[department_id].descendants)
+
+    def find_id(self, name: str) -> int | None:
+        """根据部门名查找部门id，同名时取id最小者"""
+        ids = [node.id for node in self._load().values() if node.name == name]
+        return min(ids) if ids else None
+
+    def dev_department_ids(self) -> list[int]:
+        """获取开发组下所有子部门的id，不含开发组本身"""
+        if (root_id := self.find_id(DEV_DEPARTMENT_NAME)) is None:
+            return []
+        return self.descendant_ids(root_id, include_self=False)
+
+    def is_empty(self) -> bool:
+        """是否没有任何部门"""
+        return not self._load()
+
+    def invalidate(self) -> None:
+        """使缓存失效，下次查询时重新读取"""
+        with self._lock:
+            self._expires_at = 0.0
+
+
+department_tree = DepartmentTree(Config.DEPARTMENT_TREE_TTL)
+
+
+def _mark_dirty(target) -> None:
+    """写入时立即失效，并在事务结束后再次失效，避免期间读到未提交或已回滚的数据"""
+    department_tree.invalidate()
+    if session := object_session(target):
+        session.info["department_tree_dirty"] = True
+
+
+@event.listens_for(Department, "after_insert")
+@event.listens_for(Department, "after_update")
+@event.listens_for(Department, "after_delete")
+@event.listens_for(Member, "after_insert")
+@event.listens_for(Member, "after_delete")
+def _invalidate_on_write(mapper, connection, target) -> None:
+    _mark_dirty(target)
+
+
+@event.listens_for(Member, "after_update")
+def _invalidate_on_member_move(mapper, connection, target) -> None:
+    # 成员更换部门时各部门成员数变化
+    if inspect(target).attrs.department_id.history.has_changes():
+        _mark_dirty(target)
+
+
+@event.listens_for(Session, "after_commit")
+@event.listens_for(Session, "after_soft_rollback")
+def _invalidate_after_transaction(session, *args) -> None:
+    if session.info.pop("department_tree_dirty", False):
+        department_tree.invalidate()
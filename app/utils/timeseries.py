@@ -0,0 +1,74 @@
+"""
+按日期的时间序列工具
+将按日期稀疏存储的记录展开为连续的每日序列，一次建立日期到记录的索引后线性填充
+"""
+
+from datetime import date, timedelta
+from typing import Any, Iterable, Iterator
+
+
+def date_range(start: date, end: date) -> Iterator[date]:
+    """逐日产出[start, end]内的日期"""
+    current = start
+    while current <= end:
+        yield current
+        current += timedelta(days=1)
+
+
+def build_daily_series(
+    records: Iterable[Any],
+    start: date,
+    end: date,
+    fields: dict[str, str],
+    carry: Iterable[str] = (),
+    date_attr: str = "progress_date",
+    default: Any = 0.0,
+    flag: str | None = None,
+    columnar: bool = False,
+) -> list[dict] | dict[str, list]:
+    """将记录展开为连续的每日序列
+    Args:
+        records (Iterable): 带有日期属性的记录，同一日期有多条时取最后一条
+        start (date): 开始日期
+        end (date): 结束日期
+        fields (dict[str, str]): 输出字段名到记录属性名的映射
+        carry (Iterable[str], optional): 没有记录的日期沿用上一次取值的输出字段，其余字段取默认值
+        date_attr (str, optional): 记录的日期属性名
+        default (Any, optional): 尚无记录时各字段的取值，也可以是输出字段名到取值的字典
+        flag (str, optional): 若提供，则额外输出一个表示当天是否有记录的布尔字段
+        columnar (bool, optional): 为True时以列的形式返回，即{"dates": [...], 字段: [...]}
+    Returns:
+        (list[dict] | dict[str, list]): 每日一项的列表，或按列组织的字典
+    """
+    index = {getattr(record, date_attr): record for record in records}
+    carry = set(carry)
+    keys = list(fields) + ([flag] if flag else [])
+    defaults = {
+        key: default.get(key, 0.0) if isinstance(default, dict) else default
+        for key in fields
+    }
+    last = dict(defaults)
+
+    columns: dict[str, list] = {"dates": [], **{key: [] for key in keys}}
+    for day in date_range(start, end):
+        record = index.get(day)
+        values = {}
+        for key, attr in fields.items():
+            if record is not None:
+                last[key] = getattr(record, attr)
+                values[key] = last[key]
+            else:
+                values[key] = last[key] if key in carry else defaults[key]
+        if flag:
+            values[flag] = record is not None
+
+        columns["dates"].append(day.isoformat())
+        for key in keys:
+            columns[key].append(values[key])
+
+    if columnar:
+        return columns
+    return [
+        {"date": day, **{key: columns[key][i] for key in keys}}
+        for i, day in enumerate(columns["dates"])
+    ]
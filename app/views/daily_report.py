@@ -9,12 +9,14 @@ from datetime import datetime, timedelta
 from flask import Blueprint, request
 from marshmallow import Schema, ValidationError, fields
 from app.controllers.daily_report_handler import DailyReportHandler
+from app.controllers.daily_score import get_daily_scores
 from app.controllers.daily_task import generate_daily_task_from_period
 from app.controllers.report import create_report
 from app.models.daily_report import DailyReport
 from app.models.daily_task import DailyTask
 from app.models.period_task import PeriodTask
 from app.utils.auth import require_role
+from app.utils.department_tree import department_tree
 from app.utils.logger import Log
 from app.utils.response import Response
 
@@ -106,22 +108,17 @@ def get_today_report_view(user_id: str) -> Response:
        
        day_start = today.replace(hour=0, minute=0, second=0, microsecond=0)
        day_end = day_start + timedelta(days=1)
-       # 获取前5天的日报总分
+       # 获取前5天的日报总分，一次范围查询读取每日评分汇总
+       scores = get_daily_scores(
+           [user_id], (day_start - timedelta(days=4)).date(), day_start.date()
+       )
        previous_scores = []
        for i in range(0, 5):
            previous_date = day_start - timedelta(days=i)
-           previous_end = previous_date + timedelta(days=1)
-           prev_report = DailyReport.query.filter(
-               DailyReport.user_id == user_id,
-               DailyReport.created_at >= previous_date,
-               DailyReport.created_at < previous_end
-           ).first()
-           
-           if prev_report:
-               total_score = prev_report.basic_score + prev_report.excess_score + prev_report.extra_score
+           if rollup := scores.get((user_id, previous_date.date())):
                previous_scores.append({
                    "date": previous_date.strftime('%Y-%m-%d'),
-                   "total_score": total_score
+                   "total_score": rollup.total_score
                })
        # 查询任务的 detail_task_requirements
        task = DailyTask.query.filter(
@@ -335,62 +332,31 @@ def get_task_progress_report(user_id: str) -> Response:
             completion_rate = round((completed_days / workdays) * 100)
         
         # 获取前7天的日报基础评分
+        # 前7天每一天都需要其前7天的平均分，因此一次范围查询读取13天的每日评分汇总
+        window_start = today - timedelta(days=12)
+        scores = get_daily_scores([user_id], window_start.date(), today.date())
+        daily_scores = [
+            scores[(user_id, day)].basic_score or 0 if (user_id, day) in scores else 0
+            for day in ((window_start + timedelta(days=i)).date() for i in range(13))
+        ]
+
         basic_scores = []
         avg_scores = []
         
         for i in range(6, -1, -1):  # 从6到0，表示前7天
             target_date = today - timedelta(days=i)
-            target_date_end = target_date + timedelta(days=1)
-            
-            # 获取当天的日报
-            daily_report = DailyReport.query.filter(
-                DailyReport.user_id == user_id,
-                DailyReport.created_at >= target_date,
-                DailyReport.created_at < target_date_end
-            ).first()
-            
-            # 当天基础评分
-            current_day_score = 0
-            if daily_report and daily_report.basic_score is not None:
-                current_day_score = daily_report.basic_score
+            index = 12 - i  # target_date在daily_scores中的位置
             
             date_str = target_date.strftime('%Y-%m-%d')
             day_of_week = ["周一", "周二", "周三", "周四", "周五", "周六", "周日"][target_date.weekday()]
             basic_scores.append({
                 "date": date_str,
                 "day": day_of_week,
-                "score": current_day_score
+                "score": daily_scores[index]
             })
             
-            # 计算该日期前7天的平均日报基础评分（包括当天）
-            avg_date_start = target_date - timedelta(days=6)
-            
-            # 获取这7天范围内的所有日报
-            avg_reports = DailyReport.query.filter(
-                DailyReport.user_id == user_id,
-                DailyReport.created_at >= avg_date_start,
-                DailyReport.created_at < target_date_end
-            ).all()
-            
-            # 计算平均分 - 修复计算逻辑
-            total_score = 0
-            # 对于7天范围内有日报的日期，使用其基础评分；对于没有日报的日期，使用0分
-            # 创建一个字典，键是日期（年-月-日格式），值是该日的基础评分
-            daily_scores = {}
-            
-            # 填充有日报的日期的评分
-            for report in avg_reports:
-                if report.basic_score is not None:
-                    report_date = report.created_at.strftime('%Y-%m-%d')
-                    daily_scores[report_date] = report.basic_score
-            
-            # 计算这7天的总分数（没有日报的日期为0分）
-            for i in range(7):
-                check_date = (target_date - timedelta(days=6-i)).strftime('%Y-%m-%d')
-                total_score += daily_scores.get(check_date, 0)
-            
-            # 7天的平均分
-            avg_score = round(total_score / 7)
+            # 该日期前7天（包括当天）的平均日报基础评分，没有日报的日期为0分
+            avg_score = round(sum(daily_scores[index - 6:index + 1]) / 7)
             
             avg_scores.append({
                 "date": date_str,
@@ -459,21 +425,19 @@ def get_department_report(user_id: str) -> Response:
         today = now.replace(hour=0, minute=0, second=0, microsecond=0)
         yesterday = today - timedelta(days=1)
         
-        # 计算过去7天的统计数据
+        # 计算过去7天的统计数据，一次范围查询读取全部门成员的每日评分汇总
+        week_start = today - timedelta(days=6)
+        scores_by_date = {}
+        for (_, score_date), rollup in get_daily_scores(member_ids, week_start.date(), today.date()).items():
+            if rollup.basic_score is not None:
+                scores_by_date.setdefault(score_date, []).append(rollup.basic_score)
+
         stats_by_day = []
         for i in range(6, -1, -1):  # 从6到0，表示前7天
             target_date = today - timedelta(days=i)
-            target_date_end = target_date + timedelta(days=1)
-            
-            # 获取当天该部门所有成员的日报
-            daily_reports = DailyReport.query.filter(
-                DailyReport.user_id.in_(member_ids),
-                DailyReport.created_at >= target_date,
-                DailyReport.created_at < target_date_end
-            ).all()
             
             # 统计基础评分
-            scores = [r.basic_score for r in daily_reports if r.basic_score is not None]
+            scores = scores_by_date.get(target_date.date(), [])
             
             avg_score = 0
             max_score = 0
@@ -524,7 +488,7 @@ def get_department_report(user_id: str) -> Response:
             "department": {
                 "id": department.id,
                 "name": department.name,
-                "parent_name": department.parent.name if department.parent else None
+                "parent_name": parent.name if (parent := department_tree.parent(department.id)) else None
             },
             "member_count": member_count,
             "today_avg_score": today_stats["avg_score"],
@@ -1,4 +1,5 @@
 from datetime import datetime
+from typing import NamedTuple
 import uuid
 from venv import logger
 from flask import Blueprint, request, jsonify, stream_with_context, Response as FlaskResponse, current_app, copy_current_request_context
@@ -7,6 +8,7 @@ from app.utils.constant import DataStructure as D
 from app.controllers.gpt import *
 from app.modules.sql import db
 from app.models.gpt import Gpt
+from app.modules.llm_cache import llm_cache
 from app.utils.auth import require_role
 from app.utils.response import Response
 import logging
@@ -272,46 +274,74 @@ def update_conversation_title(user_id: str, session_id: str):
             "data": None
         }), 500
 
-@gpt_bp.route('/chat', methods=['POST'])
-@require_role(D.admin, D.leader, D.sub_leader)
-def chat_query(user_id: str):
-    try:
-        content_type = request.headers.get('Content-Type', '')
-        session_id = request.headers.get('Session-Id') or str(uuid.uuid4())
-        
-        current_message = None
-        messages = []
+class ChatRequest(NamedTuple):
+    """已解析并保存了用户消息的聊天请求"""
+    session_id: str
+    user_id: str
+    messages: list
+    created_at: datetime
 
-        # 获取指定会话的历史记录
-        conversation_history = get_conversation_history(session_id)
-        
-        # 处理当前请求
-        if 'multipart/form-data' in content_type:
-            text_content = request.form.get('content', '')
-            current_message = text_content
-            new_message = [{"role": "user", "content": text_content}]
-            messages = conversation_history + new_message
-        elif 'application/json' in content_type:
-            data = request.json
-            if not data or 'messages' not in data:
-                return jsonify({
-                    "code": Response.r.ERR_INVALID_ARGUMENT,
-                    "message": "Invalid input",
-                    "data": None
-                }), 400
-            
-            current_message = data['messages'][-1]['content']
-            new_message = [{"role": "user", "content": current_message}]
-            messages = conversation_history + new_message
-        else:
+
+def chat_event(payload) -> bytes:
+    """按/gpt/chat的SSE格式编码一个事件，payload为字典或原样发送的字符串"""
+    data = payload if isinstance(payload, str) else json.dumps(payload)
+    return f"data: {data}\n\n".encode('utf-8')
+
+
+def prepare_chat(user_id: str):
+    """解析当前请求中的聊天消息，拼接会话历史并保存用户消息
+    Returns:
+        解析成功时为ChatRequest，否则为错误响应
+    """
+    content_type = request.headers.get('Content-Type', '')
+    session_id = request.headers.get('Session-Id') or str(uuid.uuid4())
+
+    # 获取指定会话的历史记录
+    conversation_history = get_conversation_history(session_id)
+    
+    # 处理当前请求
+    if 'multipart/form-data' in content_type:
+        current_message = request.form.get('content', '')
+    elif 'application/json' in content_type:
+        data = request.json
+        if not data or 'messages' not in data:
             return jsonify({
                 "code": Response.r.ERR_INVALID_ARGUMENT,
-                "message": "Unsupported Media Type",
+                "message": "Invalid input",
                 "data": None
-            }), 415
-        conversation_timestamp = datetime.utcnow()
-        # 先保存用户消息
-        save_conversation(session_id, user_id, "user", current_message, created_at=conversation_timestamp)
+            }), 400
+        current_message = data['messages'][-1]['content']
+    else:
+        return jsonify({
+            "code": Response.r.ERR_INVALID_ARGUMENT,
+            "message": "Unsupported Media Type",
+            "data": None
+        }), 415
+
+    messages = conversation_history + [{"role": "user", "content": current_message}]
+    conversation_timestamp = datetime.utcnow()
+    # 先保存用户消息
+    save_conversation(session_id, user_id, "user", current_message, created_at=conversation_timestamp)
+    return ChatRequest(session_id, user_id, messages, conversation_timestamp)
+
+
+def finish_chat(chat: ChatRequest, content: str) -> None:
+    """保存助手的最终回复并清理会话的旧消息，需在应用上下文中调用"""
+    try:
+        save_conversation(chat.session_id, chat.user_id, "assistant", content, created_at=chat.created_at)
+        cleanup_old_messages(chat.session_id)
+    except Exception as e:
+        logging.error(f"Error saving final response in context: {str(e)}")
+
+
+@gpt_bp.route('/chat', methods=['POST'])
+@require_role(D.admin, D.leader, D.sub_leader)
+def chat_query(user_id: str):
+    """同步的流式聊天，部署了stream_gateway时该路由由异步网关接管"""
+    try:
+        chat = prepare_chat(user_id)
+        if not isinstance(chat, ChatRequest):
+            return chat
 
         # 获取应用上下文
         app = current_app._get_current_object()
@@ -320,26 +350,22 @@ def chat_query(user_id: str):
         def generate():
             last_content = None
             try:
-                for chunk_data in stream_openai_response(messages):
+                for chunk_data in stream_openai_response(chat.messages):
                     if chunk_data["type"] == "chunk":
                         last_content = chunk_data["content"]
-                        yield f"data: {json.dumps({'content': chunk_data['content']})}\n\n".encode('utf-8')
+                        yield chat_event({'content': chunk_data['content']})
                     elif chunk_data["type"] == "done":
                         if last_content:
                             # 在应用上下文中保存响应
                             with app.app_context():
-                                try:
-                                    save_conversation(session_id, user_id, "assistant", last_content, created_at=conversation_timestamp)
-                                    cleanup_old_messages(session_id)
-                                except Exception as e:
-                                    logging.error(f"Error saving final response in context: {str(e)}")
-                        yield f"data: {json.dumps({'final_content': last_content})}\n\n".encode('utf-8')
-                        yield "data: [DONE]\n\n".encode('utf-8')
+                                finish_chat(chat, last_content)
+                        yield chat_event({'final_content': last_content})
+                        yield chat_event("[DONE]")
                     elif chunk_data["type"] == "error":
-                        yield f"data: {json.dumps({'error': chunk_data['content']})}\n\n".encode('utf-8')
+                        yield chat_event({'error': chunk_data['content']})
             except Exception as e:
                 logging.error(f"Error in generate: {str(e)}")
-                yield f"data: {json.dumps({'error': str(e)})}\n\n".encode('utf-8')
+                yield chat_event({'error': str(e)})
 
         return FlaskResponse(
             generate(),
@@ -552,4 +578,10 @@ def generate_user_assessment(user_id: str):
             "message": f"能力评估生成失败: {str(e)}",
             "status": "ERROR",
             "data": None
-        }), 500
\ No newline at end of file
+        }), 500
+
+@gpt_bp.route('/cache_stats', methods=['GET'])
+@require_role(D.admin)
+def get_llm_cache_stats():
+    """获取LLM响应缓存的命中与未命中计数"""
+    return Response(Response.r.OK, data=llm_cache.stats()).response()
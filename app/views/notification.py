@@ -25,8 +25,11 @@ def get_user_notifications():
     """获取用户的通知列表"""
     user_id = get_jwt_identity()
     unread_only = request.args.get("unread_only", "false").lower() == "true"
+    cursor = request.args.get("cursor")
+    limit = request.args.get("limit", type=int)
+    since = request.args.get("since")
     
-    response = get_notifications(user_id, unread_only)
+    response = get_notifications(user_id, unread_only, cursor, limit, since)
     return response.response()
 
 @notification_bp.route("/unread-count", methods=["GET"])
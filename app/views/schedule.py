@@ -2,6 +2,7 @@
 from flask import Blueprint, request
 
 from app.controllers.schedule import check_daily_report, daily_generation
+from app.modules.job_status import get_run, start_background
 from app.utils.response import Response
 from config import Config
 
@@ -10,31 +11,48 @@ schedule_bp = Blueprint("schedule", __name__, url_prefix="/schedule")
 
 @schedule_bp.route("/check_daily_report", methods=["POST"])
 def check_daily_report_view() -> Response:
-    """任务计划路由"""
+    """任务计划路由，任务在后台执行，立即返回可用于查询状态的run_id"""
     try:
         app_key = request.headers.get("key")
 
         if app_key != Config.DISPOSABLE_APP_KEY:
             return Response(Response.r.ERR_INVALID_ARGUMENT, immediate=True)
 
-        res = check_daily_report()
+        run_id = start_background("check_daily_report", check_daily_report)
 
-        return res.response()
+        return Response(Response.r.OK, data={"run_id": run_id}).response()
     except Exception as e:
         return Response(Response.r.ERR_INTERNAL, message=e, immediate=True)
 
 
 @schedule_bp.route("/daily_generation", methods=["POST"])
 def daily_generation_view() -> Response:
-    """任务计划路由"""
+    """任务计划路由，任务在后台执行，立即返回可用于查询状态的run_id"""
     try:
         app_key = request.headers.get("key")
 
         if app_key != Config.DISPOSABLE_APP_KEY:
             return Response(Response.r.ERR_INVALID_ARGUMENT, immediate=True)
 
-        res = daily_generation()
+        run_id = start_background("daily_generation", daily_generation)
 
-        return res.response()
+        return Response(Response.r.OK, data={"run_id": run_id}).response()
+    except Exception as e:
+        return Response(Response.r.ERR_INTERNAL, message=e, immediate=True)
+
+
+@schedule_bp.route("/runs/<run_id>", methods=["GET"])
+def get_run_view(run_id: str) -> Response:
+    """查询后台任务的执行状态、进度与结果"""
+    try:
+        app_key = request.headers.get("key")
+
+        if app_key != Config.DISPOSABLE_APP_KEY:
+            return Response(Response.r.ERR_INVALID_ARGUMENT, immediate=True)
+
+        if not (run := get_run(run_id)):
+            return Response(Response.r.ERR_NOT_FOUND, immediate=True)
+
+        return Response(Response.r.OK, data=run).response()
     except Exception as e:
         return Response(Response.r.ERR_INTERNAL, message=e, immediate=True)
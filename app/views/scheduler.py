@@ -470,4 +470,34 @@ def direct_run_batch_progress_update_all(user_id: str):
             "message": f"直接执行所有活跃任务的批量进度更新失败: {str(e)}",
             "data": None,
             "status": "ERROR"
-        }), 500 
\ No newline at end of file
+        }), 500 
+@scheduler_bp.route('/jobs', methods=['GET'])
+@require_role(D.admin)
+def get_scheduler_jobs(user_id: str):
+    """获取统一运行时中注册的所有定时任务，以及各任务的租约持有者与最近一次执行耗时"""
+    from app.modules.lease import HOLDER_ID, get_leases
+    from app.modules.runtime import runtime
+
+    leases = get_leases()
+    jobs = [
+        {**job, "lease": leases.get(job["id"])}
+        for job in runtime.get_jobs()
+    ]
+    return Response(
+        Response.r.OK,
+        data={"holder_id": HOLDER_ID, "is_leader": runtime.is_leader, "jobs": jobs},
+    ).response()
+
+
+@scheduler_bp.route('/runs', methods=['GET'])
+@require_role(D.admin)
+def get_scheduler_runs(user_id: str):
+    """获取后台任务的执行记录，可通过job_id筛选"""
+    from flask import request
+    from app.modules.job_status import list_runs
+
+    limit = min(request.args.get('limit', 20, type=int), 100)
+    return Response(
+        Response.r.OK,
+        data=list_runs(request.args.get('job_id'), limit),
+    ).response()
@@ -10,9 +10,10 @@ from app.modules.sql import db
 from app.controllers.task import *
 from app.utils.auth import require_role
 from app.utils.constant import DataStructure as D
+from app.utils.department_tree import department_tree
 from app.utils.response import Response
 import logging
-from sqlalchemy import or_, and_
+from sqlalchemy import or_, and_, exists
 
 task_bp = Blueprint("task", __name__, url_prefix="/task")
 
@@ -49,6 +50,15 @@ def get_task_progress_view(user_id: str, period_task_id: str) -> Response:
    """获取周期任务进度"""
    return calculate_task_progress(period_task_id).response()
 
+def _has_current_task():
+   """成员当前是否有进行中的周期任务，与成员查询关联的EXISTS子查询"""
+   current_time = func.now()
+   return exists().where(
+       PeriodTask.assignee_id == Member.id,
+       PeriodTask.start_time <= current_time,
+       PeriodTask.end_time >= current_time
+   ).correlate(Member).label("has_current_task")
+
 @task_bp.route("/get_assignee_list", methods=["GET"])  
 @require_role(D.admin, D.leader, D.sub_leader)  
 def get_assignee_list_view(user_id: str):
@@ -62,19 +72,15 @@ def get_assignee_list_view(user_id: str):
                "data": []
            })
 
-       # 获取当前时间
-       current_time = func.now()
+       # 成员当前是否有进行中的周期任务，作为EXISTS子查询与成员列表一并查出
+       has_current_task = _has_current_task()
        # 根据角色获取基础成员查询
        if current_user.role.value == "admin":
-           members = (db.session.query(Member.id, Member.name)
+           members = (db.session.query(Member.id, Member.name, has_current_task)
                      .distinct())
        elif current_user.role.value == "leader":
-            dev_dept_ids = (Department.query
-                         .filter(Department.name.in_(["开发组-前端", "开发组-后端", "开发组-游戏开发","开发组-OA开发"]))
-                         .with_entities(Department.id)
-                         .all())
-            dev_dept_id_list = [d[0] for d in dev_dept_ids]
-            members = (db.session.query(Member.id, Member.name)
+            dev_dept_id_list = department_tree.dev_department_ids()
+            members = (db.session.query(Member.id, Member.name, has_current_task)
                        .filter(
                            or_(
                                and_(
@@ -87,11 +93,11 @@ def get_assignee_list_view(user_id: str):
                        .distinct())
        else:  # subleader
             dept_id = current_user.department_id
-            members = (db.session.query(Member.id, Member.name)
+            members = (db.session.query(Member.id, Member.name, has_current_task)
                         .filter(
                             or_(
                                 and_(
-                                    Member.department_id == dept_id,
+                                    Member.department_id.in_(department_tree.descendant_ids(dept_id)),
                                     Member.role.notin_(["admin", "leader"])
                                 ),
                                 Member.id == user_id  # 添加当前subleader自己
@@ -100,22 +106,10 @@ def get_assignee_list_view(user_id: str):
                         .distinct())
 
        # 执行查询获取成员列表
-       members = members.all()
-       
-       # 检查每个成员当前是否有任务
-       assignee_list = []
-       for member_id, member_name in members:
-           has_current_task = PeriodTask.query.filter(
-               PeriodTask.assignee_id == member_id,
-               PeriodTask.start_time <= current_time,
-               PeriodTask.end_time >= current_time
-           ).first() is not None
-           
-           assignee_list.append({
-               "id": member_id, 
-               "name": member_name,
-               "has_current_task": has_current_task
-           })
+       assignee_list = [
+           {"id": member_id, "name": member_name, "has_current_task": bool(has_task)}
+           for member_id, member_name, has_task in members.all()
+       ]
 
        return jsonify({
            "status": "OK",
@@ -144,23 +138,19 @@ def assign_tasks_view(user_id: str):
                "status": "OK",
                "data": []
            })
-       # 获取当前时间
-        current_time = func.now()
+        # 成员当前是否有进行中的周期任务，作为EXISTS子查询与成员列表一并查出
+        has_current_task = _has_current_task()
        
        # 根据角色获取基础成员查询
         if current_user.role.value == "admin":
            # 管理员只能看到自己部门的成员
             dept_id = current_user.department_id
-            members = (db.session.query(Member.id, Member.name)
+            members = (db.session.query(Member.id, Member.name, has_current_task)
                         .filter(Member.department_id == dept_id)
                         .distinct())
         elif current_user.role.value == "leader":
-            dev_dept_ids = (Department.query
-                          .filter(Department.name.in_(["开发组-前端", "开发组-后端", "开发组-游戏开发","开发组-OA开发"]))
-                          .with_entities(Department.id)
-                          .all())
-            dev_dept_id_list = [d[0] for d in dev_dept_ids]
-            members = (db.session.query(Member.id, Member.name)
+            dev_dept_id_list = department_tree.dev_department_ids()
+            members = (db.session.query(Member.id, Member.name, has_current_task)
                         .filter(
                             or_(
                                 and_(
@@ -173,11 +163,11 @@ def assign_tasks_view(user_id: str):
                         .distinct())
         else:  # subleader
             dept_id = current_user.department_id
-            members = (db.session.query(Member.id, Member.name)
+            members = (db.session.query(Member.id, Member.name, has_current_task)
                         .filter(
                             or_(
                                 and_(
-                                    Member.department_id == dept_id,
+                                    Member.department_id.in_(department_tree.descendant_ids(dept_id)),
                                     Member.role.notin_(["admin", "leader"])
                                 ),
                                 Member.id == user_id  # 添加当前subleader自己
@@ -186,22 +176,10 @@ def assign_tasks_view(user_id: str):
                         .distinct())
 
         # 执行查询获取成员列表
-        members = members.all()
-        
-        # 检查每个成员当前是否有任务
-        assignee_list = []
-        for member_id, member_name in members:
-            has_current_task = PeriodTask.query.filter(
-                PeriodTask.assignee_id == member_id,
-                PeriodTask.start_time <= current_time,
-                PeriodTask.end_time >= current_time
-            ).first() is not None
-            
-            assignee_list.append({
-                "id": member_id, 
-                "name": member_name,
-                "has_current_task": has_current_task
-            })
+        assignee_list = [
+            {"id": member_id, "name": member_name, "has_current_task": bool(has_task)}
+            for member_id, member_name, has_task in members.all()
+        ]
 
         logging.info(f"User role: {current_user.role.value}, Department ID: {current_user.department_id}, User ID: {user_id}, Assignee list: {assignee_list}")
 
@@ -302,7 +280,12 @@ def get_found_period_tasks_view():
             "data": None
         }), 400
     
-    return get_period_tasks(member_id, task_id)
+    return get_period_tasks(
+        member_id,
+        task_id,
+        page=request.args.get("page", type=int),
+        page_size=request.args.get("page_size", type=int)
+    )
 
 # TODO
 @task_bp.route("/modify_task", methods=["POST"])
@@ -405,7 +388,11 @@ def complete_task_view(user_id: str, task_id: str):
 @require_role(D.admin, D.leader, D.sub_leader)
 def get_members_period_tasks_view(user_id: str):
     """获取权限范围内所有成员的周期任务列表路由"""
-    return get_members_period_tasks(user_id)
+    return get_members_period_tasks(
+        user_id,
+        page=request.args.get("page", type=int),
+        page_size=request.args.get("page_size", type=int)
+    )
 
 @task_bp.route("/average_score", methods=["GET"])
 @require_role()  # 所有角色都可以查看自己的平均分
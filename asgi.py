@@ -0,0 +1,20 @@
+"""
+异步流式网关的入口，仅处理 /gpt/chat 与 /notifications/stream，其余路由仍由 run.py 启动的Flask应用处理
+
+启动：uvicorn asgi:app --host 0.0.0.0 --port 5003 [--workers N]
+"""
+import logging
+import sys
+
+from app import create_app
+from app.modules.stream_gateway import StreamGateway
+from config import Config
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    handlers=[logging.StreamHandler(sys.stdout)]
+)
+
+# 网关不执行数据库初始化，也不参与定时任务的leader选举，这些只由 run.py 启动的主应用进程负责
+app = StreamGateway(create_app(init_db=False, schedulers=False), max_streams=Config.CHAT_GATEWAY_MAX_STREAMS)
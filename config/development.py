@@ -31,6 +31,45 @@ class Config:
     TIMEZONE = "Asia/Shanghai"
 
     JWT_ACCESS_TOKEN_EXPIRES = timedelta(days=5)
+    IDENTITY_CACHE_TTL = 60  # 鉴权身份缓存的有效秒数
+    DEPARTMENT_TREE_TTL = 300  # 部门树缓存的有效秒数
+    TASK_PAGE_SIZE = 100  # 周期任务列表默认每页数量
+    TASK_PAGE_SIZE_MAX = 500  # 周期任务列表每页数量上限
+
+    LLM_POOL_WORKERS = 8  # 批量调用LLM时的最大并发数
+    LLM_RATE_LIMITS = {"deepseek": 5}  # 各LLM服务商每秒允许的请求数
+    LLM_HTTP_POOL_SIZE = 10  # LLM请求连接池中每个主机保持的连接数
+    LLM_CONNECT_TIMEOUT = 5  # LLM请求建立连接的超时秒数
+    LLM_READ_TIMEOUT = 120  # LLM请求读取响应的超时秒数
+    LLM_HTTP_MAX_RETRIES = 3  # LLM请求遇到网络错误或暂时性状态码时的最大重试次数
+    LLM_BACKOFF_BASE = 0.5  # 重试退避的基础秒数
+    LLM_BACKOFF_MAX = 10  # 重试退避的最大秒数
+
+    LLM_CACHE_TTL = timedelta(days=7)  # LLM响应缓存的有效期
+    LLM_CACHE_MEMORY_SIZE = 512  # 进程内LLM响应缓存的最大条目数
+    LLM_CACHE_DB_MAX_ROWS = 20000  # 持久化LLM响应缓存的最大行数
+
+    LLM_IMAGE_MAX_EDGE = 1568  # 发送给LLM的图片最长边像素
+    LLM_IMAGE_FORMAT = "JPEG"  # 发送给LLM的图片编码格式，JPEG或WEBP
+    LLM_IMAGE_QUALITY = 85  # 发送给LLM的图片编码质量
+    LLM_BODY_SPOOL_SIZE = 1024 * 1024  # 附带图片的请求体超过该字节数后转存磁盘
+    CHAT_GATEWAY_MAX_STREAMS = 200  # 异步聊天网关同时进行的聊天流上限
+
+    SCHEDULER_WORKERS = 10  # 定时任务运行时共用线程池的最大执行数量
+    SCHEDULER_MISFIRE_GRACE_TIME = 3600  # 错过执行时间后仍允许补跑的秒数
+    SCHEDULER_JOBSTORE_TABLE = "apscheduler_jobs"  # 持久化定时任务的表名
+    SCHEDULER_LEADER_LOCK = "app_scheduler_leader"  # 选举定时任务leader所用的MySQL锁名
+    SCHEDULER_LEADER_CHECK_SECONDS = 30  # 检查与争取leader锁的间隔秒数
+    JOB_LEASE_TTL = timedelta(hours=6)  # 定时任务租约的有效期，需长于任务的最长执行时间
+
+    NOTIFICATION_DELETE_CHUNK = 1000  # 清理过期通知时每次删除的行数
+    NOTIFICATION_RETENTION_MONTHS = 0  # 通知表按月分区时保留的月数，0表示不启用分区
+    NOTIFICATION_COUNT_TTL = 60  # 内存中未读通知数的有效秒数
+    NOTIFICATION_STREAM_HEARTBEAT = 25  # 通知SSE连接的心跳间隔秒数
+    NOTIFICATION_STREAM_POLL = 3  # 网关轮询新通知与未读数的间隔秒数
+    NOTIFICATION_STREAM_WINDOW = 120  # 网关每次轮询回看的秒数，需覆盖各进程之间的时钟偏差与事务提交延迟
+    NOTIFICATION_PAGE_SIZE = 20  # 通知列表分页的默认每页数量
+    NOTIFICATION_PAGE_SIZE_MAX = 100  # 通知列表每页数量的上限
 
     SECRET_KEY = os.getenv("SECRET_KEY")
     SQLALCHEMY_DATABASE_URI = os.getenv("DATABASE_URL")
@@ -90,9 +90,21 @@ def run_migrations_online():
                 directives[:] = []
                 logger.info('No changes in schema detected.')
 
+    # the scheduler job store table is managed by APScheduler, not by the models
+    # partitioned notifications cannot have foreign keys, see app/modules/notification_retention.py
+    def include_object(object, name, type_, reflected, compare_to):
+        if type_ == 'table' and reflected and compare_to is None:
+            return name != current_app.config.get('SCHEDULER_JOBSTORE_TABLE')
+        if type_ == 'foreign_key_constraint' and not reflected and compare_to is None:
+            return not (object.table.name == 'notifications'
+                        and current_app.config.get('NOTIFICATION_RETENTION_MONTHS'))
+        return True
+
     conf_args = current_app.extensions['migrate'].configure_args
     if conf_args.get("process_revision_directives") is None:
         conf_args["process_revision_directives"] = process_revision_directives
+    if conf_args.get("include_object") is None:
+        conf_args["include_object"] = include_object
 
     connectable = get_engine()
 
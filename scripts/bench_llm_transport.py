@@ -0,0 +1,94 @@
+"""
+LLM传输层基准测试
+在本地启动一个模拟DeepSeek接口的桩服务器，分别以裸requests.post与共用连接池的LLMTransport发送相同的请求，
+比较单次调用的延迟。桩服务器在每个新连接上等待--handshake-ms毫秒，模拟真实接口的TCP与TLS握手开销。
+
+用法：python scripts/bench_llm_transport.py --calls 200 --handshake-ms 30
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.modules.llm_transport import LLMTransport  # noqa: E402
+
+REPLY = json.dumps({"choices": [{"message": {"role": "assistant", "content": "ok"}}]}).encode()
+
+
+def make_handler(handshake_delay: float) -> type[BaseHTTPRequestHandler]:
+    class StubHandler(BaseHTTPRequestHandler):
+        """返回固定回复的聊天补全接口，支持keep-alive"""
+
+        protocol_version = "HTTP/1.1"
+
+        def setup(self) -> None:
+            # 每个新连接只等待一次，复用连接的请求没有该开销
+            time.sleep(handshake_delay)
+            super().setup()
+
+        def do_POST(self) -> None:
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(REPLY)))
+            self.end_headers()
+            self.wfile.write(REPLY)
+
+        def log_message(self, *args) -> None:
+            pass
+
+    return StubHandler
+
+
+def measure(post, url: str, calls: int) -> list[float]:
+    """依次发送calls次请求，返回每次的毫秒数"""
+    body = {"model": "deepseek-chat", "messages": [{"role": "user", "content": "ping"}]}
+    latencies = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        response = post(url, json=body)
+        response.raise_for_status()
+        response.json()
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def report(name: str, latencies: list[float]) -> None:
+    ordered = sorted(latencies)
+    p95 = ordered[int(len(ordered) * 0.95) - 1]
+    print(f"{name:<16} mean={statistics.mean(ordered):7.2f}ms  p50={statistics.median(ordered):7.2f}ms  p95={p95:7.2f}ms")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=200, help="每种方式的请求次数")
+    parser.add_argument("--handshake-ms", type=float, default=30, help="桩服务器在每个新连接上的等待毫秒数")
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(args.handshake_ms / 1000))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/v1/chat/completions"
+
+    try:
+        bare = measure(lambda url, json: requests.post(url, json=json, timeout=10), url, args.calls)
+        transport = LLMTransport(pool_size=4, connect_timeout=5, read_timeout=10, max_retries=0)
+        pooled = measure(transport.post, url, args.calls)
+    finally:
+        server.shutdown()
+
+    report("requests.post", bare)
+    report("LLMTransport", pooled)
+    print(f"平均每次调用减少 {statistics.mean(bare) - statistics.mean(pooled):.2f}ms")
+
+
+if __name__ == "__main__":
+    main()